@@ -0,0 +1,28 @@
+-- Normalized-name lookup columns for district and formula (MySQL 8)
+-- name_normalized is the name lowercased with underscores as spaces, generated
+-- by the database so every write path keeps it current. Lookups compare
+-- against it through a unique index instead of lower(name).
+--
+-- Run against medicines_db after deploying the matching models.py.
+
+USE `medicines_db`;
+
+-- The unique indexes below fail if two names only differ in case or
+-- underscores/spaces. List such names first and rename or merge them.
+SELECT lower(trim(replace(`name`, '_', ' '))) AS normalized, GROUP_CONCAT(`name`) AS names
+FROM `district` GROUP BY normalized HAVING COUNT(*) > 1;
+
+SELECT lower(trim(replace(`name`, '_', ' '))) AS normalized, GROUP_CONCAT(`name`) AS names
+FROM `formula` GROUP BY normalized HAVING COUNT(*) > 1;
+
+ALTER TABLE `district`
+  ADD COLUMN `name_normalized` varchar(100) GENERATED ALWAYS AS (lower(trim(replace(`name`, '_', ' ')))) STORED,
+  ADD UNIQUE KEY `idx_district_name_normalized` (`name_normalized`);
+
+ALTER TABLE `formula`
+  ADD COLUMN `name_normalized` varchar(100) GENERATED ALWAYS AS (lower(trim(replace(`name`, '_', ' ')))) STORED,
+  ADD UNIQUE KEY `idx_formula_name_normalized` (`name_normalized`);
+
+-- Rollback:
+-- ALTER TABLE `district` DROP INDEX `idx_district_name_normalized`, DROP COLUMN `name_normalized`;
+-- ALTER TABLE `formula` DROP INDEX `idx_formula_name_normalized`, DROP COLUMN `name_normalized`;
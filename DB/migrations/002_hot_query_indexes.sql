@@ -0,0 +1,42 @@
+-- Composite/covering indexes for the hot read queries (MySQL 8)
+-- Shapes, from the forecast, medicine catalog and district routes:
+--   medicine_forecast: forecast_date range, summed per medicine_id
+--                      (optionally within one district_id)
+--   medicine_sales:    district_id = ?, medicine_id IN (...), date range, summed per date
+--   district_medicine_lookup: district_id = ? AND formula_id = ?
+-- Single-column indexes that become a prefix of a new index are dropped
+-- afterwards; the foreign keys keep an index through the new ones.
+--
+-- Verify with: python benchmarks/explain_hot_queries.py (from backend/)
+
+USE `medicines_db`;
+
+ALTER TABLE `medicine_forecast`
+  ADD INDEX `idx_forecast_date_medicine` (`forecast_date`, `medicine_id`, `forecasted_quantity`),
+  ADD INDEX `idx_forecast_district_date` (`district_id`, `forecast_date`, `medicine_id`, `forecasted_quantity`),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `medicine_forecast`
+  DROP INDEX `ix_medicine_forecast_forecast_date`,
+  DROP INDEX `ix_medicine_forecast_district_id`;
+
+ALTER TABLE `medicine_sales`
+  ADD INDEX `idx_sales_district_medicine_date` (`district_id`, `medicine_id`, `date`, `quantity`),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `medicine_sales`
+  DROP INDEX `ix_medicine_sales_district_id`;
+
+ALTER TABLE `district_medicine_lookup`
+  ADD INDEX `idx_lookup_district_formula` (`district_id`, `formula_id`, `medicine_id`),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE `medicine_forecast`, `medicine_sales`, `district_medicine_lookup`;
+
+-- Rollback:
+-- ALTER TABLE `medicine_forecast` ADD INDEX `ix_medicine_forecast_forecast_date` (`forecast_date`),
+--   ADD INDEX `ix_medicine_forecast_district_id` (`district_id`);
+-- ALTER TABLE `medicine_forecast` DROP INDEX `idx_forecast_date_medicine`, DROP INDEX `idx_forecast_district_date`;
+-- ALTER TABLE `medicine_sales` ADD INDEX `ix_medicine_sales_district_id` (`district_id`);
+-- ALTER TABLE `medicine_sales` DROP INDEX `idx_sales_district_medicine_date`;
+-- ALTER TABLE `district_medicine_lookup` DROP INDEX `idx_lookup_district_formula`;
@@ -0,0 +1,35 @@
+-- Precomputed forecast accuracy (MySQL 8)
+-- One row per (medicine, district, day) that has a forecast, plus one per
+-- Monday-based week, holding forecast, actual sales and the error. Written by
+-- services/forecast_accuracy.py from the sales write paths and the nightly
+-- daily_forecast_accuracy job; read by GET /api/forecast/accuracy and the
+-- report generator.
+--
+-- The table starts empty; the first nightly run (or a manual
+-- run_daily_accuracy_refresh() in an app context) backfills it from the
+-- earliest forecast.
+
+USE `medicines_db`;
+
+CREATE TABLE `forecast_accuracy` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `medicine_id` INT NOT NULL,
+  `district_id` INT NOT NULL,
+  `period` VARCHAR(10) NOT NULL,
+  `period_start` DATE NOT NULL,
+  `forecasted_quantity` INT NOT NULL,
+  `actual_quantity` INT NOT NULL,
+  `absolute_error` INT NOT NULL,
+  `percentage_error` FLOAT NULL,
+  `updated_at` DATETIME NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `idx_accuracy_key` (`period`, `medicine_id`, `district_id`, `period_start`),
+  KEY `idx_accuracy_period_start` (`period`, `period_start`),
+  KEY `idx_accuracy_district_period` (`district_id`, `period`, `period_start`),
+  KEY `medicine_id` (`medicine_id`),
+  CONSTRAINT `forecast_accuracy_ibfk_1` FOREIGN KEY (`medicine_id`) REFERENCES `medicine` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `forecast_accuracy_ibfk_2` FOREIGN KEY (`district_id`) REFERENCES `district` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rollback:
+-- DROP TABLE `forecast_accuracy`;
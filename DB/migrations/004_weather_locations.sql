@@ -0,0 +1,31 @@
+-- Per-location weather (MySQL 8)
+-- weather_data gets a location key ("lat,lon", see
+-- services/weather_service.location_key) and is keyed on (location, date)
+-- instead of date alone; districts get optional coordinates to pick their
+-- location. Existing rows are the single Karachi series and keep that key.
+--
+-- Must run before the per-location weather code is deployed: while the old
+-- UNIQUE(date) index exists, upsert_weather_records' ON DUPLICATE KEY UPDATE
+-- matches it and overwrites one location's day with another's.
+
+USE `medicines_db`;
+
+ALTER TABLE `weather_data`
+  ADD COLUMN `location` varchar(32) NOT NULL DEFAULT '24.8607,67.0011' AFTER `id`;
+
+UPDATE `weather_data` SET `location` = '24.8607,67.0011';
+
+ALTER TABLE `weather_data`
+  DROP INDEX `ix_weather_data_date`,
+  ADD INDEX `ix_weather_data_date` (`date`),
+  ADD UNIQUE KEY `uq_weather_location_date` (`location`, `date`);
+
+ALTER TABLE `district`
+  ADD COLUMN `latitude` float NULL,
+  ADD COLUMN `longitude` float NULL;
+
+-- Rollback (keeps only the default location's rows, which UNIQUE(date) requires):
+-- DELETE FROM `weather_data` WHERE `location` <> '24.8607,67.0011';
+-- ALTER TABLE `weather_data` DROP INDEX `uq_weather_location_date`, DROP INDEX `ix_weather_data_date`,
+--   ADD UNIQUE KEY `ix_weather_data_date` (`date`), DROP COLUMN `location`;
+-- ALTER TABLE `district` DROP COLUMN `latitude`, DROP COLUMN `longitude`;
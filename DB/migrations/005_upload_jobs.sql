@@ -0,0 +1,41 @@
+-- Background upload jobs and their row errors (MySQL 8)
+-- upload_job tracks one uploaded file processed by services/upload_jobs.py;
+-- upload_job_error keeps the per-row messages served by
+-- GET /api/uploads/jobs/<id>/errors.
+-- Must exist before the async upload routes are deployed.
+
+USE `medicines_db`;
+
+CREATE TABLE `upload_job` (
+  `id` varchar(32) NOT NULL,
+  `upload_type` varchar(20) NOT NULL,
+  `file_name` varchar(255) NOT NULL,
+  `status` varchar(20) NOT NULL,
+  `user_id` int DEFAULT NULL,
+  `user_name` varchar(80) DEFAULT NULL,
+  `rows_processed` int NOT NULL,
+  `rows_failed` int NOT NULL,
+  `batches_committed` int NOT NULL,
+  `error` text,
+  `created_at` datetime DEFAULT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `ix_upload_job_created_at` (`created_at`),
+  KEY `user_id` (`user_id`),
+  CONSTRAINT `upload_job_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+CREATE TABLE `upload_job_error` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `job_id` varchar(32) NOT NULL,
+  `row_number` int NOT NULL,
+  `message` text NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `ix_upload_job_error_job_id` (`job_id`),
+  CONSTRAINT `upload_job_error_ibfk_1` FOREIGN KEY (`job_id`) REFERENCES `upload_job` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rollback:
+-- DROP TABLE `upload_job_error`;
+-- DROP TABLE `upload_job`;
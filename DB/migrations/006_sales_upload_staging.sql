@@ -0,0 +1,29 @@
+-- Staging table for set-wise sales upload ingest (MySQL 8)
+-- Rows of one upload (batch_id) are bulk-loaded here, resolved and validated
+-- with set-based statements, merged into medicine_sales and deleted again
+-- (services/sales_ingest.py, POST /medicines/sales/upload?mode=staging).
+
+USE `medicines_db`;
+
+CREATE TABLE `sales_upload_staging` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `batch_id` varchar(32) NOT NULL,
+  `row_number` int NOT NULL,
+  `district_name` varchar(100) DEFAULT NULL,
+  `formula_name` varchar(100) DEFAULT NULL,
+  `medicine_identifier` varchar(100) DEFAULT NULL,
+  `dosage` varchar(50) DEFAULT NULL,
+  `sale_date` date DEFAULT NULL,
+  `date_invalid` tinyint(1) NOT NULL,
+  `quantity` int NOT NULL,
+  `district_id` int DEFAULT NULL,
+  `formula_id` int DEFAULT NULL,
+  `medicine_id` int DEFAULT NULL,
+  `error` varchar(255) DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_sales_staging_batch_row` (`batch_id`, `row_number`),
+  KEY `idx_sales_staging_batch_key` (`batch_id`, `medicine_id`, `district_id`, `sale_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rollback:
+-- DROP TABLE `sales_upload_staging`;
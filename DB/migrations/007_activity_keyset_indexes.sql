@@ -0,0 +1,21 @@
+-- Keyset pagination indexes for the activity log (MySQL 8)
+-- GET /activities pages newest-first on (timestamp, id), optionally filtered
+-- by user, action or entity type. The single-column timestamp index is a
+-- prefix of idx_activity_timestamp_id and is dropped afterwards.
+
+USE `medicines_db`;
+
+ALTER TABLE `activity`
+  ADD INDEX `idx_activity_timestamp_id` (`timestamp`, `id`),
+  ADD INDEX `idx_activity_user_timestamp` (`user_id`, `timestamp`, `id`),
+  ADD INDEX `idx_activity_action_timestamp` (`action_type`, `timestamp`, `id`),
+  ADD INDEX `idx_activity_entity_timestamp` (`entity_type`, `timestamp`, `id`),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE `activity`
+  DROP INDEX `ix_activity_timestamp`;
+
+-- Rollback:
+-- ALTER TABLE `activity` ADD INDEX `ix_activity_timestamp` (`timestamp`);
+-- ALTER TABLE `activity` DROP INDEX `idx_activity_timestamp_id`, DROP INDEX `idx_activity_user_timestamp`,
+--   DROP INDEX `idx_activity_action_timestamp`, DROP INDEX `idx_activity_entity_timestamp`;
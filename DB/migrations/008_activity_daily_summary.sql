@@ -0,0 +1,20 @@
+-- Daily activity rollups kept after raw activity rows are archived (MySQL 8)
+-- Written by services/activity_retention.py (nightly job at 3:00 AM); one
+-- row per day, user and action type. No foreign key to user, so summaries
+-- outlive deleted users.
+
+USE `medicines_db`;
+
+CREATE TABLE `activity_daily_summary` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `day` date NOT NULL,
+  `user_id` int NOT NULL,
+  `user_name` varchar(80) NOT NULL,
+  `action_type` varchar(50) NOT NULL,
+  `activity_count` int NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_activity_summary_day_user_action` (`day`, `user_id`, `action_type`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Rollback:
+-- DROP TABLE `activity_daily_summary`;
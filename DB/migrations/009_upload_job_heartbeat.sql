@@ -0,0 +1,17 @@
+-- Upload job heartbeats (MySQL 8)
+-- upload_job.heartbeat_at is refreshed by the process that queued the job
+-- while it is queued or running. The scheduler's upload_job_sweep fails jobs
+-- whose heartbeat stopped (the process crashed or was restarted) instead of
+-- leaving them queued/running forever.
+--
+-- Jobs already stuck in queued/running have no heartbeat; the first sweep
+-- fails them by created_at.
+
+USE `medicines_db`;
+
+ALTER TABLE `upload_job`
+  ADD COLUMN `heartbeat_at` datetime DEFAULT NULL AFTER `finished_at`,
+  ADD KEY `idx_upload_job_status_heartbeat` (`status`, `heartbeat_at`);
+
+-- Rollback:
+-- ALTER TABLE `upload_job` DROP INDEX `idx_upload_job_status_heartbeat`, DROP COLUMN `heartbeat_at`;
@@ -0,0 +1,24 @@
+-- Unbounded text cells in sales_upload_staging (MySQL 8)
+-- The staging ingest loads raw upload cells before validating them. With
+-- varchar(100)/varchar(50) columns one over-long formula, medicine or dosage
+-- cell failed the whole bulk load under strict mode ("Data too long") instead
+-- of rejecting its row; error messages quote those cells, so error is text too.
+-- The table only holds rows of uploads in progress.
+
+USE `medicines_db`;
+
+ALTER TABLE `sales_upload_staging`
+  MODIFY `district_name` text DEFAULT NULL,
+  MODIFY `formula_name` text DEFAULT NULL,
+  MODIFY `medicine_identifier` text DEFAULT NULL,
+  MODIFY `dosage` text DEFAULT NULL,
+  MODIFY `error` text DEFAULT NULL;
+
+-- Rollback (run while no staging upload is in progress):
+-- DELETE FROM `sales_upload_staging`;
+-- ALTER TABLE `sales_upload_staging`
+--   MODIFY `district_name` varchar(100) DEFAULT NULL,
+--   MODIFY `formula_name` varchar(100) DEFAULT NULL,
+--   MODIFY `medicine_identifier` varchar(100) DEFAULT NULL,
+--   MODIFY `dosage` varchar(50) DEFAULT NULL,
+--   MODIFY `error` varchar(255) DEFAULT NULL;
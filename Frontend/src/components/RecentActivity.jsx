@@ -1,6 +1,13 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { activitiesAPI } from "../utils/api";
+import { API_URL } from "../config";
+
+const MAX_ITEMS = 10;
+// When the stream is refused (e.g. the server is at its open-stream limit) the
+// browser gives up on it, so poll instead and try the stream again later
+const POLL_INTERVAL_MS = 30000;
+const STREAM_RETRY_MS = 60000;
 
 export default function RecentActivity() {
   const [activities, setActivities] = useState([]);
@@ -8,18 +15,65 @@ export default function RecentActivity() {
   const navigate = useNavigate();
 
   useEffect(() => {
+    let source = null;
+    let pollTimer = null;
+    let retryTimer = null;
+
     fetchRecentActivities();
+
+    // New activities are pushed by the server; EventSource reconnects on its own
+    // after a dropped connection and resumes from the last event id it received
+    const openStream = () => {
+      source = new EventSource(`${API_URL}/activities/stream`);
+      source.addEventListener('activity', (e) => {
+        const activity = JSON.parse(e.data);
+        setActivities(prev =>
+          [activity, ...prev.filter(a => a.id !== activity.id)].slice(0, MAX_ITEMS)
+        );
+      });
+      source.onopen = () => {
+        // Back on the stream: catch up on anything missed while polling, then stop polling
+        if (pollTimer) {
+          clearInterval(pollTimer);
+          pollTimer = null;
+          refreshActivities();
+        }
+      };
+      source.onerror = () => {
+        // CONNECTING means the browser is already retrying; CLOSED means it gave up (non-200 response)
+        if (source.readyState !== EventSource.CLOSED) return;
+        source.close();
+        if (!pollTimer) {
+          refreshActivities();
+          pollTimer = setInterval(refreshActivities, POLL_INTERVAL_MS);
+        }
+        retryTimer = setTimeout(openStream, STREAM_RETRY_MS);
+      };
+    };
+    openStream();
+
+    return () => {
+      source.close();
+      clearInterval(pollTimer);
+      clearTimeout(retryTimer);
+    };
   }, []);
 
   const fetchRecentActivities = async () => {
     try {
       setLoading(true);
+      await refreshActivities();
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const refreshActivities = async () => {
+    try {
       const res = await activitiesAPI.getRecent();
       setActivities(res.data);
     } catch (err) {
       console.error("Error fetching recent activities:", err);
-    } finally {
-      setLoading(false);
     }
   };
 
@@ -1,5 +1,7 @@
-import React, { useState } from "react";
-import { medicinesAPI } from "../utils/api";
+import React, { useState, useEffect, useRef } from "react";
+import { medicinesAPI, uploadsAPI } from "../utils/api";
+
+const JOB_POLL_INTERVAL_MS = 1000;
 
 export default function SalesUpload({ isOpen, onClose, onSuccess }) {
   const [file, setFile] = useState(null);
@@ -7,6 +9,18 @@ export default function SalesUpload({ isOpen, onClose, onSuccess }) {
   const [error, setError] = useState("");
   const [errors, setErrors] = useState([]);
   const [success, setSuccess] = useState("");
+  const [job, setJob] = useState(null);
+  const pollRef = useRef(null);
+
+  const stopPolling = () => {
+    if (pollRef.current) {
+      clearInterval(pollRef.current);
+      pollRef.current = null;
+    }
+  };
+
+  // Stop polling when the modal unmounts
+  useEffect(() => stopPolling, []);
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
@@ -22,6 +36,7 @@ export default function SalesUpload({ isOpen, onClose, onSuccess }) {
       setError("");
       setErrors([]);
       setSuccess("");
+      setJob(null);
     }
   };
 
@@ -58,57 +73,108 @@ export default function SalesUpload({ isOpen, onClose, onSuccess }) {
     setError("");
     setErrors([]);
     setSuccess("");
+    setJob(null);
 
     const formData = new FormData();
     formData.append("file", file);
 
     try {
-      const response = await medicinesAPI.uploadSales(formData);
-      
-      setSuccess(
-        response.data.message || 
-        `Successfully uploaded sales data: ${response.data.records_processed} processed`
-      );
+      const response = await medicinesAPI.uploadSalesAsync(formData);
+      setJob(response.data.job);
       setFile(null);
       
       // Reset file input
       const fileInput = document.getElementById("sales-file-input");
       if (fileInput) fileInput.value = "";
       
-      // Call success callback but don't auto-close - let user read and close manually
-      onSuccess?.();
+      pollJob(response.data.jobId);
       
     } catch (err) {
-      console.error('Sales upload error:', err);
-      const errorData = err.response?.data || {};
-      
-      let errorMsg = "Failed to upload file. Please check the format and try again.";
-      
-      if (err.response) {
-        errorMsg = errorData.error || errorMsg;
+      handleUploadError(err);
+      setUploading(false);
+    }
+  };
+
+  const pollJob = (jobId) => {
+    stopPolling();
+    pollRef.current = setInterval(async () => {
+      try {
+        const response = await uploadsAPI.getJob(jobId);
+        const current = response.data;
+        setJob(current);
         
-        // Check for authentication errors
-        if (err.response.status === 401) {
-          errorMsg = "Authentication required. Please log in first.";
-        } else if (err.response.status === 403) {
-          errorMsg = "Access denied. You don't have permission to upload sales data.";
+        if (current.status === "completed") {
+          stopPolling();
+          setUploading(false);
+          let message = `Upload complete: ${current.rowsProcessed} sales records processed`;
+          if (current.rowsFailed > 0) {
+            message += `. ${current.rowsFailed} rows had errors - download the error report for details.`;
+          }
+          setSuccess(message);
+          // Call success callback but don't auto-close - let user read and close manually
+          onSuccess?.();
+        } else if (current.status === "failed") {
+          stopPolling();
+          setUploading(false);
+          setError(current.error || "Upload failed. Please check the format and try again.");
         }
-      } else if (err.request) {
-        errorMsg = "No response from server. Please check if the backend is running.";
+      } catch (err) {
+        stopPolling();
+        setUploading(false);
+        handleUploadError(err);
       }
+    }, JOB_POLL_INTERVAL_MS);
+  };
+
+  const handleUploadError = (err) => {
+    console.error('Sales upload error:', err);
+    const errorData = err.response?.data || {};
+    
+    let errorMsg = "Failed to upload file. Please check the format and try again.";
+    
+    if (err.response) {
+      errorMsg = errorData.error || errorMsg;
       
-      setError(errorMsg);
-      
-      // Display detailed validation errors if available
-      if (errorData.errors && Array.isArray(errorData.errors)) {
-        setErrors(errorData.errors);
+      // Check for authentication errors
+      if (err.response.status === 401) {
+        errorMsg = "Authentication required. Please log in first.";
+      } else if (err.response.status === 403) {
+        errorMsg = "Access denied. You don't have permission to upload sales data.";
       }
-    } finally {
-      setUploading(false);
+    } else if (err.request) {
+      errorMsg = "No response from server. Please check if the backend is running.";
+    }
+    
+    setError(errorMsg);
+    
+    // Display detailed validation errors if available
+    if (errorData.errors && Array.isArray(errorData.errors)) {
+      setErrors(errorData.errors);
+    }
+  };
+
+  const handleDownloadErrors = async () => {
+    try {
+      const response = await uploadsAPI.downloadJobErrors(job.id);
+      const blob = new Blob([response.data], { type: "text/csv" });
+      const url = window.URL.createObjectURL(blob);
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `${job.fileName.replace(/\.[^.]+$/, "")}_errors.csv`;
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      window.URL.revokeObjectURL(url);
+    } catch (err) {
+      setError("Failed to download error report");
+      console.error(err);
     }
   };
 
   const handleClose = () => {
+    stopPolling();
+    setUploading(false);
+    setJob(null);
     setFile(null);
     setError("");
     setErrors([]);
@@ -204,6 +270,42 @@ export default function SalesUpload({ isOpen, onClose, onSuccess }) {
             </div>
           </div>
 
+          {/* Job Progress */}
+          {job && (
+            <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
+              <div className="flex justify-between items-center mb-2">
+                <h4 className="text-sm font-semibold text-blue-900">
+                  📄 {job.fileName}
+                </h4>
+                <span className="text-xs font-medium uppercase text-blue-700">
+                  {job.status}
+                </span>
+              </div>
+              <div className="grid grid-cols-3 gap-3 text-sm text-blue-800">
+                <div>
+                  <p className="text-xs text-blue-600">Processed</p>
+                  <p className="font-semibold">{job.rowsProcessed.toLocaleString()}</p>
+                </div>
+                <div>
+                  <p className="text-xs text-blue-600">Failed</p>
+                  <p className="font-semibold">{job.rowsFailed.toLocaleString()}</p>
+                </div>
+                <div>
+                  <p className="text-xs text-blue-600">Rows / sec</p>
+                  <p className="font-semibold">{job.rowsPerSecond ?? "-"}</p>
+                </div>
+              </div>
+              {job.rowsFailed > 0 && job.status !== "running" && job.status !== "queued" && (
+                <button
+                  onClick={handleDownloadErrors}
+                  className="mt-3 bg-red-600 hover:bg-red-700 text-white px-4 py-2 rounded-lg text-sm font-medium transition-all"
+                >
+                  Download Error Report (CSV)
+                </button>
+              )}
+            </div>
+          )}
+
           {/* Error Message */}
           {error && (
             <div className="bg-red-50 border-l-4 border-red-500 text-red-700 p-4 rounded">
@@ -254,7 +356,7 @@ export default function SalesUpload({ isOpen, onClose, onSuccess }) {
                     <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4" />
                     <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z" />
                   </svg>
-                  Uploading...
+                  {job ? "Processing..." : "Uploading..."}
                 </span>
               ) : (
                 "Upload File"
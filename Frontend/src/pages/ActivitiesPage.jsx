@@ -1,26 +1,43 @@
 import { useState, useEffect } from "react";
 import { activitiesAPI } from "../utils/api";
 
+const PAGE_SIZE = 50;
+
 export default function ActivitiesPage() {
   const [activities, setActivities] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
   const [filterType, setFilterType] = useState("all");
   const [filterAction, setFilterAction] = useState("all");
+  const [knownTypes, setKnownTypes] = useState([]);
+  const [knownActions, setKnownActions] = useState([]);
 
+  // Type and action filters run on the server, so changing them reloads from the first page
   useEffect(() => {
     fetchActivities();
-  }, []);
+  }, [filterType, filterAction]);
 
-  const fetchActivities = async () => {
+  const fetchActivities = async (cursor = null) => {
     try {
-      setLoading(true);
-      const res = await activitiesAPI.getAll();
-      setActivities(res.data);
+      cursor ? setLoadingMore(true) : setLoading(true);
+      const params = { limit: PAGE_SIZE, includeDetails: true };
+      if (cursor) params.cursor = cursor;
+      if (filterType !== 'all') params.entityType = filterType;
+      if (filterAction !== 'all') params.actionType = filterAction;
+
+      const res = await activitiesAPI.getPage(params);
+      const page = res.data.activities;
+      setActivities(prev => cursor ? [...prev, ...page] : page);
+      setNextCursor(res.data.nextCursor);
+      setKnownTypes(prev => [...new Set([...prev, ...page.map(a => a.entityType)])]);
+      setKnownActions(prev => [...new Set([...prev, ...page.map(a => a.actionType)])]);
     } catch (err) {
       console.error("Error fetching activities:", err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -128,28 +145,20 @@ export default function ActivitiesPage() {
     });
   };
 
-  // Filter activities
+  // Search the loaded activities (type and action are filtered by the server)
   const filteredActivities = activities.filter(activity => {
-    // Search filter
     const searchLower = searchTerm.toLowerCase();
-    const matchesSearch = 
+    return (
       activity.userName.toLowerCase().includes(searchLower) ||
       activity.actionType.toLowerCase().includes(searchLower) ||
       activity.entityType.toLowerCase().includes(searchLower) ||
-      formatActivityMessage(activity).toLowerCase().includes(searchLower);
-
-    // Type filter
-    const matchesType = filterType === 'all' || activity.entityType === filterType;
-
-    // Action filter
-    const matchesAction = filterAction === 'all' || activity.actionType === filterAction;
-
-    return matchesSearch && matchesType && matchesAction;
+      formatActivityMessage(activity).toLowerCase().includes(searchLower)
+    );
   });
 
-  // Get unique entity types and action types for filters
-  const entityTypes = [...new Set(activities.map(a => a.entityType))];
-  const actionTypes = [...new Set(activities.map(a => a.actionType))];
+  // Entity types and action types seen so far, for the filters
+  const entityTypes = knownTypes;
+  const actionTypes = knownActions;
 
   if (loading) {
     return (
@@ -226,7 +235,7 @@ export default function ActivitiesPage() {
           </div>
 
           <p className="text-sm text-gray-600 mt-4">
-            Showing {filteredActivities.length} of {activities.length} activities
+            Showing {filteredActivities.length} of {activities.length} loaded activities
           </p>
         </div>
 
@@ -279,12 +288,23 @@ export default function ActivitiesPage() {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <div className="p-4 border-t border-gray-200 text-center">
+              <button
+                className="px-6 py-2 bg-primary-500 text-white rounded-lg font-semibold hover:bg-primary-600 transition-colors disabled:opacity-50"
+                onClick={() => fetchActivities(nextCursor)}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Summary Stats */}
         <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mt-6">
           <div className="bg-white p-4 rounded-lg shadow-md">
-            <p className="text-sm text-gray-600">Total Activities</p>
+            <p className="text-sm text-gray-600">Loaded Activities</p>
             <p className="text-2xl font-bold text-gray-900">{activities.length}</p>
           </div>
           <div className="bg-green-50 p-4 rounded-lg shadow-md">
@@ -90,6 +90,8 @@ export const medicinesAPI = {
   createSalesRecord: (data) => api.post('/api/medicines/sales', data),
   deleteSalesRecord: (id) => api.delete(`/api/medicines/sales/${id}`),
   uploadSales: (formData) => uploadFile('/api/medicines/sales/upload', formData),
+  // Queue the upload as a background job; poll uploadsAPI.getJob with the returned jobId
+  uploadSalesAsync: (formData) => uploadFile('/api/medicines/sales/upload?async=true', formData),
   downloadSalesTemplate: () => api.get('/api/medicines/sales/template', { responseType: 'blob' }),
   uploadStockAdjustments: (formData) => uploadFile('/api/medicines/stock/upload', formData),
   downloadStockTemplate: () => api.get('/api/medicines/stock/template', { responseType: 'blob' }),
@@ -138,8 +140,16 @@ export const formulasAPI = {
   getDistricts: (formulaId) => api.get(`/api/formulas/${formulaId}/districts`),
 };
 
+// Background upload jobs
+export const uploadsAPI = {
+  getJob: (jobId) => api.get(`/api/uploads/jobs/${jobId}`),
+  downloadJobErrors: (jobId) =>
+    api.get(`/api/uploads/jobs/${jobId}/errors`, { responseType: 'blob' }),
+};
+
 export const activitiesAPI = {
-  getAll: () => api.get('/api/activities'),
+  // params: { limit, cursor, userId, user, actionType, entityType, from, to, includeDetails }
+  getPage: (params = {}) => api.get('/api/activities', { params }),
   getRecent: () => api.get('/api/activities/recent'),
   getById: (id) => api.get(`/api/activities/${id}`),
 };
@@ -1,12 +1,18 @@
 import os
+from datetime import datetime
 from flask import Flask
 from dotenv import load_dotenv
 from flask_migrate import Migrate
 from flask_cors import CORS
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import text
 from database import db
 from models import Medicine
 from routes import api_bp
+from middleware.auth import require_role
+from utils.db_lock import db_lock
+from utils.db_pool import InstrumentedQueuePool, get_pool_stats
+from utils.warmup import get_warmup_status
 
 load_dotenv()
 
@@ -18,12 +24,56 @@ DB_NAME = os.getenv('DB_NAME', 'medicines_db')
 
 SQLALCHEMY_DATABASE_URI = f"mysql+mysqlconnector://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
 
+# Optional read replica for reporting and forecast reads (same credentials and schema)
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
+DB_REPLICA_URI = (
+    f"mysql+mysqlconnector://{DB_USERNAME}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}?charset=utf8mb4"
+    if DB_REPLICA_HOST else None
+)
+
+# Connection pool settings, applied to the primary and the replica engine
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Below MySQL's wait_timeout and any proxy idle timeout, so idle connections are replaced before they go stale
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+DB_ISOLATION_LEVEL = os.getenv('DB_ISOLATION_LEVEL')  # e.g. READ COMMITTED; server default if unset
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'poolclass': InstrumentedQueuePool,
+    'pool_size': DB_POOL_SIZE,
+    'max_overflow': DB_MAX_OVERFLOW,
+    'pool_timeout': DB_POOL_TIMEOUT,
+    'pool_recycle': DB_POOL_RECYCLE,
+    'pool_pre_ping': DB_POOL_PRE_PING,
+}
+if DB_ISOLATION_LEVEL:
+    SQLALCHEMY_ENGINE_OPTIONS['isolation_level'] = DB_ISOLATION_LEVEL
+
+# Binds don't inherit SQLALCHEMY_ENGINE_OPTIONS, so the replica gets its own copy
+SQLALCHEMY_BINDS = {'replica': {'url': DB_REPLICA_URI, **SQLALCHEMY_ENGINE_OPTIONS}} if DB_REPLICA_URI else {}
+
 # Initialize scheduler
 scheduler = BackgroundScheduler()
 
+INITIAL_WEATHER_TASK = 'initial_weather_update'
+WEATHER_UPDATE_LOCK = 'medicine_app.weather_update'
+ACTIVITY_RETENTION_LOCK = 'medicine_app.activity_retention'
+FORECAST_ACCURACY_LOCK = 'medicine_app.forecast_accuracy'
+SALES_SNAPSHOT_LOCK = 'medicine_app.sales_snapshot'
+
 def create_app():
+    # Fork-based servers can import heavy dependencies once in the master
+    if os.getenv('PRELOAD_MODULES', 'false').lower() == 'true':
+        from utils.preload import preload_modules
+        preload_modules()
+
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_BINDS'] = SQLALCHEMY_BINDS
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = SQLALCHEMY_ENGINE_OPTIONS
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     CORS(app, 
@@ -35,7 +85,7 @@ def create_app():
          ], 
          supports_credentials=True,
          allow_headers=["Content-Type", "Authorization"],
-         expose_headers=["Content-Type", "Authorization", "Content-Disposition"])
+         expose_headers=["Content-Type", "Authorization", "Content-Disposition", "X-Total-Count"])
     
     db.init_app(app)
     migrate = Migrate(app, db)
@@ -46,46 +96,212 @@ def create_app():
     def index():
         return {'message': 'Medicine API running'}
 
-    # Setup daily weather update scheduler
-    if not scheduler.running:
-        with app.app_context():
-            from services.weather_service import update_weather_database
-            
-            # Schedule daily update at 6:00 AM
-            scheduler.add_job(
-                func=lambda: update_weather_with_context(app),
-                trigger="cron",
-                hour=6,
-                minute=0,
-                id='daily_weather_update',
-                name='Update weather forecast daily',
-                replace_existing=True
-            )
-            
-            # Run immediately on startup
-            try:
-                print("Running initial weather forecast update...")
-                update_weather_database()
-                print("Initial weather forecast update completed")
-            except Exception as e:
-                print(f"Initial weather update failed: {e}")
-            
-            scheduler.start()
-            print("Weather forecast scheduler started - daily updates at 6:00 AM")
+    @app.route('/ready')
+    def ready():
+        """
+        Readiness probe: 200 once the database answers and this process's warm-up
+        tasks have finished. The initial weather update runs only in the worker
+        that holds the scheduler, so it doesn't gate readiness; weatherForecast
+        reports whether today's forecast is stored, read from the database so
+        every worker gives the same answer.
+        """
+        from services.weather_service import has_current_forecast
+        try:
+            db.session.execute(text('SELECT 1'))
+            database = 'ok'
+            weather_forecast = 'current' if has_current_forecast() else 'pending'
+        except Exception as e:
+            database = f'error: {e}'
+            weather_forecast = 'unknown'
+        warmed_up, tasks = get_warmup_status()
+        is_ready = database == 'ok' and warmed_up
+        return {
+            'ready': is_ready, 'database': database, 'warmup': tasks, 'weatherForecast': weather_forecast
+        }, (200 if is_ready else 503)
+
+    @app.route('/metrics/pool')
+    @require_role('admin')
+    def pool_metrics(**kwargs):
+        """Live connection pool stats of this process for the primary and, if configured, the replica engine (admin only)"""
+        return {
+            (key or 'primary'): get_pool_stats(engine)
+            for key, engine in db.engines.items()
+        }
+
+    @app.route('/metrics/activity')
+    @require_role('admin')
+    def activity_metrics(**kwargs):
+        """Activity log writer stats of this process and the retention job's last run (admin only)"""
+        from utils.activity_logger import get_activity_log_stats
+        from services.activity_retention import get_retention_metrics
+        return {'writer': get_activity_log_stats(), 'retention': get_retention_metrics()}
+
+    # Setup daily weather update scheduler (production servers start it in one process only)
+    if os.getenv('RUN_SCHEDULER', 'true').lower() == 'true':
+        start_scheduler(app)
 
     return app
 
-def update_weather_with_context(app):
-    """Helper function to run weather update with Flask app context"""
+def start_scheduler(app):
+    """Schedule the weather, activity retention, forecast accuracy, sales snapshot and upload job sweep jobs and start the background scheduler in this process"""
+    if scheduler.running:
+        return
+    
+    # Schedule daily update at 6:00 AM
+    scheduler.add_job(
+        func=lambda: update_weather_with_context(app),
+        trigger="cron",
+        hour=6,
+        minute=0,
+        id='daily_weather_update',
+        name='Update weather forecast daily',
+        replace_existing=True
+    )
+    
+    # Summarize and archive old activity log rows at 3:00 AM
+    scheduler.add_job(
+        func=lambda: run_activity_retention_with_context(app),
+        trigger="cron",
+        hour=3,
+        minute=0,
+        id='daily_activity_retention',
+        name='Archive old activity log entries',
+        replace_existing=True
+    )
+    
+    # Score yesterday's forecasts, including days without sales, at 2:00 AM
+    scheduler.add_job(
+        func=lambda: run_forecast_accuracy_with_context(app),
+        trigger="cron",
+        hour=2,
+        minute=0,
+        id='daily_forecast_accuracy',
+        name='Score forecasts against actual sales',
+        replace_existing=True
+    )
+    
+    # Re-export the columnar daily sales snapshot at 2:30 AM
+    scheduler.add_job(
+        func=lambda: run_sales_snapshot_with_context(app),
+        trigger="cron",
+        hour=2,
+        minute=30,
+        id='daily_sales_snapshot',
+        name='Export daily sales snapshot',
+        replace_existing=True
+    )
+    
+    # Fail upload jobs orphaned by a crashed or restarted process, at startup and every 5 minutes
+    scheduler.add_job(
+        func=lambda: run_upload_job_sweep_with_context(app),
+        trigger="interval",
+        minutes=5,
+        next_run_time=datetime.now(),
+        id='upload_job_sweep',
+        name='Fail orphaned upload jobs',
+        replace_existing=True
+    )
+    
+    # Run the initial update right away on the scheduler's thread so startup
+    # doesn't wait on the network; /ready reports whether today's forecast is stored
+    scheduler.add_job(
+        func=lambda: update_weather_with_context(app, initial=True),
+        trigger="date",
+        id=INITIAL_WEATHER_TASK,
+        name='Initial weather forecast update',
+        replace_existing=True
+    )
+    
+    scheduler.start()
+    print("Weather forecast scheduler started - daily updates at 6:00 AM")
+
+def update_weather_with_context(app, initial=False):
+    """
+    Helper function to run weather update with Flask app context
+    Holds a database lock so only one process updates at a time. The initial
+    update at startup is also skipped if today's forecast is already stored.
+    """
     with app.app_context():
-        from services.weather_service import update_weather_database
+        from services.weather_service import update_weather_database, has_current_forecast
         try:
-            update_weather_database()
-            print("Scheduled weather forecast update completed")
+            with db_lock(WEATHER_UPDATE_LOCK) as acquired:
+                if not acquired:
+                    print("Weather update already running in another process - skipped")
+                elif initial and has_current_forecast():
+                    print("Today's weather forecast is already stored - initial update skipped")
+                else:
+                    update_weather_database()
+                    print("Scheduled weather forecast update completed")
         except Exception as e:
             print(f"Scheduled weather update failed: {e}")
+        finally:
+            db.session.remove()
+
+def run_activity_retention_with_context(app):
+    """Run the activity retention job with app context, in one process at a time"""
+    with app.app_context():
+        from services.activity_retention import run_activity_retention
+        try:
+            with db_lock(ACTIVITY_RETENTION_LOCK) as acquired:
+                if not acquired:
+                    print("Activity retention already running in another process - skipped")
+                    return
+                result = run_activity_retention()
+                print(f"Activity retention {result['status']}: {result['rowsArchived']} rows archived, "
+                      f"{result['daysRolledUp']} days summarized")
+        except Exception as e:
+            print(f"Activity retention failed: {e}")
+        finally:
+            db.session.remove()
+
+def run_forecast_accuracy_with_context(app):
+    """Run the nightly forecast accuracy refresh with app context, in one process at a time"""
+    with app.app_context():
+        from services.forecast_accuracy import run_daily_accuracy_refresh
+        try:
+            with db_lock(FORECAST_ACCURACY_LOCK) as acquired:
+                if not acquired:
+                    print("Forecast accuracy refresh already running in another process - skipped")
+                    return
+                result = run_daily_accuracy_refresh()
+                print(f"Forecast accuracy refreshed from {result['from']}: {result['rowsWritten']} rows")
+        except Exception as e:
+            print(f"Forecast accuracy refresh failed: {e}")
+        finally:
+            db.session.remove()
+
+def run_sales_snapshot_with_context(app):
+    """Export the sales snapshot with app context, in one process at a time"""
+    with app.app_context():
+        from services.sales_snapshot import export_sales_snapshot
+        try:
+            with db_lock(SALES_SNAPSHOT_LOCK) as acquired:
+                if not acquired:
+                    print("Sales snapshot export already running in another process - skipped")
+                    return
+                result = export_sales_snapshot()
+                print(f"Sales snapshot exported: {len(result['years'])} years, {result['series']} series "
+                      f"in {result['durationSeconds']}s")
+        except Exception as e:
+            print(f"Sales snapshot export failed: {e}")
+        finally:
+            db.session.remove()
+
+def run_upload_job_sweep_with_context(app):
+    """Fail upload jobs whose process died and remove their saved files, with app context"""
+    with app.app_context():
+        from services.upload_jobs import fail_orphaned_upload_jobs
+        try:
+            failed = fail_orphaned_upload_jobs()
+            if failed:
+                print(f"Marked {failed} orphaned upload jobs as failed")
+        except Exception as e:
+            print(f"Upload job sweep failed: {e}")
+        finally:
+            db.session.remove()
 
 if __name__ == '__main__':
+    # Development server; use wsgi.py with gunicorn.conf.py in production
     app = create_app()
     try:
         app.run(debug=True, port=5001, use_reloader=False)  
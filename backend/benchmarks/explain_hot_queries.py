@@ -0,0 +1,167 @@
+"""
+Index check for the hot read queries
+Runs EXPLAIN on each query shape the forecast, medicine catalog and district
+routes issue most, prints the plan and exits non-zero if any of them reads
+its main table with a full table or full index scan. Run it after schema
+changes (see DB/migrations/002_hot_query_indexes.sql).
+
+Query parameters (a district/formula pair from district_medicine_lookup and
+its medicines) are taken from the database, so run it against a copy of real
+data for plans that match production.
+
+Usage (from backend/):
+    python benchmarks/explain_hot_queries.py
+    python benchmarks/explain_hot_queries.py --database-url sqlite:////tmp/medicines.db
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('RUN_SCHEDULER', 'false')
+
+from sqlalchemy import select, func  # noqa: E402
+
+
+def hot_queries(params):
+    """(name, main table, statement) for each hot query shape"""
+    from models import MedicineSales, MedicineForecast, Medicine, DistrictMedicineLookup
+
+    today = date.today()
+    window_end = today + timedelta(days=14)
+    district_id, formula_id, medicine_ids = params['district_id'], params['formula_id'], params['medicine_ids']
+
+    return [
+        # GET /medicines and /medicines/stats: 14-day forecast per medicine, all districts
+        ('forecast window per medicine', 'medicine_forecast', select(
+            MedicineForecast.medicine_id, func.sum(MedicineForecast.forecasted_quantity)
+        ).where(
+            MedicineForecast.forecast_date >= today,
+            MedicineForecast.forecast_date < window_end
+        ).group_by(MedicineForecast.medicine_id)),
+
+        # GET /forecast and /forecast/prophet: district forecast per day
+        ('district forecast per day', 'medicine_forecast', select(
+            MedicineForecast.forecast_date, func.sum(MedicineForecast.forecasted_quantity)
+        ).where(
+            MedicineForecast.medicine_id.in_(medicine_ids),
+            MedicineForecast.district_id == district_id,
+            MedicineForecast.forecast_date >= today,
+            MedicineForecast.forecast_date < window_end
+        ).group_by(MedicineForecast.forecast_date).order_by(MedicineForecast.forecast_date)),
+
+        # GET /districts/<id>/formulas/<id>/medicines: district forecast per medicine
+        ('district forecast per medicine', 'medicine_forecast', select(
+            MedicineForecast.medicine_id, func.sum(MedicineForecast.forecasted_quantity)
+        ).where(
+            MedicineForecast.district_id == district_id,
+            MedicineForecast.forecast_date >= today,
+            MedicineForecast.forecast_date < window_end,
+            MedicineForecast.medicine_id.in_(medicine_ids)
+        ).group_by(MedicineForecast.medicine_id)),
+
+        # GET /forecast: sales history of a formula in a district
+        ('district sales per day', 'medicine_sales', select(
+            MedicineSales.date, func.sum(MedicineSales.quantity)
+        ).where(
+            MedicineSales.medicine_id.in_(medicine_ids),
+            MedicineSales.district_id == district_id,
+            MedicineSales.date >= today - timedelta(days=365)
+        ).group_by(MedicineSales.date).order_by(MedicineSales.date)),
+
+        # GET /districts/<id>/formulas/<id>/medicines: medicines sold in a district
+        ('medicines sold in district', 'medicine_sales', select(
+            MedicineSales.medicine_id
+        ).where(MedicineSales.district_id == district_id).distinct()),
+
+        # GET /forecast: medicines of a formula assigned to a district
+        ('lookup by district and formula', 'district_medicine_lookup', select(Medicine).join(
+            DistrictMedicineLookup, Medicine.id == DistrictMedicineLookup.medicine_id
+        ).where(
+            DistrictMedicineLookup.district_id == district_id,
+            DistrictMedicineLookup.formula_id == formula_id
+        )),
+    ]
+
+
+def sample_params(session):
+    """A district/formula pair with assigned medicines, or placeholder ids on an empty database"""
+    from models import Medicine, DistrictMedicineLookup
+
+    row = session.execute(
+        select(DistrictMedicineLookup.district_id, DistrictMedicineLookup.formula_id).limit(1)
+    ).first()
+    district_id, formula_id = row if row else (1, 1)
+    medicine_ids = session.execute(select(Medicine.id).where(Medicine.formula_id == formula_id)).scalars().all()
+    return {'district_id': district_id, 'formula_id': formula_id, 'medicine_ids': medicine_ids or [1]}
+
+
+def explain(conn, statement):
+    """
+    EXPLAIN a statement.
+
+    Returns:
+        tuple: (plan lines, list of tables read with a full scan)
+    """
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    sql = str(compiled)
+
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').all()
+        lines = [row[-1] for row in rows]
+        # 'SCAN t' reads every row; 'SEARCH t USING INDEX ...' is a range or lookup
+        full_scans = [match.group(1) for match in (re.match(r'SCAN (\w+)', line) for line in lines) if match]
+        return lines, full_scans
+
+    rows = conn.exec_driver_sql(f'EXPLAIN {sql}').mappings().all()
+    lines = [
+        f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row.get('Extra') or ''}".rstrip()
+        for row in rows
+    ]
+    # ALL is a table scan, index a scan of a whole index
+    full_scans = [row['table'] for row in rows if row['type'] in ('ALL', 'index')]
+    return lines, full_scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN the hot read queries and fail on full scans')
+    parser.add_argument('--database-url', help='Database to check (default: the app configuration)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        from flask import Flask
+        from database import db
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_url
+        db.init_app(app)
+    else:
+        from app import create_app
+        from database import db
+        app = create_app()
+
+    failures = []
+    with app.app_context():
+        params = sample_params(db.session)
+        print(f"district_id={params['district_id']} formula_id={params['formula_id']} "
+              f"medicines={len(params['medicine_ids'])} ({db.engine.dialect.name})\n")
+        with db.engine.connect() as conn:
+            for name, table, statement in hot_queries(params):
+                lines, full_scans = explain(conn, statement)
+                ok = table not in full_scans
+                print(f"[{'ok' if ok else 'FULL SCAN'}] {name}")
+                for line in lines:
+                    print(f"    {line}")
+                if not ok:
+                    failures.append(name)
+
+    if failures:
+        print(f"\n{len(failures)} hot queries scan their whole table: {', '.join(failures)}")
+        sys.exit(1)
+    print('\nAll hot queries use an index')
+
+
+if __name__ == '__main__':
+    main()
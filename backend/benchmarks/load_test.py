@@ -0,0 +1,138 @@
+"""
+Load test for the production server
+Starts gunicorn (gunicorn.conf.py) with each worker count in turn, waits for
+/ready, then sends requests from concurrent client threads for a fixed time
+and reports throughput and latency per worker count.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --workers 1 2 4
+    python benchmarks/load_test.py --path /api/forecast/metadata/medicines --header "Authorization: Bearer <token>"
+    python benchmarks/load_test.py --url http://localhost:5001   # test an already-running server
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_ready(base_url, timeout):
+    """Poll /ready until the server reports ready or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def run_load(url, headers, concurrency, duration):
+    """Send requests from `concurrency` threads for `duration` seconds. Returns (latencies in s, errors)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        local_latencies, local_errors = [], 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                request = urllib.request.Request(url, headers=headers)
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                local_latencies.append(time.perf_counter() - started)
+            except Exception:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def report(label, latencies, errors, duration):
+    """Print throughput and latency percentiles for one run"""
+    if not latencies:
+        print(f'{label:>12}  no successful requests ({errors} errors)')
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(
+        f'{label:>12}  {len(latencies) / duration:8.1f} req/s  '
+        f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+        f'p95 {p95 * 1000:7.1f} ms  errors {errors}'
+    )
+
+
+def start_server(workers, threads, port):
+    """Start gunicorn with the given worker count"""
+    env = {
+        **os.environ,
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+    }
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '', 'wsgi:application'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker counts to compare')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per worker')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--path', default='/api/medicines', help='Endpoint to request')
+    parser.add_argument('--header', action='append', default=[], help='Extra request header, "Name: value"')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client threads')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per run')
+    parser.add_argument('--ready-timeout', type=float, default=120, help='Seconds to wait for /ready')
+    parser.add_argument('--url', help='Base URL of an already-running server (skips starting gunicorn)')
+    args = parser.parse_args()
+
+    headers = dict(h.split(':', 1) for h in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+    print(f'GET {args.path}  concurrency {args.concurrency}  {args.duration:g}s per run')
+
+    if args.url:
+        base_url = args.url.rstrip('/')
+        if not wait_until_ready(base_url, args.ready_timeout):
+            sys.exit(f'{base_url} did not become ready')
+        latencies, errors = run_load(base_url + args.path, headers, args.concurrency, args.duration)
+        report('server', latencies, errors, args.duration)
+        return
+
+    for workers in args.workers:
+        server = start_server(workers, args.threads, args.port)
+        base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            if not wait_until_ready(base_url, args.ready_timeout):
+                print(f'{workers:>3} workers  server did not become ready')
+                continue
+            latencies, errors = run_load(base_url + args.path, headers, args.concurrency, args.duration)
+            report(f'{workers} workers', latencies, errors, args.duration)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup import-time benchmark
+Imports a module in a fresh interpreter with `python -X importtime` and reports
+the total import time, peak memory and the packages that cost the most.
+
+Usage (from backend/):
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --module app --repeat 5 --top 15
+    python benchmarks/startup_importtime.py --save benchmarks/startup_importtime.txt
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Only used to measure peak memory of the child process
+MEASURE = (
+    "import resource, sys\n"
+    "import {module}\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stdout)\n"
+)
+
+
+def run_once(module):
+    """Import the module in a fresh interpreter. Returns (total_us, per-package self us, peak rss KB)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', MEASURE.format(module=module)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{result.stderr[-2000:]}')
+
+    total = 0
+    per_package = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        per_package[name.split('.')[0]] += int(self_us)
+        if len(indent) == 1:  # top-level import
+            total += int(cumulative_us)
+    peak_rss = int(result.stdout.strip().splitlines()[-1])
+    return total, per_package, peak_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='routes', help='Module to import (default: routes)')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters to run (default: 3)')
+    parser.add_argument('--top', type=int, default=10, help='Packages to list (default: 10)')
+    parser.add_argument('--save', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.repeat)]
+    totals = [total for total, _, _ in runs]
+    median_run = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+
+    lines = [
+        f'import {args.module}: median {statistics.median(totals) / 1000:.1f} ms '
+        f'(min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms, {args.repeat} runs)',
+        f'peak RSS: {max(rss for _, _, rss in runs) / 1024:.1f} MB',
+        f'slowest packages (self time, median run):',
+    ]
+    for name, self_us in sorted(median_run[1].items(), key=lambda item: -item[1])[:args.top]:
+        lines.append(f'  {name:<30} {self_us / 1000:8.1f} ms')
+    report = '\n'.join(lines)
+
+    print(report)
+    if args.save:
+        with open(args.save, 'w') as f:
+            f.write(f'python {sys.version.split()[0]}\n{report}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,53 +5,178 @@ import pandas as pd
 import joblib
 from pathlib import Path
 import sys
+import threading
+import glob
+import hashlib
 
+MODELS_DIR = Path(__file__).resolve().parent / "models"
+HISTORY_CACHE_DIR = Path(__file__).resolve().parent / "cache"
 
-def generate_forecast(medicine_name: str, data_path: Path, periods: int = 4):
+# Loaded Prophet models: path -> (file mtime, model). A retrained model file
+# has a new mtime and is loaded again on next use.
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+
+# Weekly sales history per data file: path -> ((mtime, size), frame)
+_history_cache = {}
+_history_cache_lock = threading.Lock()
+
+
+def get_model_path(medicine_name: str) -> Path:
+    """Path of the trained weekly Prophet model for a medicine"""
+    return MODELS_DIR / f"prophet_{medicine_name.lower()}_weekly.pkl"
+
+
+def load_model(medicine_name: str):
     """
-    Generate forecast for a medicine using a trained Prophet model.
+    Load a trained Prophet model, reusing the in-memory copy while the file is unchanged.
     
-    Args:
-        medicine_name: Name of the medicine (e.g., 'calpol')
-        data_path: Path to historical sales CSV with columns 'Date' and 'Units'
-        periods: Number of weeks to forecast (default: 4)
-    
-    Returns:
-        Dictionary with historical data and forecast predictions
+    Raises:
+        FileNotFoundError: If the model hasn't been trained
     """
-    base_dir = Path(__file__).resolve().parent
-    models_path = base_dir / "models" / f"prophet_{medicine_name.lower()}_weekly.pkl"
-    
-    # Check if model exists
+    models_path = get_model_path(medicine_name)
     if not models_path.exists():
         raise FileNotFoundError(f"Model not found: {models_path}. Please train the model first.")
     
-    # Check if data file exists
-    if not data_path.exists():
-        raise FileNotFoundError(f"Data file not found: {data_path}")
+    mtime = models_path.stat().st_mtime_ns
+    with _model_cache_lock:
+        cached = _model_cache.get(models_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    print(f"Loading Prophet model from: {models_path}")
+    model = joblib.load(models_path)
+    with _model_cache_lock:
+        _model_cache[models_path] = (mtime, model)
+    return model
+
+
+def preload_models():
+    """
+    Load every trained model into memory, e.g. in a pre-fork server's master
+    so workers share them copy-on-write.
     
-    # Load and process historical data
+    Returns:
+        List of medicine names whose models were loaded
+    """
+    loaded = []
+    for path in sorted(MODELS_DIR.glob("prophet_*_weekly.pkl")):
+        medicine_name = path.name[len("prophet_"):-len("_weekly.pkl")]
+        load_model(medicine_name)
+        loaded.append(medicine_name)
+    return loaded
+
+
+def _read_weekly_csv(data_path: Path) -> pd.DataFrame:
+    """Parse a sales CSV ('Date', 'Units') and aggregate it to weekly ds/y rows"""
     print(f"Loading data from: {data_path}")
-    df = pd.read_csv(data_path)
+    df = pd.read_csv(data_path, usecols=["Date", "Units"])
     df = df.rename(columns={"Date": "ds", "Units": "y"})
     df["ds"] = pd.to_datetime(df["ds"], errors='coerce')
     df = df.dropna(subset=["ds", "y"])
     
     # Aggregate to weekly data
-    df = df.resample("W", on="ds").sum().reset_index()
+    return df.resample("W", on="ds").sum().reset_index()
+
+
+def _read_sidecar(sidecar: Path):
+    """Weekly frame from a memory-mapped sidecar, or None if it is missing or unreadable"""
+    import numpy as np
+    
+    try:
+        weeks = np.load(sidecar, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame({"ds": weeks["ds"], "y": weeks["y"]})
+
+
+def _sidecar_prefix(data_path: Path) -> str:
+    """
+    Sidecar name prefix of a data file: its full stem plus a short hash of its
+    resolved path, so files with the same name in different directories don't
+    share sidecars
+    """
+    path_hash = hashlib.sha1(str(data_path.resolve()).encode()).hexdigest()[:10]
+    return f"{data_path.stem}-{path_hash}"
+
+
+def _write_sidecar(sidecar: Path, prefix: str, df: pd.DataFrame):
+    """Store a weekly frame as a structured .npy; older versions with the same prefix are removed"""
+    import numpy as np
+    
+    ds, y = df["ds"].to_numpy(), df["y"].to_numpy()
+    weeks = np.empty(len(df), dtype=[("ds", ds.dtype), ("y", y.dtype)])
+    weeks["ds"], weeks["y"] = ds, y
+    try:
+        HISTORY_CACHE_DIR.mkdir(exist_ok=True)
+        temp_path = sidecar.with_name(sidecar.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            np.save(f, weeks)
+        temp_path.replace(sidecar)
+        for old in HISTORY_CACHE_DIR.glob(f"{glob.escape(prefix)}.*.weekly.npy"):
+            if old != sidecar:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Could not write weekly history cache {sidecar}: {e}")
+
+
+def load_weekly_history(data_path: Path) -> pd.DataFrame:
+    """
+    Weekly ds/y sales history from a CSV with columns 'Date' and 'Units'.
+    The resampled frame is kept in memory and in a memory-mapped .npy sidecar
+    under cache/, both keyed by the CSV's mtime and size, so each version of
+    the file is parsed once. Treat the returned frame as read-only.
+    
+    Raises:
+        FileNotFoundError: If the data file doesn't exist
+    """
+    data_path = Path(data_path)
+    try:
+        stat = data_path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Data file not found: {data_path}")
+    
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = data_path.resolve()
+    with _history_cache_lock:
+        cached = _history_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    prefix = _sidecar_prefix(data_path)
+    sidecar = HISTORY_CACHE_DIR / f"{prefix}.{version[0]}-{version[1]}.weekly.npy"
+    df = _read_sidecar(sidecar)
+    if df is None:
+        df = _read_weekly_csv(data_path)
+        _write_sidecar(sidecar, prefix, df)
+    with _history_cache_lock:
+        _history_cache[key] = (version, df)
+    return df
+
+
+def _run_forecast(medicine_name: str, data_path: Path, periods: int, history: pd.DataFrame = None):
+    """Weekly history and the model's full forecast frame (history plus `periods` future weeks)"""
+    models_path = get_model_path(medicine_name)
+    
+    # Check if model exists
+    if not models_path.exists():
+        raise FileNotFoundError(f"Model not found: {models_path}. Please train the model first.")
+    
+    df = history if history is not None else load_weekly_history(data_path)
     
     # Load the trained model
-    print(f"Loading Prophet model from: {models_path}")
-    model = joblib.load(models_path)
+    model = load_model(medicine_name)
     
     # Generate forecast
     future = model.make_future_dataframe(periods=periods, freq="W")
-    forecast = model.predict(future)
-    
+    return df, model.predict(future)
+
+
+def _forecast_result(medicine_name: str, periods: int, df: pd.DataFrame, forecast: pd.DataFrame):
+    """Historical data and future predictions in JSON-friendly format"""
     # Extract only future predictions
     future_forecast = forecast.tail(periods)
     
-    # Return data in JSON-friendly format
     return {
         "medicine_name": medicine_name,
         "periods": periods,
@@ -60,7 +185,25 @@ def generate_forecast(medicine_name: str, data_path: Path, periods: int = 4):
     }
 
 
-def generate_forecast_plot(medicine_name: str, data_path: Path, periods: int = 4):
+def generate_forecast(medicine_name: str, data_path: Path, periods: int = 4, history: pd.DataFrame = None):
+    """
+    Generate forecast for a medicine using a trained Prophet model.
+    
+    Args:
+        medicine_name: Name of the medicine (e.g., 'calpol')
+        data_path: Path to historical sales CSV with columns 'Date' and 'Units'
+        periods: Number of weeks to forecast (default: 4)
+        history: Weekly ds/y frame to use instead of data_path, e.g.
+            services.sales_snapshot.weekly_history()
+    
+    Returns:
+        Dictionary with historical data and forecast predictions
+    """
+    df, forecast = _run_forecast(medicine_name, data_path, periods, history)
+    return _forecast_result(medicine_name, periods, df, forecast)
+
+
+def generate_forecast_plot(medicine_name: str, data_path: Path, periods: int = 4, history: pd.DataFrame = None):
     """
     Generate forecast with visualization plot.
     
@@ -68,6 +211,7 @@ def generate_forecast_plot(medicine_name: str, data_path: Path, periods: int = 4
         medicine_name: Name of the medicine
         data_path: Path to historical sales CSV
         periods: Number of weeks to forecast
+        history: Weekly ds/y frame to use instead of data_path
     
     Returns:
         Tuple of (forecast_data, plot_path)
@@ -75,21 +219,11 @@ def generate_forecast_plot(medicine_name: str, data_path: Path, periods: int = 4
     import matplotlib.pyplot as plt
     
     base_dir = Path(__file__).resolve().parent
-    models_path = base_dir / "models" / f"prophet_{medicine_name.lower()}_weekly.pkl"
     outputs_dir = base_dir / "outputs"
     outputs_dir.mkdir(exist_ok=True)
     
-    # Load data
-    df = pd.read_csv(data_path)
-    df = df.rename(columns={"Date": "ds", "Units": "y"})
-    df["ds"] = pd.to_datetime(df["ds"], errors='coerce')
-    df = df.dropna(subset=["ds", "y"])
-    df = df.resample("W", on="ds").sum().reset_index()
-    
-    # Load model and generate forecast
-    model = joblib.load(models_path)
-    future = model.make_future_dataframe(periods=periods, freq="W")
-    forecast = model.predict(future)
+    # Load data and generate the forecast once for both the plot and the result
+    df, forecast = _run_forecast(medicine_name, data_path, periods, history)
     
     # Create plot
     plt.figure(figsize=(10, 6))
@@ -110,8 +244,7 @@ def generate_forecast_plot(medicine_name: str, data_path: Path, periods: int = 4
     
     print(f"✓ Forecast plot saved to: {plot_path}")
     
-    # Return forecast data
-    return generate_forecast(medicine_name, data_path, periods), plot_path
+    return _forecast_result(medicine_name, periods, df, forecast), plot_path
 
 
 if __name__ == "__main__":
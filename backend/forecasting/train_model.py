@@ -8,13 +8,15 @@ from pathlib import Path
 import sys
 
 
-def train_forecast_model(medicine_name: str, data_path: Path):
+def train_forecast_model(medicine_name: str, data_path: Path, history: pd.DataFrame = None):
     """
     Train a Prophet model for a specific medicine.
     
     Args:
         medicine_name: Name of the medicine (e.g., 'calpol')
         data_path: Path to CSV file with columns 'Date' and 'Units'
+        history: Weekly ds/y frame to train on instead of data_path, e.g.
+            services.sales_snapshot.weekly_history()
     
     Returns:
         Path to the saved model file
@@ -23,15 +25,18 @@ def train_forecast_model(medicine_name: str, data_path: Path):
     models_dir = base_dir / "models"
     models_dir.mkdir(exist_ok=True)
     
-    print(f"Loading data from: {data_path}")
-    df = pd.read_csv(data_path)
-    
-    # Rename columns to Prophet's expected format
-    df = df.rename(columns={"Date": "ds", "Units": "y"})
-    df["ds"] = pd.to_datetime(df["ds"])
-    
-    # Aggregate to weekly data
-    df = df.resample("W", on="ds").sum().reset_index()
+    if history is not None:
+        df = history
+    else:
+        print(f"Loading data from: {data_path}")
+        df = pd.read_csv(data_path)
+        
+        # Rename columns to Prophet's expected format
+        df = df.rename(columns={"Date": "ds", "Units": "y"})
+        df["ds"] = pd.to_datetime(df["ds"])
+        
+        # Aggregate to weekly data
+        df = df.resample("W", on="ds").sum().reset_index()
     
     print(f"Training Prophet model on {len(df)} weeks of data...")
     model = Prophet()
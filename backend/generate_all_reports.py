@@ -1,6 +1,6 @@
 """
 Generate database-driven report PDFs for MedInsights Pro
-Pulls real data from: MedicineSales, MedicineForecast, WeatherData, Medicine, Formula, District
+Pulls real data from: MedicineSales, ForecastAccuracy, WeatherData, Medicine, Formula, District
 """
 import os
 import sys
@@ -18,7 +18,11 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from database import db
-from models import Medicine, MedicineSales, MedicineForecast, WeatherData, Formula, District
+from models import Medicine, MedicineSales, ForecastAccuracy, WeatherData, Formula, District, DEFAULT_WEATHER_LOCATION
+from services.forecast_accuracy import summarize_accuracy
+from services import sales_snapshot
+from utils import dimension_cache
+from utils.periods import period_filter
 
 
 def get_styles():
@@ -90,14 +94,6 @@ def get_month_name(month_num):
     return months[month_num] if 1 <= month_num <= 12 else ''
 
 
-def calculate_accuracy(forecasted, actual):
-    """Calculate forecast accuracy: 100 - ABS(forecasted - actual) / actual * 100"""
-    if actual == 0:
-        return 0.0 if forecasted == 0 else 0.0
-    accuracy = 100 - abs(forecasted - actual) / actual * 100
-    return max(0, min(100, accuracy))
-
-
 def get_accuracy_rating(accuracy):
     """Get rating based on accuracy percentage"""
     if accuracy >= 95:
@@ -124,6 +120,11 @@ def format_change(current, previous):
 def get_previous_year_sales_by_formula(year, months_to_include):
     """Get previous year sales data grouped by formula (for comparison)"""
     prev_year = year - 1
+    totals = sales_snapshot.report_totals(prev_year, months_to_include, group_by='formula')
+    if totals is not None:
+        return {dimension_cache.get_formula(formula_id).name: units for formula_id, units in totals.items()
+                if dimension_cache.get_formula(formula_id)}
+    
     query = db.session.query(
         Formula.name,
         func.sum(MedicineSales.quantity).label('total_sales')
@@ -132,8 +133,7 @@ def get_previous_year_sales_by_formula(year, months_to_include):
     ).join(
         MedicineSales, Medicine.id == MedicineSales.medicine_id
     ).filter(
-        extract('year', MedicineSales.date) == prev_year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, prev_year, months_to_include)
     ).group_by(Formula.id, Formula.name)
     
     return {f.name: f.total_sales for f in query.all()}
@@ -142,14 +142,18 @@ def get_previous_year_sales_by_formula(year, months_to_include):
 def get_previous_year_sales_by_district(year, months_to_include):
     """Get previous year sales data grouped by district (for comparison)"""
     prev_year = year - 1
+    totals = sales_snapshot.report_totals(prev_year, months_to_include, group_by='district')
+    if totals is not None:
+        return {dimension_cache.get_district(district_id).name: units for district_id, units in totals.items()
+                if dimension_cache.get_district(district_id)}
+    
     query = db.session.query(
         District.name,
         func.sum(MedicineSales.quantity).label('total_sales')
     ).join(
         MedicineSales, District.id == MedicineSales.district_id
     ).filter(
-        extract('year', MedicineSales.date) == prev_year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, prev_year, months_to_include)
     ).group_by(District.id, District.name)
     
     return {d.name: d.total_sales for d in query.all()}
@@ -158,11 +162,13 @@ def get_previous_year_sales_by_district(year, months_to_include):
 def get_previous_year_total_sales(year, months_to_include):
     """Get previous year total sales"""
     prev_year = year - 1
+    total = sales_snapshot.report_totals(prev_year, months_to_include)
+    if total is not None:
+        return total
     return db.session.query(
         func.sum(MedicineSales.quantity)
     ).filter(
-        extract('year', MedicineSales.date) == prev_year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, prev_year, months_to_include)
     ).scalar() or 0
 
 
@@ -179,8 +185,7 @@ def get_sales_by_formula(year, months_to_include):
     ).join(
         MedicineSales, Medicine.id == MedicineSales.medicine_id
     ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(Formula.id, Formula.name).order_by(desc('total_sales'))
     
     return query.all()
@@ -190,6 +195,14 @@ def get_monthly_sales_by_formula(year, months_to_include, top_formulas):
     """Get monthly breakdown of sales by formula"""
     results = {}
     for formula_name in top_formulas:
+        formula = dimension_cache.get_formula_by_name(formula_name)
+        monthly = formula and sales_snapshot.report_totals(
+            year, months_to_include, group_by='month', formula_id=formula.id
+        )
+        if monthly is not None:
+            results[formula_name] = {month: units for month, units in monthly.items() if units}
+            continue
+        
         formula_monthly = db.session.query(
             extract('month', MedicineSales.date).label('month'),
             func.sum(MedicineSales.quantity).label('quantity')
@@ -199,8 +212,7 @@ def get_monthly_sales_by_formula(year, months_to_include, top_formulas):
             Formula, Medicine.formula_id == Formula.id
         ).filter(
             Formula.name == formula_name,
-            extract('year', MedicineSales.date) == year,
-            extract('month', MedicineSales.date).in_(months_to_include)
+            period_filter(MedicineSales.date, year, months_to_include)
         ).group_by(extract('month', MedicineSales.date)).all()
         
         results[formula_name] = {int(m.month): m.quantity for m in formula_monthly}
@@ -208,44 +220,19 @@ def get_monthly_sales_by_formula(year, months_to_include, top_formulas):
 
 
 def get_forecast_accuracy_by_formula(year, months_to_include):
-    """Calculate forecast accuracy by comparing forecasts with actual sales"""
-    forecasts = db.session.query(
-        Formula.name,
-        func.sum(MedicineForecast.forecasted_quantity).label('forecasted')
-    ).join(
-        Medicine, MedicineForecast.medicine_id == Medicine.id
-    ).join(
-        Formula, Medicine.formula_id == Formula.id
-    ).filter(
-        extract('year', MedicineForecast.forecast_date) == year,
-        extract('month', MedicineForecast.forecast_date).in_(months_to_include)
-    ).group_by(Formula.id, Formula.name).all()
-    
-    forecasts_dict = {f.name: f.forecasted for f in forecasts}
-    
-    actuals = db.session.query(
-        Formula.name,
-        func.sum(MedicineSales.quantity).label('actual')
-    ).join(
-        Medicine, MedicineSales.medicine_id == Medicine.id
-    ).join(
-        Formula, Medicine.formula_id == Formula.id
-    ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
-    ).group_by(Formula.id, Formula.name).all()
-    
-    results = []
-    for actual in actuals:
-        forecasted = forecasts_dict.get(actual.name, 0)
-        accuracy = calculate_accuracy(forecasted, actual.actual)
-        results.append({
-            'formula': actual.name,
-            'forecasted': forecasted,
-            'actual': actual.actual,
-            'accuracy': accuracy,
-            'rating': get_accuracy_rating(accuracy)
-        })
+    """Forecast accuracy by formula, from the precomputed daily accuracy rows"""
+    rows = summarize_accuracy(
+        period_filter(ForecastAccuracy.period_start, year, months_to_include), group_by='formula'
+    )
+    results = [{
+        'formula': row['formula'],
+        'forecasted': row['forecasted'],
+        'actual': row['actual'],
+        'accuracy': row['accuracy'],
+        'wape': row['wape'],
+        'bias': row['bias'],
+        'rating': get_accuracy_rating(row['accuracy'])
+    } for row in rows]
     
     return sorted(results, key=lambda x: x['accuracy'], reverse=True)
 
@@ -258,8 +245,7 @@ def get_sales_by_district(year, months_to_include):
     ).join(
         MedicineSales, District.id == MedicineSales.district_id
     ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(District.id, District.name).order_by(desc('total_sales'))
     
     return query.all()
@@ -269,6 +255,14 @@ def get_monthly_sales_by_district(year, months_to_include, top_districts):
     """Get monthly breakdown of sales by district"""
     results = {}
     for district_name in top_districts:
+        district = dimension_cache.get_district_by_name(district_name)
+        monthly = district and sales_snapshot.report_totals(
+            year, months_to_include, group_by='month', district_id=district.id
+        )
+        if monthly is not None:
+            results[district_name] = {month: units for month, units in monthly.items() if units}
+            continue
+        
         district_monthly = db.session.query(
             extract('month', MedicineSales.date).label('month'),
             func.sum(MedicineSales.quantity).label('quantity')
@@ -276,8 +270,7 @@ def get_monthly_sales_by_district(year, months_to_include, top_districts):
             District, MedicineSales.district_id == District.id
         ).filter(
             District.name == district_name,
-            extract('year', MedicineSales.date) == year,
-            extract('month', MedicineSales.date).in_(months_to_include)
+            period_filter(MedicineSales.date, year, months_to_include)
         ).group_by(extract('month', MedicineSales.date)).all()
         
         results[district_name] = {int(m.month): m.quantity for m in district_monthly}
@@ -285,42 +278,20 @@ def get_monthly_sales_by_district(year, months_to_include, top_districts):
 
 
 def get_forecast_accuracy_by_district(year, months_to_include):
-    """Calculate forecast accuracy by district"""
-    forecasts = db.session.query(
-        District.name,
-        func.sum(MedicineForecast.forecasted_quantity).label('forecasted')
-    ).join(
-        MedicineForecast, District.id == MedicineForecast.district_id
-    ).filter(
-        extract('year', MedicineForecast.forecast_date) == year,
-        extract('month', MedicineForecast.forecast_date).in_(months_to_include)
-    ).group_by(District.id, District.name).all()
-    
-    forecasts_dict = {f.name: f.forecasted for f in forecasts}
-    
-    actuals = db.session.query(
-        District.name,
-        func.sum(MedicineSales.quantity).label('actual')
-    ).join(
-        MedicineSales, District.id == MedicineSales.district_id
-    ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
-    ).group_by(District.id, District.name).all()
-    
-    results = []
-    for actual in actuals:
-        forecasted = forecasts_dict.get(actual.name, 0)
-        accuracy = calculate_accuracy(forecasted, actual.actual)
-        mape = 100 - accuracy if accuracy > 0 else 0
-        results.append({
-            'district': actual.name,
-            'forecasted': forecasted,
-            'actual': actual.actual,
-            'accuracy': accuracy,
-            'mape': mape,
-            'rating': get_accuracy_rating(accuracy)
-        })
+    """Forecast accuracy by district, from the precomputed daily accuracy rows"""
+    rows = summarize_accuracy(
+        period_filter(ForecastAccuracy.period_start, year, months_to_include), group_by='district'
+    )
+    results = [{
+        'district': row['district'],
+        'forecasted': row['forecasted'],
+        'actual': row['actual'],
+        'accuracy': row['accuracy'],
+        'mape': row['mape'],
+        'wape': row['wape'],
+        'bias': row['bias'],
+        'rating': get_accuracy_rating(row['accuracy'])
+    } for row in rows]
     
     return sorted(results, key=lambda x: x['accuracy'], reverse=True)
 
@@ -341,8 +312,7 @@ def get_top_medicines_by_district(year, months_to_include):
             Formula, Medicine.formula_id == Formula.id
         ).filter(
             MedicineSales.district_id == district.id,
-            extract('year', MedicineSales.date) == year,
-            extract('month', MedicineSales.date).in_(months_to_include)
+            period_filter(MedicineSales.date, year, months_to_include)
         ).group_by(Medicine.id, Medicine.brand_name, Formula.name
         ).order_by(desc('quantity')).all()
 
@@ -358,14 +328,14 @@ def get_top_medicines_by_district(year, months_to_include):
 
 
 def get_weather_data_by_month(year, months_to_include):
-    """Get average weather data by month"""
+    """Get average weather data by month (default weather location)"""
     query = db.session.query(
         extract('month', WeatherData.date).label('month'),
         func.avg(WeatherData.apparent_temperature_mean).label('avg_temp'),
         func.avg(WeatherData.relative_humidity_2m_mean).label('avg_humidity')
     ).filter(
-        extract('year', WeatherData.date) == year,
-        extract('month', WeatherData.date).in_(months_to_include)
+        WeatherData.location == DEFAULT_WEATHER_LOCATION,
+        period_filter(WeatherData.date, year, months_to_include)
     ).group_by(extract('month', WeatherData.date)).order_by('month')
     
     return query.all()
@@ -383,8 +353,7 @@ def get_top_medicines(year, months_to_include, limit=None):
     ).join(
         Formula, Medicine.formula_id == Formula.id
     ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(Medicine.id, Medicine.brand_name, Formula.name
     ).order_by(desc('total_sales'))
 
@@ -395,53 +364,63 @@ def get_top_medicines(year, months_to_include, limit=None):
 
 
 def get_monthly_performance(year, months_to_include):
-    """Get monthly sales performance with forecast accuracy"""
-    results = []
-    
-    for month in months_to_include:
-        actual_sales = db.session.query(
+    """
+    Get monthly sales with forecast accuracy.
+    Sales are all sales of the month; forecast and accuracy come from the
+    precomputed accuracy rows, i.e. the days that had a forecast.
+    """
+    sales = {
+        int(month): quantity for month, quantity in db.session.query(
+            extract('month', MedicineSales.date),
             func.sum(MedicineSales.quantity)
         ).filter(
-            extract('year', MedicineSales.date) == year,
-            extract('month', MedicineSales.date) == month
-        ).scalar() or 0
-        
-        forecasted = db.session.query(
-            func.sum(MedicineForecast.forecasted_quantity)
-        ).filter(
-            extract('year', MedicineForecast.forecast_date) == year,
-            extract('month', MedicineForecast.forecast_date) == month
-        ).scalar() or 0
-        
-        accuracy = calculate_accuracy(forecasted, actual_sales)
-        
+            period_filter(MedicineSales.date, year, months_to_include)
+        ).group_by(extract('month', MedicineSales.date)).all()
+    }
+    
+    accuracy_by_month = {
+        row['month']: row for row in summarize_accuracy(
+            period_filter(ForecastAccuracy.period_start, year, months_to_include), group_by='month'
+        )
+    }
+    
+    results = []
+    for month in months_to_include:
+        accuracy = accuracy_by_month.get(month, {})
         results.append({
             'month': month,
-            'actual_sales': actual_sales,
-            'forecasted': forecasted,
-            'accuracy': accuracy
+            'actual_sales': sales.get(month) or 0,
+            'forecasted': accuracy.get('forecasted', 0),
+            'accuracy': accuracy.get('accuracy', 0.0)
         })
     
     return results
 
 
+def get_overall_accuracy_metrics(year, months_to_include):
+    """Overall forecast accuracy, WAPE, MAPE and bias for the period, from the precomputed accuracy rows"""
+    return summarize_accuracy(period_filter(ForecastAccuracy.period_start, year, months_to_include))[0]
+
+
 def calculate_overall_accuracy(year, months_to_include):
     """Calculate overall forecast accuracy for the year"""
-    total_forecasted = db.session.query(
-        func.sum(MedicineForecast.forecasted_quantity)
-    ).filter(
-        extract('year', MedicineForecast.forecast_date) == year,
-        extract('month', MedicineForecast.forecast_date).in_(months_to_include)
-    ).scalar() or 0
-    
-    total_actual = db.session.query(
-        func.sum(MedicineSales.quantity)
-    ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
-    ).scalar() or 0
-    
-    return calculate_accuracy(total_forecasted, total_actual)
+    return get_overall_accuracy_metrics(year, months_to_include)['accuracy']
+
+
+def accuracy_table_rows(metrics):
+    """Metric/value rows for a Forecast Accuracy table from summarize_accuracy() output"""
+    def percent(value, sign=''):
+        return f'{value:{sign}.1f}%' if value is not None else 'N/A'
+    
+    return [
+        ['Forecasted Units', f"{metrics['forecasted']:,}"],
+        ['Actual Units (forecast days)', f"{metrics['actual']:,}"],
+        ['Accuracy', percent(metrics['accuracy'])],
+        ['WAPE', percent(metrics['wape'])],
+        ['MAPE', percent(metrics['mape'])],
+        ['Bias', percent(metrics['bias'], '+')],
+        ['Rating', get_accuracy_rating(metrics['accuracy'])],
+    ]
 
 
 # ==================== REPORT 1: FORMULA REPORT ====================
@@ -575,8 +554,7 @@ def generate_formula_report(year=None):
         ).join(Formula, Medicine.formula_id == Formula.id
         ).filter(
             Formula.name == formula_name,
-            extract('year', MedicineSales.date) == year,
-            extract('month', MedicineSales.date).in_(months_to_include)
+            period_filter(MedicineSales.date, year, months_to_include)
         ).group_by(District.id, District.name).order_by(desc('quantity')).limit(2).all()
         
         if len(top_districts) >= 2:
@@ -708,7 +686,7 @@ def generate_district_report(year=None, district_name=None):
             forecast_district_data.append([
                 acc['district'],
                 f"{acc['accuracy']:.1f}%",
-                f"{acc['mape']:.1f}%",
+                f"{acc['mape']:.1f}%" if acc['mape'] is not None else 'N/A',
                 f"{acc['forecasted']:,}",
                 f"{acc['actual']:,}",
                 acc['rating']
@@ -758,26 +736,23 @@ def generate_comprehensive_report(year=None):
     elements.append(Paragraph('Executive Summary', styles['section']))
     
     total_sales = db.session.query(func.sum(MedicineSales.quantity)).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     total_formulas = db.session.query(func.count(func.distinct(Formula.id))).join(Medicine).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     total_medicines = db.session.query(func.count(func.distinct(Medicine.id))).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     total_districts = db.session.query(func.count(func.distinct(District.id))).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
-    overall_accuracy = calculate_overall_accuracy(year, months_to_include)
+    overall_metrics = get_overall_accuracy_metrics(year, months_to_include)
+    overall_accuracy = overall_metrics['accuracy']
 
     # Add YoY change for total sales in Executive Summary
     prev_total_sales = get_previous_year_total_sales(year, months_to_include)
@@ -891,14 +866,16 @@ def generate_comprehensive_report(year=None):
     
     # Forecast Model Performance - Real Data
     elements.append(Paragraph('Forecast Model Performance', styles['section']))
-    mape = 100 - overall_accuracy if overall_accuracy > 0 else 0
+    mape, wape, bias = overall_metrics['mape'], overall_metrics['wape'], overall_metrics['bias']
     monthly_perf = get_monthly_performance(year, months_to_include)
     hits = sum(1 for p in monthly_perf if p['accuracy'] >= 85) if monthly_perf else 0
     total_months = len(monthly_perf) if monthly_perf else 1
     hit_rate = (hits / total_months * 100) if total_months > 0 else 0
     
     model_data = [
-        ['Overall MAPE', f'{mape:.1f}%', '< 15%', 'PASS' if mape < 15 else 'REVIEW'],
+        ['Overall MAPE', f'{mape:.1f}%' if mape is not None else 'N/A', '< 15%', 'PASS' if mape is not None and mape < 15 else 'REVIEW'],
+        ['Overall WAPE', f'{wape:.1f}%' if wape is not None else 'N/A', '< 15%', 'PASS' if wape is not None and wape < 15 else 'REVIEW'],
+        ['Forecast Bias', f'{bias:+.1f}%' if bias is not None else 'N/A', '± 5%', 'PASS' if bias is not None and abs(bias) <= 5 else 'REVIEW'],
         ['Overall Accuracy', f'{overall_accuracy:.1f}%', '> 85%', 'PASS' if overall_accuracy > 85 else 'REVIEW'],
         ['Hit Rate (months ≥85%)', f'{hit_rate:.1f}%', '> 70%', 'PASS' if hit_rate > 70 else 'REVIEW'],
     ]
@@ -949,8 +926,7 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity)
     ).join(Medicine).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     # Get previous year sales for YoY comparison
@@ -958,24 +934,21 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity)
     ).join(Medicine).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year - 1,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year - 1, months_to_include)
     ).scalar() or 0
     
     brand_count = db.session.query(
         func.count(func.distinct(Medicine.id))
     ).join(MedicineSales).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     # Get overall total for market share
     overall_total = db.session.query(
         func.sum(MedicineSales.quantity)
     ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 1
     
     market_share = (total_sales / overall_total * 100) if overall_total > 0 else 0
@@ -997,8 +970,7 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).join(Medicine).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(extract('month', MedicineSales.date)).order_by('month').all()
     
     monthly_table = []
@@ -1016,8 +988,7 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).join(MedicineSales).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(Medicine.id, Medicine.brand_name).order_by(desc('quantity')).limit(10).all()
     
     brands_data = []
@@ -1036,8 +1007,7 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).join(MedicineSales).join(Medicine).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(District.id, District.name).order_by(desc('quantity')).all()
     
     # Get previous year sales by district for this formula
@@ -1047,8 +1017,7 @@ def generate_individual_formula_report(year, formula_name, formula_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).join(MedicineSales).join(Medicine).filter(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineSales.date) == year - 1,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year - 1, months_to_include)
     ).group_by(District.id, District.name).all()
     
     for d in prev_districts:
@@ -1066,22 +1035,12 @@ def generate_individual_formula_report(year, formula_name, formula_id):
     
     # Forecast Accuracy
     elements.append(Paragraph('Forecast Accuracy', styles['section']))
-    forecasted = db.session.query(
-        func.sum(MedicineForecast.forecasted_quantity)
-    ).join(Medicine).filter(
+    metrics = summarize_accuracy(
         Medicine.formula_id == formula_id,
-        extract('year', MedicineForecast.forecast_date) == year,
-        extract('month', MedicineForecast.forecast_date).in_(months_to_include)
-    ).scalar() or 0
+        period_filter(ForecastAccuracy.period_start, year, months_to_include)
+    )[0]
     
-    accuracy = calculate_accuracy(forecasted, total_sales)
-    
-    accuracy_data = [
-        ['Forecasted Units', f'{forecasted:,}'],
-        ['Actual Units', f'{total_sales:,}'],
-        ['Accuracy', f'{accuracy:.1f}%'],
-        ['Rating', get_accuracy_rating(accuracy)],
-    ]
+    accuracy_data = accuracy_table_rows(metrics)
     elements.append(create_table(['Metric', 'Value'], accuracy_data, [200, 200], keep_together=True))
     
     elements.append(Spacer(1, 20))
@@ -1129,8 +1088,7 @@ def generate_individual_district_report(year, district_name, district_id):
         func.sum(MedicineSales.quantity)
     ).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 0
     
     # Get previous year sales for YoY comparison
@@ -1138,16 +1096,14 @@ def generate_individual_district_report(year, district_name, district_id):
         func.sum(MedicineSales.quantity)
     ).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year - 1,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year - 1, months_to_include)
     ).scalar() or 0
     
     # Get overall total for market share
     overall_total = db.session.query(
         func.sum(MedicineSales.quantity)
     ).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).scalar() or 1
     
     market_share = (total_sales / overall_total * 100) if overall_total > 0 else 0
@@ -1158,8 +1114,7 @@ def generate_individual_district_report(year, district_name, district_id):
         District.id,
         func.sum(MedicineSales.quantity).label('total')
     ).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(District.id).order_by(desc('total')).all()
     
     rank = next((i+1 for i, d in enumerate(all_districts) if d.id == district_id), 0)
@@ -1180,8 +1135,7 @@ def generate_individual_district_report(year, district_name, district_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(extract('month', MedicineSales.date)).order_by('month').all()
     
     monthly_table = []
@@ -1200,8 +1154,7 @@ def generate_individual_district_report(year, district_name, district_id):
         func.sum(MedicineSales.quantity).label('quantity')
     ).join(MedicineSales).join(Formula).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(Medicine.id, Medicine.brand_name, Formula.name).order_by(desc('quantity')).limit(10).all()
     
     meds_data = []
@@ -1224,8 +1177,7 @@ def generate_individual_district_report(year, district_name, district_id):
         Formula, Medicine.formula_id == Formula.id
     ).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year, months_to_include)
     ).group_by(Formula.id, Formula.name).order_by(desc('quantity')).limit(10).all()
     
     # Get previous year sales by formula for this district
@@ -1239,8 +1191,7 @@ def generate_individual_district_report(year, district_name, district_id):
         Formula, Medicine.formula_id == Formula.id
     ).filter(
         MedicineSales.district_id == district_id,
-        extract('year', MedicineSales.date) == year - 1,
-        extract('month', MedicineSales.date).in_(months_to_include)
+        period_filter(MedicineSales.date, year - 1, months_to_include)
     ).group_by(Formula.id, Formula.name).all()
     
     for f in prev_formulas:
@@ -1258,22 +1209,12 @@ def generate_individual_district_report(year, district_name, district_id):
     
     # Forecast Accuracy
     elements.append(Paragraph('Forecast Accuracy', styles['section']))
-    forecasted = db.session.query(
-        func.sum(MedicineForecast.forecasted_quantity)
-    ).filter(
-        MedicineForecast.district_id == district_id,
-        extract('year', MedicineForecast.forecast_date) == year,
-        extract('month', MedicineForecast.forecast_date).in_(months_to_include)
-    ).scalar() or 0
+    metrics = summarize_accuracy(
+        ForecastAccuracy.district_id == district_id,
+        period_filter(ForecastAccuracy.period_start, year, months_to_include)
+    )[0]
     
-    accuracy = calculate_accuracy(forecasted, total_sales)
-    
-    accuracy_data = [
-        ['Forecasted Units', f'{forecasted:,}'],
-        ['Actual Units', f'{total_sales:,}'],
-        ['Accuracy', f'{accuracy:.1f}%'],
-        ['Rating', get_accuracy_rating(accuracy)],
-    ]
+    accuracy_data = accuracy_table_rows(metrics)
     elements.append(create_table(['Metric', 'Value'], accuracy_data, [200, 200], keep_together=True))
     
     elements.append(Spacer(1, 20))
@@ -1290,7 +1231,7 @@ def generate_all_individual_formula_reports(year):
     
     # Get all formulas that have sales data
     formulas = db.session.query(Formula.id, Formula.name).join(Medicine).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year
+        period_filter(MedicineSales.date, year, range(1, 13))
     ).distinct().all()
     
     for formula in formulas:
@@ -1305,7 +1246,7 @@ def generate_all_individual_district_reports(year):
     
     # Get all districts that have sales data
     districts = db.session.query(District.id, District.name).join(MedicineSales).filter(
-        extract('year', MedicineSales.date) == year
+        period_filter(MedicineSales.date, year, range(1, 13))
     ).distinct().all()
     
     for district in districts:
@@ -0,0 +1,90 @@
+"""
+Gunicorn configuration
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+The app, heavy libraries, Prophet models and lookup caches are loaded once in
+the master and shared with the workers copy-on-write. The weather scheduler
+runs in exactly one worker per host, elected with a file lock; the weather job
+itself also takes a database lock, so multiple hosts don't double-run it.
+
+Environment:
+    GUNICORN_BIND      Address to listen on (default 0.0.0.0:5001)
+    GUNICORN_WORKERS   Worker processes (default: CPU count)
+    GUNICORN_THREADS   Threads per worker (default 8)
+    GUNICORN_TIMEOUT   Worker timeout in seconds (default 120)
+"""
+import fcntl
+import multiprocessing
+import os
+import tempfile
+
+# Read by create_app() when wsgi.py is imported in the master
+os.environ.setdefault('PRELOAD_MODULES', 'true')
+os.environ['RUN_SCHEDULER'] = 'false'
+
+SCHEDULER_LOCK_FILE = os.getenv(
+    'SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'medicine-app-scheduler.lock')
+)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+preload_app = True
+worker_class = 'gthread'
+# Requests are mostly I/O on MySQL, so several threads per worker; forecasts and
+# uploads are CPU-heavy, so one worker per core. Open /activities/stream
+# connections each hold a thread (at most ACTIVITY_STREAM_MAX_CLIENTS per worker,
+# half of the threads by default), so raise threads to allow more open dashboards.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound memory growth from pandas/Prophet;
+# pre_request postpones it while the worker runs background upload jobs
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+accesslog = '-'
+
+_scheduler_lock = None
+
+
+def when_ready(server):
+    """Load models and warm caches in the master before the workers fork"""
+    from wsgi import application
+    from utils.preload import preload_app_caches
+    preload_app_caches(application)
+
+
+def pre_request(worker, req):
+    """
+    Keep a worker with queued or running upload jobs out of max_requests
+    recycling: the jobs run on its threads and a restart would cut them off
+    after graceful_timeout. The worker is recycled on its first request after
+    the jobs finish. (Jobs cut off by a deploy or crash are failed by the
+    scheduler's upload job sweep.)
+    """
+    from services.upload_jobs import active_upload_jobs
+    if active_upload_jobs():
+        worker.max_requests = max(worker.max_requests, worker.nr + 2)
+
+
+def post_fork(server, worker):
+    """Give each worker its own connections and start the scheduler in one of them"""
+    global _scheduler_lock
+    from wsgi import application
+    from database import db
+    from app import start_scheduler
+
+    with application.app_context():
+        db.engine.dispose(close=False)
+
+    lock_file = open(SCHEDULER_LOCK_FILE, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return
+    # Held until the worker exits, then another worker can take over
+    _scheduler_lock = lock_file
+    server.log.info(f"Worker {worker.pid} runs the weather scheduler")
+    start_scheduler(application)
@@ -2,8 +2,12 @@
 import os
 import jwt
 import secrets
+import threading
+import time
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
+from sqlalchemy.orm import make_transient_to_detached
+from database import db
 from models import User
 
 # Secret for JWTs - generate secure random secret if not set
@@ -15,29 +19,87 @@ if not JWT_SECRET:
     print(f"Generated secret (save this): {JWT_SECRET}")
 
 
+# Users seen by get_current_user: username -> (expires at, column values).
+# Entries are dropped when routes/users.py changes the user; the TTL bounds how
+# long other worker processes can serve a stale role or a deleted account.
+USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+USER_CACHE_MAX_ENTRIES = 1024
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+# The password hash is left out; it loads on access like an expired attribute
+_USER_COLUMNS = ('id', 'username', 'role', 'created_at')
+
+
+def invalidate_cached_user(*usernames):
+    """Drop users from the auth cache (call after updating or deleting them)"""
+    with _user_cache_lock:
+        for username in usernames:
+            _user_cache.pop(username, None)
+
+
+def _load_user(username):
+    """
+    Get a user by username, from the cache when possible.
+    Cached users are attached to the current session without a query, so
+    views can still modify and commit them.
+    """
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(username)
+    if cached and cached[0] > now:
+        user = User(**cached[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = User.query.filter_by(username=username).first()
+    if user:
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+                _user_cache.pop(next(iter(_user_cache)), None)
+            _user_cache[username] = (now + USER_CACHE_TTL, {c: getattr(user, c) for c in _USER_COLUMNS})
+    return user
+
+
+def _get_token_payload():
+    """
+    Decode the request's bearer token once and keep the result on flask.g.
+    
+    Returns:
+        tuple: (payload dict, error message) - payload is None if the token is missing or invalid
+    """
+    if 'auth_payload' not in g:
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            g.auth_payload, g.auth_error = None, "token required"
+        else:
+            token = auth_header.split(' ')[1]
+            try:
+                g.auth_payload, g.auth_error = jwt.decode(token, JWT_SECRET, algorithms=['HS256']), None
+            except jwt.ExpiredSignatureError:
+                g.auth_payload, g.auth_error = None, "token expired"
+            except jwt.InvalidTokenError:
+                g.auth_payload, g.auth_error = None, "invalid token"
+    return g.auth_payload, g.auth_error
+
+
 def get_current_user():
     """
     Extract and validate user from JWT token in Authorization header.
+    The token is decoded and the user looked up at most once per request.
     
     Returns:
         tuple: (User object, error message) - User is None if authentication fails
     """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None, "token required"
+    payload, error = _get_token_payload()
+    if payload is None:
+        return None, error
     
-    token = auth_header.split(' ')[1]
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        username = payload.get('sub')
-        user = User.query.filter_by(username=username).first()
-        return user, None
-    except jwt.ExpiredSignatureError:
-        return None, "token expired"
-    except jwt.InvalidTokenError:
-        return None, "invalid token"
-    except Exception:
-        return None, "authentication error"
+    if 'auth_user' not in g:
+        try:
+            g.auth_user = _load_user(payload.get('sub'))
+        except Exception:
+            return None, "authentication error"
+    return g.auth_user, None
 
 
 def require_auth(f):
@@ -76,26 +138,17 @@ def require_role(allowed_roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            auth_header = request.headers.get('Authorization')
-            if not auth_header or not auth_header.startswith('Bearer '):
-                return jsonify({"error": "token required"}), 401
+            payload, error = _get_token_payload()
+            if payload is None:
+                return jsonify({"error": error}), 401
             
-            token = auth_header.split(' ')[1]
-            try:
-                payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-                user_role = payload.get('role')
-                
-                if user_role not in allowed_roles:
-                    return jsonify({"error": f"access denied - requires one of: {', '.join(allowed_roles)}"}), 403
-                
-                # Optionally pass user info to decorated function
-                kwargs['current_user_role'] = user_role
-                kwargs['current_username'] = payload.get('sub')
-                
-            except jwt.ExpiredSignatureError:
-                return jsonify({"error": "token expired"}), 401
-            except jwt.InvalidTokenError:
-                return jsonify({"error": "invalid token"}), 401
+            user_role = payload.get('role')
+            if user_role not in allowed_roles:
+                return jsonify({"error": f"access denied - requires one of: {', '.join(allowed_roles)}"}), 403
+            
+            # Optionally pass user info to decorated function
+            kwargs['current_user_role'] = user_role
+            kwargs['current_username'] = payload.get('sub')
                 
             return f(*args, **kwargs)
         
@@ -1,9 +1,17 @@
 # models.py
 from database import db
 from werkzeug.security import generate_password_hash, check_password_hash
+from utils.names import NORMALIZED_NAME_SQL
 
 class Activity(db.Model):
     __tablename__ = 'activity'
+    __table_args__ = (
+        # Keyset pagination (newest first) on its own and under each filter
+        db.Index('idx_activity_timestamp_id', 'timestamp', 'id'),
+        db.Index('idx_activity_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('idx_activity_action_timestamp', 'action_type', 'timestamp', 'id'),
+        db.Index('idx_activity_entity_timestamp', 'entity_type', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -12,22 +20,47 @@ class Activity(db.Model):
     entity_type = db.Column(db.String(50), nullable=False)  # 'sales_record', 'stock_adjustment', 'medicine', etc.
     entity_id = db.Column(db.String(100))  # ID of the affected entity
     details = db.Column(db.Text)  # JSON string with additional details
-    timestamp = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False, index=True)
+    timestamp = db.Column(db.DateTime, default=db.func.current_timestamp(), nullable=False)
     
     # Relationship
     user = db.relationship('User', backref='activities')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_details=True):
+        data = {
             "id": self.id,
             "userId": self.user_id,
             "userName": self.user_name,
             "actionType": self.action_type,
             "entityType": self.entity_type,
             "entityId": self.entity_id,
-            "details": self.details,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None
         }
+        if include_details:
+            data["details"] = self.details
+        return data
+
+class ActivityDailySummary(db.Model):
+    """Activity counts per user, action and day; kept after the raw rows are archived"""
+    __tablename__ = 'activity_daily_summary'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'action_type', name='uq_activity_summary_day_user_action'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)  # No FK: summaries outlive deleted users
+    user_name = db.Column(db.String(80), nullable=False)
+    action_type = db.Column(db.String(50), nullable=False)
+    activity_count = db.Column(db.Integer, nullable=False)
+    
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat() if self.day else None,
+            "userId": self.user_id,
+            "userName": self.user_name,
+            "actionType": self.action_type,
+            "count": self.activity_count
+        }
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -53,11 +86,18 @@ class User(db.Model):
         }
 
 
+# Weather location used for districts without coordinates (Karachi, see services/weather_service.py)
+DEFAULT_WEATHER_LOCATION = '24.8607,67.0011'
+
+
 class WeatherData(db.Model):
     __tablename__ = 'weather_data'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, unique=True, nullable=False, index=True)
+    # "lat,lon" key of the location the series belongs to (see weather_service.location_key)
+    location = db.Column(db.String(32), nullable=False, default=DEFAULT_WEATHER_LOCATION,
+                         server_default=DEFAULT_WEATHER_LOCATION)
+    date = db.Column(db.Date, nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     apparent_temperature_max = db.Column(db.Float)
@@ -69,10 +109,15 @@ class WeatherData(db.Model):
     is_forecast = db.Column(db.Boolean, default=False, nullable=False)  # Distinguish forecast from historical
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    __table_args__ = (
+        db.UniqueConstraint('location', 'date', name='uq_weather_location_date'),
+    )
 
     def to_dict(self):
         return {
             "id": self.id,
+            "location": self.location,
             "date": self.date.isoformat() if self.date else None,
             "latitude": self.latitude,
             "longitude": self.longitude,
@@ -90,10 +135,17 @@ class WeatherData(db.Model):
 
 class District(db.Model):
     __tablename__ = 'district'
+    __table_args__ = (
+        db.Index('idx_district_name_normalized', 'name_normalized', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    # Lookup key: lowercased, underscores as spaces (kept up to date by the database)
+    name_normalized = db.Column(db.String(100), db.Computed(NORMALIZED_NAME_SQL.format(column='name'), persisted=True))
     area_code = db.Column(db.String(20), unique=True, nullable=True)
+    latitude = db.Column(db.Float, nullable=True)  # Used for per-district weather
+    longitude = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     # Relationships
@@ -104,15 +156,22 @@ class District(db.Model):
         return {
             "id": self.id,
             "name": self.name,
-            "areaCode": self.area_code
+            "areaCode": self.area_code,
+            "latitude": self.latitude,
+            "longitude": self.longitude
         }
 
 
 class Formula(db.Model):
     __tablename__ = 'formula'
+    __table_args__ = (
+        db.Index('idx_formula_name_normalized', 'name_normalized', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    # Lookup key: lowercased, underscores as spaces (kept up to date by the database)
+    name_normalized = db.Column(db.String(100), db.Computed(NORMALIZED_NAME_SQL.format(column='name'), persisted=True))
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     
     # Relationships
@@ -165,7 +224,7 @@ class MedicineSales(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False, index=True)
-    district_id = db.Column(db.Integer, db.ForeignKey('district.id'), nullable=False, index=True)
+    district_id = db.Column(db.Integer, db.ForeignKey('district.id'), nullable=False)
     date = db.Column(db.Date, nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -174,9 +233,11 @@ class MedicineSales(db.Model):
     medicine = db.relationship('Medicine', back_populates='sales')
     district = db.relationship('District', back_populates='sales')
     
-    # Composite index for faster queries
+    # Composite indexes for faster queries
     __table_args__ = (
         db.Index('idx_medicine_district_date', 'medicine_id', 'district_id', 'date'),
+        # Covers district sales by date for a set of medicines (forecast history, district pages)
+        db.Index('idx_sales_district_medicine_date', 'district_id', 'medicine_id', 'date', 'quantity'),
     )
     
     def to_dict(self):
@@ -200,8 +261,8 @@ class MedicineForecast(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False, index=True)
-    district_id = db.Column(db.Integer, db.ForeignKey('district.id'), nullable=False, index=True)
-    forecast_date = db.Column(db.Date, nullable=False, index=True)
+    district_id = db.Column(db.Integer, db.ForeignKey('district.id'), nullable=False)
+    forecast_date = db.Column(db.Date, nullable=False)
     forecasted_quantity = db.Column(db.Integer, nullable=False)
     model_version = db.Column(db.String(50), nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
@@ -213,6 +274,9 @@ class MedicineForecast(db.Model):
     # Composite unique index - one forecast per medicine per district per date
     __table_args__ = (
         db.Index('idx_forecast_medicine_district_date', 'medicine_id', 'district_id', 'forecast_date', unique=True),
+        # Cover forecast windows summed per medicine, across all districts or within one
+        db.Index('idx_forecast_date_medicine', 'forecast_date', 'medicine_id', 'forecasted_quantity'),
+        db.Index('idx_forecast_district_date', 'district_id', 'forecast_date', 'medicine_id', 'forecasted_quantity'),
     )
     
     def to_dict(self):
@@ -228,6 +292,39 @@ class MedicineForecast(db.Model):
         }
 
 
+class ForecastAccuracy(db.Model):
+    """Forecast against actual sales per medicine, district and day or week (see services/forecast_accuracy.py)"""
+    __tablename__ = 'forecast_accuracy'
+    __table_args__ = (
+        db.Index('idx_accuracy_key', 'period', 'medicine_id', 'district_id', 'period_start', unique=True),
+        db.Index('idx_accuracy_period_start', 'period', 'period_start'),
+        db.Index('idx_accuracy_district_period', 'district_id', 'period', 'period_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id', ondelete='CASCADE'), nullable=False)
+    district_id = db.Column(db.Integer, db.ForeignKey('district.id', ondelete='CASCADE'), nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # 'day' or 'week' (weeks start on Monday)
+    period_start = db.Column(db.Date, nullable=False)
+    forecasted_quantity = db.Column(db.Integer, nullable=False)
+    actual_quantity = db.Column(db.Integer, nullable=False)
+    absolute_error = db.Column(db.Integer, nullable=False)  # |forecast - actual|
+    percentage_error = db.Column(db.Float, nullable=True)  # absolute_error / actual; NULL without sales
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    def to_dict(self):
+        return {
+            "medicineId": self.medicine_id,
+            "districtId": self.district_id,
+            "period": self.period,
+            "periodStart": self.period_start.isoformat() if self.period_start else None,
+            "forecasted": self.forecasted_quantity,
+            "actual": self.actual_quantity,
+            "absoluteError": self.absolute_error,
+            "percentageError": self.percentage_error
+        }
+
+
 class DistrictMedicineLookup(db.Model):
     __tablename__ = 'district_medicine_lookup'
     
@@ -240,8 +337,10 @@ class DistrictMedicineLookup(db.Model):
     medicine = db.relationship('Medicine', foreign_keys=[medicine_id])
     formula = db.relationship('Formula', foreign_keys=[formula_id])
     
-    # Composite primary key is automatically indexed
-    __table_args__ = ()
+    # Composite primary key is automatically indexed; lookups by district and formula need their own
+    __table_args__ = (
+        db.Index('idx_lookup_district_formula', 'district_id', 'formula_id', 'medicine_id'),
+    )
     
     def to_dict(self):
         return {
@@ -252,3 +351,91 @@ class DistrictMedicineLookup(db.Model):
             "formulaId": self.formula_id,
             "formulaName": self.formula.name if self.formula else None
         }
+
+
+class UploadJob(db.Model):
+    __tablename__ = 'upload_job'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, returned to the client as jobId
+    upload_type = db.Column(db.String(20), nullable=False)  # 'sales', 'stock', 'weather', 'medicines'
+    file_name = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed', 'failed'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    user_name = db.Column(db.String(80), nullable=True)
+    rows_processed = db.Column(db.Integer, default=0, nullable=False)
+    rows_failed = db.Column(db.Integer, default=0, nullable=False)
+    batches_committed = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)  # Set when the whole job fails
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp(), index=True)
+    started_at = db.Column(db.DateTime)  # UTC, set by the worker
+    finished_at = db.Column(db.DateTime)  # UTC, set by the worker
+    heartbeat_at = db.Column(db.DateTime)  # UTC, refreshed while the job is queued or running in a live process
+    
+    __table_args__ = (
+        db.Index('idx_upload_job_status_heartbeat', 'status', 'heartbeat_at'),
+    )
+    
+    # Relationships
+    errors = db.relationship('UploadJobError', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+    
+    def to_dict(self):
+        from datetime import datetime
+        
+        # Throughput over the time the worker has spent on the job so far
+        rows_per_second = None
+        if self.started_at:
+            elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+            if elapsed > 0:
+                rows_per_second = round((self.rows_processed + self.rows_failed) / elapsed, 1)
+        
+        return {
+            "id": self.id,
+            "uploadType": self.upload_type,
+            "fileName": self.file_name,
+            "status": self.status,
+            "userName": self.user_name,
+            "rowsProcessed": self.rows_processed,
+            "rowsFailed": self.rows_failed,
+            "batchesCommitted": self.batches_committed,
+            "rowsPerSecond": rows_per_second,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat() if self.created_at else None,
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class UploadJobError(db.Model):
+    __tablename__ = 'upload_job_error'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('upload_job.id'), nullable=False, index=True)
+    row_number = db.Column(db.Integer, nullable=False)  # Row in the uploaded file (header is row 1)
+    message = db.Column(db.Text, nullable=False)
+
+
+class SalesUploadStaging(db.Model):
+    """Raw sales upload rows, loaded in bulk and validated set-wise before being merged into medicine_sales"""
+    __tablename__ = 'sales_upload_staging'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), nullable=False)  # One ingest run (uuid4 hex)
+    row_number = db.Column(db.Integer, nullable=False)  # Row in the uploaded file (header is row 1)
+    # Raw cells are unbounded text: over-long names must load so validation can reject their rows
+    district_name = db.Column(db.Text)
+    formula_name = db.Column(db.Text)
+    medicine_identifier = db.Column(db.Text)
+    dosage = db.Column(db.Text)
+    sale_date = db.Column(db.Date)
+    date_invalid = db.Column(db.Boolean, default=False, nullable=False)
+    quantity = db.Column(db.Integer, default=0, nullable=False)
+    # Resolved by the ingest statements
+    district_id = db.Column(db.Integer)
+    formula_id = db.Column(db.Integer)
+    medicine_id = db.Column(db.Integer)
+    error = db.Column(db.Text)  # NULL once the row has passed validation; messages quote the cells
+    
+    __table_args__ = (
+        db.Index('idx_sales_staging_batch_row', 'batch_id', 'row_number'),
+        db.Index('idx_sales_staging_batch_key', 'batch_id', 'medicine_id', 'district_id', 'sale_date'),
+    )
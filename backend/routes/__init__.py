@@ -14,6 +14,7 @@ from routes.forecast import forecast_bp
 from routes.weather import weather_bp
 from routes.activities import activities_bp
 from routes.reports import reports_bp
+from routes.uploads import uploads_bp
 
 # Register all sub-blueprints
 api_bp.register_blueprint(auth_bp)
@@ -25,3 +26,4 @@ api_bp.register_blueprint(forecast_bp)
 api_bp.register_blueprint(weather_bp)
 api_bp.register_blueprint(activities_bp)
 api_bp.register_blueprint(reports_bp)
+api_bp.register_blueprint(uploads_bp)
@@ -1,32 +1,170 @@
 """Activity tracking routes - View user activities and audit logs"""
-from flask import Blueprint, jsonify
-from models import Activity
-from sqlalchemy import desc
+import base64
+import json
+import queue
+from datetime import datetime
+from flask import Blueprint, jsonify, request, Response, current_app
+from models import Activity, ActivityDailySummary
+from sqlalchemy import desc, or_, and_
+from sqlalchemy.orm import defer
+from database import db
+from utils.activity_stream import subscribe, unsubscribe, get_activities_after
 
 activities_bp = Blueprint('activities', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Idle streams send a comment this often so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+def encode_cursor(activity):
+    """Opaque cursor pointing just past an activity in newest-first order"""
+    raw = f"{activity.timestamp.isoformat()}|{activity.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, activity_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(activity_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _parse_datetime(name):
+    """Optional ISO date/datetime query param"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}: use ISO format, e.g. 2024-01-31 or 2024-01-31T12:00:00')
+
 
 @activities_bp.route('/activities', methods=['GET'])
 def get_all_activities():
     """
-    Get all activities, ordered by most recent first
+    Get activities, most recent first, one page at a time
+    Query params:
+        - limit: Page size (default 50, max 200)
+        - cursor: nextCursor of the previous page
+        - userId / user: Only this user's activities (by id or username)
+        - actionType: e.g. create, update, delete, upload
+        - entityType: e.g. sales_record, stock_adjustment
+        - from / to: Time range, from inclusive and to exclusive (ISO date or datetime)
+        - includeDetails: true to include each activity's details JSON (default false)
+    
+    Returns:
+        {
+            "activities": [
+                {
+                    "id": 1,
+                    "userId": 1,
+                    "userName": "admin",
+                    "actionType": "create",
+                    "entityType": "sales_record",
+                    "entityId": "123",
+                    "timestamp": "2024-01-01T12:00:00"
+                }
+            ],
+            "nextCursor": "MjAyNC0wMS0wMVQxMjowMDowMHwx",
+            "hasMore": true
+        }
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    include_details = request.args.get('includeDetails', 'false').lower() == 'true'
+    
+    query = Activity.query
+    
+    try:
+        cursor = request.args.get('cursor')
+        if cursor:
+            # Keyset: everything strictly older than the last row of the previous page.
+            # Spelled out instead of a row comparison so MySQL uses a range scan.
+            last_timestamp, last_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Activity.timestamp < last_timestamp,
+                and_(Activity.timestamp == last_timestamp, Activity.id < last_id)
+            ))
+        
+        start = _parse_datetime('from')
+        end = _parse_datetime('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if start:
+        query = query.filter(Activity.timestamp >= start)
+    if end:
+        query = query.filter(Activity.timestamp < end)
+    
+    user_id = request.args.get('userId', type=int)
+    if user_id is not None:
+        query = query.filter(Activity.user_id == user_id)
+    if request.args.get('user'):
+        query = query.filter(Activity.user_name == request.args['user'])
+    if request.args.get('actionType'):
+        query = query.filter(Activity.action_type == request.args['actionType'])
+    if request.args.get('entityType'):
+        query = query.filter(Activity.entity_type == request.args['entityType'])
+    
+    if not include_details:
+        query = query.options(defer(Activity.details))
+    
+    # One extra row tells whether there is another page
+    activities = query.order_by(desc(Activity.timestamp), desc(Activity.id)).limit(limit + 1).all()
+    has_more = len(activities) > limit
+    activities = activities[:limit]
+    
+    return jsonify({
+        'activities': [activity.to_dict(include_details=include_details) for activity in activities],
+        'nextCursor': encode_cursor(activities[-1]) if has_more else None,
+        'hasMore': has_more
+    }), 200
+
+
+@activities_bp.route('/activities/summary', methods=['GET'])
+def get_activity_summary():
+    """
+    Get daily activity counts per user and action, including archived periods
+    Query params:
+        - from / to: Day range, from inclusive and to exclusive (ISO date)
+        - userId: Only this user's counts
+        - actionType: Only this action's counts
     
     Returns:
         [
-            {
-                "id": 1,
-                "userId": 1,
-                "userName": "admin",
-                "actionType": "create",
-                "entityType": "sales_record",
-                "entityId": "123",
-                "details": "...",
-                "timestamp": "2024-01-01T12:00:00"
-            }
+            {"day": "2024-01-01", "userId": 1, "userName": "admin", "actionType": "create", "count": 12}
         ]
     """
-    activities = Activity.query.order_by(desc(Activity.timestamp)).all()
-    return jsonify([activity.to_dict() for activity in activities]), 200
+    try:
+        start = _parse_datetime('from')
+        end = _parse_datetime('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = ActivityDailySummary.query
+    if start:
+        query = query.filter(ActivityDailySummary.day >= start.date())
+    if end:
+        query = query.filter(ActivityDailySummary.day < end.date())
+    user_id = request.args.get('userId', type=int)
+    if user_id is not None:
+        query = query.filter(ActivityDailySummary.user_id == user_id)
+    if request.args.get('actionType'):
+        query = query.filter(ActivityDailySummary.action_type == request.args['actionType'])
+    
+    rows = query.order_by(
+        ActivityDailySummary.day, ActivityDailySummary.user_id, ActivityDailySummary.action_type
+    ).all()
+    return jsonify([row.to_dict() for row in rows]), 200
 
 
 @activities_bp.route('/activities/recent', methods=['GET'])
@@ -34,14 +172,69 @@ def get_recent_activities():
     """
     Get recent activities (last 10)
     
-    Returns: Same format as get_all_activities but limited to 10
+    Returns: List of activities in the format of get_all_activities, with details
     """
-    activities = Activity.query.order_by(desc(Activity.timestamp)).limit(10).all()
+    activities = Activity.query.order_by(desc(Activity.timestamp), desc(Activity.id)).limit(10).all()
     return jsonify([activity.to_dict() for activity in activities]), 200
 
 
+@activities_bp.route('/activities/stream', methods=['GET'])
+def stream_activities():
+    """
+    Server-sent events stream of new activities (event type "activity", id = activity id)
+    
+    A reconnecting EventSource sends Last-Event-ID and receives the activities
+    it missed (up to 500) before the live events.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    if after_id is None:
+        after_id = db.session.query(db.func.max(Activity.id)).scalar() or 0
+    
+    app = current_app._get_current_object()
+    subscription = subscribe(app, after_id)
+    if subscription is None:
+        return jsonify({'error': 'Too many open activity streams, try again later'}), 503, {'Retry-After': '30'}
+    
+    # Subscribed first, so nothing written between the replay query and the
+    # first live event is lost; replayed ids are skipped when they come again
+    missed = get_activities_after(after_id)
+    db.session.remove()
+    
+    def format_event(event):
+        return f"id: {event['id']}\nevent: activity\ndata: {json.dumps(event)}\n\n"
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            replayed = set()
+            for event in missed:
+                replayed.add(event['id'])
+                yield format_event(event)
+            while True:
+                try:
+                    event = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return
+                if event['id'] not in replayed:
+                    yield format_event(event)
+        finally:
+            unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @activities_bp.route('/activities/<int:id>', methods=['GET'])
 def get_activity(id):
-    """Get a specific activity by ID"""
+    """Get a specific activity by ID, including its details"""
     activity = Activity.query.get_or_404(id)
     return jsonify(activity.to_dict()), 200
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from datetime import date
 from database import db
 from models import District, MedicineSales, Formula, Medicine, MedicineForecast
+from utils.names import normalize_name
 
 districts_bp = Blueprint('districts', __name__)
 
@@ -28,19 +29,23 @@ def create_district():
     Expected JSON:
     {
         "name": "Karachi Central",
-        "areaCode": "KC001"
+        "areaCode": "KC001",
+        "latitude": 24.9056,    (optional, for per-district weather)
+        "longitude": 67.0822
     }
     """
     data = request.get_json()
     
     # Check if district already exists
-    existing = District.query.filter_by(name=data.get('name')).first()
+    existing = District.query.filter_by(name_normalized=normalize_name(data.get('name'))).first()
     if existing:
         return jsonify({"error": "District already exists"}), 400
     
     district = District(
         name=data.get('name'),
-        area_code=data.get('areaCode')
+        area_code=data.get('areaCode'),
+        latitude=data.get('latitude'),
+        longitude=data.get('longitude')
     )
     db.session.add(district)
     db.session.commit()
@@ -61,6 +66,10 @@ def update_district(id):
         district.name = data['name']
     if 'areaCode' in data:
         district.area_code = data['areaCode']
+    if 'latitude' in data:
+        district.latitude = data['latitude']
+    if 'longitude' in data:
+        district.longitude = data['longitude']
     
     db.session.commit()
     
@@ -5,11 +5,14 @@ from datetime import datetime, timedelta
 from models import MedicineSales, MedicineForecast, Medicine, District, Formula, DistrictMedicineLookup
 from database import db
 from sqlalchemy import func
+from utils.db_routing import read_from_replica
+from utils import dimension_cache
 import requests
 
 forecast_bp = Blueprint('forecast', __name__)
 
 @forecast_bp.route('/forecast/metadata/areas', methods=['GET'])
+@read_from_replica
 def get_forecast_areas():
     """
     Get list of areas (districts) from district_medicine_lookup table.
@@ -33,6 +36,7 @@ def get_forecast_areas():
 
 
 @forecast_bp.route('/forecast/metadata/formulas', methods=['GET'])
+@read_from_replica
 def get_forecast_formulas():
     """
     Get list of formulas from district_medicine_lookup table, optionally filtered by area.
@@ -49,9 +53,8 @@ def get_forecast_formulas():
         
         # Filter by area if provided
         if area_name:
-            query = query.join(
-                District, DistrictMedicineLookup.district_id == District.id
-            ).filter(func.lower(District.name) == func.lower(area_name))
+            district = dimension_cache.get_district_by_name(area_name)
+            query = query.filter(DistrictMedicineLookup.district_id == (district.id if district else None))
         
         formulas = query.distinct().all()
         formula_list = [formula.name for formula in formulas]
@@ -95,24 +98,16 @@ def get_area_formula_forecast():
         if days < 1 or days > 365:
             return jsonify({'error': 'days must be between 1 and 365'}), 400
         
-        # Normalize formula name (replace underscores with spaces for DB lookup)
-        formula_search = formula_name.replace('_', ' ')
-        
         # Find district by name (case-insensitive)
-        district = District.query.filter(func.lower(District.name) == func.lower(area_name)).first()
+        district = dimension_cache.get_district_by_name(area_name)
         if not district:
             return jsonify({
                 'error': f'District not found: {area_name}',
                 'hint': 'Check available districts via GET /api/districts'
             }), 404
         
-        # Find formula by name (case-insensitive, try both with spaces and underscores)
-        formula = Formula.query.filter(
-            func.lower(Formula.name).in_([
-                func.lower(formula_search),
-                func.lower(formula_name)
-            ])
-        ).first()
+        # Find formula by name (case-insensitive, underscores match spaces)
+        formula = dimension_cache.get_formula_by_name(formula_name)
         
         if not formula:
             return jsonify({
@@ -141,11 +136,7 @@ def get_area_formula_forecast():
         
         # For HISTORICAL sales chart, we want ALL medicines with this formula
         # (not just what's in lookup), because formula historical = sum of all medicine sales for that formula
-        all_formula_medicine_ids = [
-            mid for (mid,) in db.session.query(Medicine.id)
-            .filter(Medicine.formula_id == formula.id)
-            .all()
-        ]
+        all_formula_medicine_ids = [m.id for m in dimension_cache.get_formula_medicines(formula.id)]
         
         # Get historical sales (last 365 days for context, fall back to all-time)
         historical_start = datetime.now().date() - timedelta(days=365)
@@ -353,6 +344,119 @@ def get_area_formula_forecast():
         }), 500
 
 
+@forecast_bp.route('/forecast/accuracy', methods=['GET'])
+@read_from_replica
+def get_forecast_accuracy():
+    """
+    Forecast accuracy (WAPE, MAPE, bias) from the precomputed forecast_accuracy table.
+    Query params:
+        - area: (optional) District name
+        - formula: (optional) Formula name
+        - medicineId: (optional) Medicine id
+        - period: 'day' or 'week' (default: week)
+        - from / to: Date range, YYYY-MM-DD, end exclusive (default: the last 12 weeks)
+        - groupBy: 'period', 'medicine', 'district' or 'formula' (default: period)
+    """
+    from services.forecast_accuracy import PERIODS, summarize_accuracy, week_start
+    from models import ForecastAccuracy
+    
+    try:
+        period = request.args.get('period', 'week')
+        group_by = request.args.get('groupBy', 'period')
+        if period not in PERIODS:
+            return jsonify({'error': f"period must be one of: {', '.join(PERIODS)}"}), 400
+        if group_by not in ('period', 'medicine', 'district', 'formula'):
+            return jsonify({'error': 'groupBy must be one of: period, medicine, district, formula'}), 400
+        
+        try:
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else datetime.now().date()
+            start = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from')
+                     else week_start(end) - timedelta(weeks=12))
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        criteria = [ForecastAccuracy.period_start >= start, ForecastAccuracy.period_start < end]
+        
+        area_name = request.args.get('area')
+        if area_name:
+            district = dimension_cache.get_district_by_name(area_name)
+            if not district:
+                return jsonify({'error': f'District not found: {area_name}'}), 404
+            criteria.append(ForecastAccuracy.district_id == district.id)
+        
+        formula_name = request.args.get('formula')
+        if formula_name:
+            formula = dimension_cache.get_formula_by_name(formula_name)
+            if not formula:
+                return jsonify({'error': f'Formula not found: {formula_name}'}), 404
+            criteria.append(Medicine.formula_id == formula.id)
+        
+        medicine_id = request.args.get('medicineId', type=int)
+        if medicine_id:
+            criteria.append(ForecastAccuracy.medicine_id == medicine_id)
+        
+        overall = summarize_accuracy(*criteria, period=period)[0]
+        results = summarize_accuracy(*criteria, group_by=group_by, period=period)
+        
+        return jsonify({
+            'period': period,
+            'groupBy': group_by,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'overall': overall,
+            'results': results,
+            'count': len(results)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to retrieve forecast accuracy: {str(e)}'}), 500
+
+
+def snapshot_history(name):
+    """
+    Weekly sales of the formula called name, from the sales snapshot, so
+    formulas can be forecast and trained without a CSV file.
+    
+    Returns:
+        DataFrame with ds/y columns, or None if no formula or snapshot data matches
+    """
+    formula = dimension_cache.get_formula_by_name(name)
+    if not formula:
+        return None
+    from services.sales_snapshot import weekly_history
+    return weekly_history(formula_id=formula.id)
+
+
+HISTORY_SOURCES = ('csv', 'snapshot')
+
+
+def resolve_history(name, data_path):
+    """
+    Pick the history a forecast or training run reads, from the ?source= query
+    parameter: 'csv' (the forecasting CSV file), 'snapshot' (the formula's
+    sales snapshot) or, when absent, the CSV file if it exists and the
+    snapshot otherwise.
+    
+    Returns:
+        tuple: (source, history, error) - history is None for the CSV source;
+        error is a (response, status) pair to return instead
+    """
+    requested = request.args.get('source')
+    if requested is not None and requested not in HISTORY_SOURCES:
+        return None, None, (jsonify({'error': f"source must be one of: {', '.join(HISTORY_SOURCES)}"}), 400)
+    
+    source = requested or ('csv' if data_path.exists() else 'snapshot')
+    history = snapshot_history(name) if source == 'snapshot' else None
+    if (source == 'csv' and not data_path.exists()) or (source == 'snapshot' and history is None):
+        hint = (f'No sales snapshot data for a formula named {name}' if requested == 'snapshot'
+                else f'Please add a CSV file at: {data_path}')
+        return source, None, (jsonify({
+            'error': f'No historical data found for medicine: {name}',
+            'hint': hint
+        }), 404)
+    return source, history, None
+
+
 @forecast_bp.route('/forecast/<medicine_name>', methods=['GET'])
 def get_forecast(medicine_name):
 
@@ -371,19 +475,17 @@ def get_forecast(medicine_name):
         base_dir = Path(__file__).resolve().parent.parent
         data_path = base_dir / "forecasting" / "data" / f"{medicine_name.lower()}.csv"
         
-        # Check if data file exists
-        if not data_path.exists():
-            return jsonify({
-                'error': f'No historical data found for medicine: {medicine_name}',
-                'hint': f'Please add a CSV file at: {data_path}'
-            }), 404
+        source, history, error = resolve_history(medicine_name, data_path)
+        if error:
+            return error
         
         # Generate forecast
         if include_plot:
-            result, plot_path = generate_forecast_plot(medicine_name, data_path, periods)
+            result, plot_path = generate_forecast_plot(medicine_name, data_path, periods, history=history)
             result['plot_path'] = str(plot_path)
         else:
-            result = generate_forecast(medicine_name, data_path, periods)
+            result = generate_forecast(medicine_name, data_path, periods, history=history)
+        result['source'] = source
         
         return jsonify(result), 200
         
@@ -408,19 +510,17 @@ def train_forecast_model(medicine_name):
         base_dir = Path(__file__).resolve().parent.parent
         data_path = base_dir / "forecasting" / "data" / f"{medicine_name.lower()}.csv"
         
-        # Check if data file exists
-        if not data_path.exists():
-            return jsonify({
-                'error': f'No historical data found for medicine: {medicine_name}',
-                'hint': f'Please add a CSV file at: {data_path}'
-            }), 404
+        source, history, error = resolve_history(medicine_name, data_path)
+        if error:
+            return error
         
         # Train model
-        model_path = train_forecast_model(medicine_name, data_path)
+        model_path = train_forecast_model(medicine_name, data_path, history=history)
         
         return jsonify({
             'message': f'Model trained successfully for {medicine_name}',
-            'model_path': str(model_path)
+            'model_path': str(model_path),
+            'source': source
         }), 200
         
     except FileNotFoundError as e:
@@ -617,17 +717,17 @@ def fetch_and_save_prophet_forecast():
             return jsonify({'error': 'days must be between 1 and 365'}), 400
         
         # Find district
-        district = District.query.filter(func.lower(District.name) == func.lower(area_name)).first()
+        district = dimension_cache.get_district_by_name(area_name)
         if not district:
             return jsonify({'error': f'District not found: {area_name}'}), 404
         
         # Find formula
-        formula = Formula.query.filter(func.lower(Formula.name) == func.lower(formula_name)).first()
+        formula = dimension_cache.get_formula_by_name(formula_name)
         if not formula:
             return jsonify({'error': f'Formula not found: {formula_name}'}), 404
         
         # Get medicines for this formula
-        medicines = Medicine.query.filter_by(formula_id=formula.id).all()
+        medicines = dimension_cache.get_formula_medicines(formula.id)
         if not medicines:
             return jsonify({'error': f'No medicines found for formula: {formula_name}'}), 404
         
@@ -761,17 +861,17 @@ def get_prophet_forecast():
             return jsonify({'error': 'formula parameter is required'}), 400
         
         # Find district
-        district = District.query.filter(func.lower(District.name) == func.lower(area_name)).first()
+        district = dimension_cache.get_district_by_name(area_name)
         if not district:
             return jsonify({'error': f'District not found: {area_name}'}), 404
         
         # Find formula
-        formula = Formula.query.filter(func.lower(Formula.name) == func.lower(formula_name)).first()
+        formula = dimension_cache.get_formula_by_name(formula_name)
         if not formula:
             return jsonify({'error': f'Formula not found: {formula_name}'}), 404
         
         # Get medicines for this formula
-        medicines = Medicine.query.filter_by(formula_id=formula.id).all()
+        medicines = dimension_cache.get_formula_medicines(formula.id)
         if not medicines:
             return jsonify({'error': f'No medicines found for formula: {formula_name}'}), 404
         
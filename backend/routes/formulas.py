@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify
 from database import db
 from models import Formula, Medicine, MedicineSales, District
+from utils.names import normalize_name
 
 formulas_bp = Blueprint('formulas', __name__)
 
@@ -41,7 +42,7 @@ def create_formula():
         return jsonify({"error": "Formula name is required"}), 400
     
     # Check if formula already exists
-    existing = Formula.query.filter_by(name=data.get('name')).first()
+    existing = Formula.query.filter_by(name_normalized=normalize_name(data.get('name'))).first()
     if existing:
         return jsonify({"error": f"Formula '{data.get('name')}' already exists"}), 409
     
@@ -65,7 +66,10 @@ def update_formula(id):
     
     # Check if name is being changed to an existing name
     if 'name' in data and data['name'] != formula.name:
-        existing = Formula.query.filter_by(name=data['name']).first()
+        existing = Formula.query.filter(
+            Formula.name_normalized == normalize_name(data['name']),
+            Formula.id != formula.id
+        ).first()
         if existing:
             return jsonify({"error": f"Formula '{data['name']}' already exists"}), 409
         formula.name = data['name']
@@ -1,14 +1,47 @@
 """Medicine management routes - CRUD operations and file upload"""
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app
 from database import db
 from models import Medicine, Formula, District, MedicineSales, MedicineForecast, DistrictMedicineLookup
 from datetime import date
-import pandas as pd
+import json
+import os
+import time
 from utils.activity_logger import log_activity
+from utils.data_version import get_data_version
+from utils.db_routing import read_from_replica
+from utils import dimension_cache
+from utils.names import normalize_name
+from utils.upload_reader import iter_upload_batches, get_file_ext, format_row_errors, text_column
+from services.upload_jobs import register_upload_handler
+from services.sales_ingest import ingest_sales_file, MAX_DISTRICT_NAME_LENGTH, DISTRICT_NAME_TOO_LONG
+from services.forecast_accuracy import refresh_forecast_accuracy
+from routes.uploads import start_upload_job
 from middleware.auth import require_auth
 
 medicines_bp = Blueprint('medicines', __name__)
 
+# Grouped catalog cache for GET /medicines, keyed by the version of every table it reads.
+# Versions are process-local, so the TTL bounds staleness across workers.
+CATALOG_TABLES = ('medicine', 'formula', 'district', 'medicine_sales', 'medicine_forecast', 'district_medicine_lookup')
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '60'))
+CATALOG_CACHE_MAX_ENTRIES = 64
+_catalog_cache = {}
+
+UPLOAD_EXTENSIONS = ('csv', 'xlsx', 'xls')
+
+# Identifier columns are pinned to str so every upload batch is typed the same way
+MEDICINE_UPLOAD_DTYPES = {'brandname': str, 'brand_name': str, 'dosagestrength': str, 'dosage_strength': str}
+SALES_UPLOAD_DTYPES = {
+    'area': str, 'district': str, 'formula': str, 'dosage': str,
+    'medicine_name_id': str, 'medicine_name': str, 'medicine_brand': str
+}
+STOCK_UPLOAD_DTYPES = {'medicine_id': str, 'adjustment_type': str}
+
+
+def normalize_upload_column(name):
+    """Normalize sales/stock upload headers, e.g. 'Medicine Name/ID' -> 'medicine_name_id'"""
+    return str(name).strip().lower().replace(' ', '_').replace('/', '_')
+
 
 # Helper functions for district_medicine_lookup management
 def ensure_district_medicine_lookup(district_id, medicine_id, formula_id):
@@ -135,6 +168,16 @@ def get_medicines():
     Get all medicines grouped by formula name.
     Includes 14-day forecast and low stock status.
     
+    Optional query params:
+    - formula: only include medicines of this formula (case-insensitive)
+    - district: only include medicines available in this district; sales and
+      forecast totals are restricted to that district
+    - limit: number of medicines to return (default: all)
+    - offset: number of medicines to skip (default: 0)
+    
+    The total number of matching medicines is returned in the X-Total-Count
+    header so the grouped body shape stays unchanged when paginating.
+    
     Returns:
         {
             "Formula A": [
@@ -151,44 +194,148 @@ def get_medicines():
             ]
         }
     """
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
+    formula_name = request.args.get('formula') or None
+    district_name = request.args.get('district') or None
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', type=int)
+    
+    body, total = _get_catalog(formula_name, district_name, limit, offset)
     
-    medicines = Medicine.query.join(Formula).order_by(Formula.name.asc()).all()
+    response = current_app.response_class(body, status=200, mimetype='application/json')
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+def _get_catalog(formula_name=None, district_name=None, limit=None, offset=None):
+    """
+    Get the grouped medicine catalog from the cache, building it on a miss.
+    
+    Returns:
+        tuple: (JSON body as a string, total number of matching medicines)
+    """
+    # Key on today's date as well, since the 14-day forecast window moves daily
+    cache_key = (
+        get_data_version(*CATALOG_TABLES), date.today(),
+        formula_name.lower() if formula_name else None,
+        district_name.lower() if district_name else None,
+        limit, offset
+    )
+    cached = _catalog_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < CATALOG_CACHE_TTL:
+        return cached[1], cached[2]
+    
+    body, total = _build_catalog(formula_name, district_name, limit, offset)
+    if len(_catalog_cache) >= CATALOG_CACHE_MAX_ENTRIES:
+        _catalog_cache.pop(next(iter(_catalog_cache)), None)
+    _catalog_cache[cache_key] = (time.monotonic(), body, total)
+    return body, total
+
+
+def warm_catalog_cache():
+    """Build the unfiltered catalog into the cache (used by the pre-fork preload)"""
+    _get_catalog()
+
 
+def _build_catalog(formula_name=None, district_name=None, limit=None, offset=None):
+    """
+    Build the grouped medicine catalog from a single SQL statement.
+    
+    Returns:
+        tuple: (JSON body as a string, total number of matching medicines)
+    """
+    from datetime import timedelta
+    from sqlalchemy import func
+    
     # Calculate 14-day forecast window
     today = date.today()
     forecast_end = today + timedelta(days=14)
     
-    # Get all forecast data for the next 14 days summed across ALL districts
-    # This sums forecasted_quantity across all districts and all dates in the 14-day window
-    forecast_query = db.session.query(
-        MedicineForecast.medicine_id,
+    sales_totals = db.session.query(
+        MedicineSales.medicine_id.label('medicine_id'),
+        func.sum(MedicineSales.quantity).label('total_sales')
+    )
+    # Forecast summed across ALL districts (unless filtered) and all dates in the window
+    forecast_totals = db.session.query(
+        MedicineForecast.medicine_id.label('medicine_id'),
         func.sum(MedicineForecast.forecasted_quantity).label('total_forecast')
     ).filter(
         MedicineForecast.forecast_date >= today,
         MedicineForecast.forecast_date < forecast_end
-    ).group_by(MedicineForecast.medicine_id).all()
+    )
+    
+    district_id = None
+    if district_name:
+        district_id = db.session.query(District.id).filter(
+            District.name_normalized == normalize_name(district_name)
+        ).scalar_subquery()
+        sales_totals = sales_totals.filter(MedicineSales.district_id == district_id)
+        forecast_totals = forecast_totals.filter(MedicineForecast.district_id == district_id)
+    
+    sales_totals = sales_totals.group_by(MedicineSales.medicine_id).subquery()
+    forecast_totals = forecast_totals.group_by(MedicineForecast.medicine_id).subquery()
+    
+    query = db.session.query(
+        Medicine.id,
+        Medicine.formula_id,
+        Formula.name,
+        Medicine.brand_name,
+        Medicine.dosage_strength,
+        Medicine.therapeutic_class,
+        Medicine.stock_level,
+        Medicine.created_at,
+        func.coalesce(sales_totals.c.total_sales, 0),
+        func.coalesce(forecast_totals.c.total_forecast, 0),
+        func.count().over()
+    ).join(
+        Formula, Formula.id == Medicine.formula_id
+    ).outerjoin(
+        sales_totals, sales_totals.c.medicine_id == Medicine.id
+    ).outerjoin(
+        forecast_totals, forecast_totals.c.medicine_id == Medicine.id
+    )
+    
+    if formula_name:
+        query = query.filter(Formula.name_normalized == normalize_name(formula_name))
+    if district_id is not None:
+        query = query.filter(Medicine.id.in_(
+            db.session.query(DistrictMedicineLookup.medicine_id).filter(
+                DistrictMedicineLookup.district_id == district_id
+            )
+        ))
+    
+    # Stable ordering so limit/offset pages don't overlap
+    query = query.order_by(Formula.name.asc(), Medicine.id.asc())
+    if offset:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit)
     
-    # Create a dictionary of medicine_id -> total forecast (sum of all areas)
-    forecast_map = {row[0]: row[1] for row in forecast_query}
-
     grouped = {}
-    for med in medicines:
-        formula_name = med.formula.name
-        if formula_name not in grouped:
-            grouped[formula_name] = []
-        
-        med_dict = med.to_dict()
-        # Add individual medicine forecast
-        forecast_14_days = forecast_map.get(med.id, 0) or 0
-        med_dict['forecast14Days'] = forecast_14_days
-        # Add low stock indicator: stock level is less than 14-day forecast
-        med_dict['isFormulaLowStock'] = med.stock_level < forecast_14_days if forecast_14_days > 0 else False
-        
-        grouped[formula_name].append(med_dict)
-
-    return jsonify(grouped), 200
+    total = 0
+    for (med_id, formula_id, formula, brand_name, dosage_strength, therapeutic_class,
+         stock_level, created_at, total_sales, total_forecast, total_count) in query.yield_per(1000):
+        total = total_count
+        forecast_14_days = int(total_forecast)
+        grouped.setdefault(formula, []).append({
+            "id": med_id,
+            "formulaId": formula_id,
+            "formulaName": formula,
+            "brandName": brand_name,
+            "dosageStrength": dosage_strength,
+            "therapeuticClass": therapeutic_class,
+            "stockLevel": stock_level,
+            "saleQuantity": int(total_sales),
+            "createdAt": created_at.isoformat() if created_at else None,
+            "forecast14Days": forecast_14_days,
+            # Low stock indicator: stock level is less than 14-day forecast
+            "isFormulaLowStock": stock_level < forecast_14_days if forecast_14_days > 0 else False
+        })
+    
+    # An offset past the end returns no rows, so fall back to a plain count
+    if not grouped and offset:
+        total = db.session.query(func.count()).select_from(query.limit(None).offset(None).subquery()).scalar()
+    
+    return json.dumps(grouped), total
 
 
 @medicines_bp.route('/medicines/<int:id>', methods=['GET'])
@@ -354,9 +501,34 @@ def get_medicine_stats():
         return jsonify({"error": str(e)}), 500
 
 
+def process_medicine_batch(df):
+    """
+    Insert one batch of rows from a medicine master upload.
+    
+    Returns:
+        tuple: (records_processed, errors) - errors are (row_number, message) tuples
+    """
+    count = 0
+    for _, row in df.iterrows():
+        # This bulk upload expects basic medicine info
+        # You may need to adjust based on actual CSV structure
+        med = Medicine(
+            formula_id=row.get('formulaid') or row.get('formula_id'),
+            brand_name=row.get('brandname') or row.get('brand_name'),
+            dosage_strength=row.get('dosagestrength') or row.get('dosage_strength'),
+            stock_level=row.get('stocklevel') or row.get('stock_level', 0)
+        )
+        db.session.add(med)
+        count += 1
+    return count, []
+
+
 @medicines_bp.route('/medicines/upload', methods=['POST'])
 def upload_medicines():
-
+    """
+    Bulk insert medicines from a CSV/Excel file.
+    Pass ?async=true to run the upload as a background job and get a job id back immediately.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
 
@@ -364,34 +536,23 @@ def upload_medicines():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
 
-    try:
-        # Detect CSV or Excel
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file)
-        elif file.filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(file)
-        else:
-            return jsonify({
-                'error': 'Unsupported file format. Use CSV or Excel.'
-            }), 400
+    if get_file_ext(file.filename) not in UPLOAD_EXTENSIONS:
+        return jsonify({
+            'error': 'Unsupported file format. Use CSV or Excel.'
+        }), 400
 
-        # Normalize column names
-        df.columns = [c.strip().lower() for c in df.columns]
+    if request.args.get('async', 'false').lower() == 'true':
+        return start_upload_job('medicines', file)
 
+    try:
         count = 0
-        for _, row in df.iterrows():
-            # This bulk upload expects basic medicine info
-            # You may need to adjust based on actual CSV structure
-            med = Medicine(
-                formula_id=row.get('formulaid') or row.get('formula_id'),
-                brand_name=row.get('brandname') or row.get('brand_name'),
-                dosage_strength=row.get('dosagestrength') or row.get('dosage_strength'),
-                stock_level=row.get('stocklevel') or row.get('stock_level', 0)
-            )
-            db.session.add(med)
-            count += 1
+        batches = iter_upload_batches(file, dtype=MEDICINE_UPLOAD_DTYPES)
+        for df in batches:
+            batch_count, _ = process_medicine_batch(df)
+            # Commit each batch so memory stays bounded on large files
+            db.session.commit()
+            count += batch_count
 
-        db.session.commit()
         return jsonify({
             'message': f'{count} medicines inserted successfully'
         }), 201
@@ -402,6 +563,7 @@ def upload_medicines():
 
 
 @medicines_bp.route('/medicines/sales', methods=['GET'])
+@read_from_replica
 def get_sales_records():
     """
     Get all sales records with medicine and district details
@@ -543,6 +705,7 @@ def create_sales_record(**kwargs):
     # Ensure district-medicine-formula lookup entry exists
     ensure_district_medicine_lookup(district.id, medicine.id, medicine.formula_id)
     
+    refresh_forecast_accuracy([(medicine.id, district.id, sale_date)])
     db.session.commit()
     
     # Log activity
@@ -598,6 +761,7 @@ def delete_sales_record(id, **kwargs):
     medicine_id = sales_record.medicine_id
     formula_id = medicine.formula_id if medicine else None
     quantity = sales_record.quantity
+    sale_date = sales_record.date
     
     # Restore stock to medicine
     if medicine:
@@ -607,7 +771,7 @@ def delete_sales_record(id, **kwargs):
     sale_details = {
         'medicine': medicine.brand_name if medicine else 'Unknown',
         'district': district.name if district else 'Unknown',
-        'date': sales_record.date.isoformat(),
+        'date': sale_date.isoformat(),
         'quantity': quantity
     }
     
@@ -618,6 +782,7 @@ def delete_sales_record(id, **kwargs):
     if formula_id:
         cleanup_district_medicine_lookup(district_id, medicine_id, formula_id)
     
+    refresh_forecast_accuracy([(medicine_id, district_id, sale_date)])
     db.session.commit()
     
     # Log activity
@@ -643,6 +808,7 @@ def download_sales_template():
     """
     Download Excel template for sales data upload with column headers
     """
+    import pandas as pd
     from io import BytesIO
     from flask import send_file
     
@@ -686,6 +852,148 @@ def download_sales_template():
         }), 500
 
 
+def process_sales_batch(df):
+    """
+    Validate and write one batch of rows from a sales upload.
+    Rows that fail validation are skipped and reported.
+    
+    Returns:
+        tuple: (records_processed, errors) - errors are (row_number, message) tuples
+    """
+    import pandas as pd
+    
+    records_processed = 0
+    errors = []
+    written_keys = []
+    
+    # Text cells, blank or missing as None (same coercion as the staged ingest)
+    district_names = text_column(df, 'area', 'district')
+    formula_names = text_column(df, 'formula')
+    # Column "Medicine Name/ID" becomes "medicine_name_id" after normalization
+    medicine_identifiers = text_column(df, 'medicine_name_id', 'medicine_name', 'medicine_brand')
+    dosages = text_column(df, 'dosage')
+    
+    for idx, row in df.iterrows():
+        try:
+            # District (accept both 'area' and 'district'); created below once the row is accepted
+            district_name = district_names[idx]
+            if not district_name:
+                errors.append((idx + 2, "Missing area/district name"))
+                continue
+            if len(district_name) > MAX_DISTRICT_NAME_LENGTH:
+                errors.append((idx + 2, DISTRICT_NAME_TOO_LONG))
+                continue
+            
+            # Get formula
+            formula_name = formula_names[idx]
+            if not formula_name:
+                errors.append((idx + 2, "Missing formula name"))
+                continue
+            
+            formula = dimension_cache.get_formula_by_name(formula_name)
+            if not formula:
+                errors.append((idx + 2, f"Formula '{formula_name}' does not exist. Create it first in Manage Formulas."))
+                continue
+            
+            # Get medicine by name/ID and optional dosage
+            medicine_identifier = medicine_identifiers[idx]
+            dosage = dosages[idx]
+            
+            if not medicine_identifier:
+                errors.append((idx + 2, "Missing medicine name/ID"))
+                continue
+            
+            # Find medicine by formula and brand name, and dosage if specified
+            # (without a dosage the first matching medicine is used)
+            match = dimension_cache.find_medicine(formula.id, medicine_identifier, dosage)
+            if not match:
+                if dosage:
+                    errors.append((idx + 2, f"Medicine '{medicine_identifier}' with dosage '{dosage}' not found. Create it first in Manage Medicines."))
+                else:
+                    errors.append((idx + 2, f"Medicine '{medicine_identifier}' not found. Create it first in Manage Medicines."))
+                continue
+            # Stock is updated below, so load the row itself (usually from the session's identity map)
+            medicine = db.session.get(Medicine, match.id)
+            if not medicine:
+                errors.append((idx + 2, f"Medicine '{medicine_identifier}' not found. Create it first in Manage Medicines."))
+                continue
+            
+            # Get date
+            sale_date = row.get('date')
+            if pd.isna(sale_date) or not sale_date:
+                sale_date = date.today()
+            else:
+                try:
+                    sale_date = pd.to_datetime(sale_date).date()
+                except:
+                    errors.append((idx + 2, "Invalid date format"))
+                    continue
+            
+            # Get sale quantity
+            sale_quantity = row.get('sale_quantity', 0)
+            try:
+                sale_quantity = int(float(sale_quantity)) if sale_quantity else 0
+            except:
+                sale_quantity = 0
+            
+            if sale_quantity <= 0:
+                errors.append((idx + 2, "Invalid sale quantity"))
+                continue
+            
+            # Check stock availability
+            if medicine.stock_level < sale_quantity:
+                errors.append((idx + 2, f"Insufficient stock. Available: {medicine.stock_level}, Required: {sale_quantity}"))
+                continue
+            
+            # Get or create district, only for accepted rows (as the staged ingest does)
+            district = dimension_cache.get_district_by_name(district_name)
+            if not district:
+                # Not committed yet: may have been created earlier in this upload
+                district = District.query.filter(District.name_normalized == normalize_name(district_name)).first()
+            if not district:
+                district = District(name=district_name)
+                db.session.add(district)
+                db.session.flush()
+            
+            # Check if sales record exists for this medicine/district/date
+            sales_record = MedicineSales.query.filter_by(
+                medicine_id=medicine.id,
+                district_id=district.id,
+                date=sale_date
+            ).first()
+            
+            if sales_record:
+                # Restore previous quantity to stock before updating
+                medicine.stock_level += sales_record.quantity
+                # Update sales record
+                sales_record.quantity = sale_quantity
+                # Deduct new quantity from stock
+                medicine.stock_level -= sale_quantity
+            else:
+                # Create new sales record and reduce stock
+                sales_record = MedicineSales(
+                    medicine_id=medicine.id,
+                    district_id=district.id,
+                    date=sale_date,
+                    quantity=sale_quantity
+                )
+                db.session.add(sales_record)
+                medicine.stock_level -= sale_quantity
+            
+            # Ensure district-medicine-formula lookup entry exists
+            ensure_district_medicine_lookup(district.id, medicine.id, medicine.formula_id)
+            
+            written_keys.append((medicine.id, district.id, sale_date))
+            records_processed += 1
+            
+        except Exception as e:
+            errors.append((idx + 2, str(e)))
+            continue
+    
+    refresh_forecast_accuracy(written_keys)
+    return records_processed, errors
+
+
 @medicines_bp.route('/medicines/sales/upload', methods=['POST'])
 @require_auth
 def upload_sales_data(**kwargs):
@@ -693,6 +1001,9 @@ def upload_sales_data(**kwargs):
     Upload sales data from Excel/CSV file
     Expected columns: Date, Area, Formula, Medicine Name/ID, Dosage (optional), Sale Quantity
     Medicine Name/ID accepts either medicine ID or brand name
+    Pass ?async=true to run the upload as a background job and get a job id back immediately.
+    Pass ?mode=staging to load the whole file into a staging table and apply it in one
+    transaction (all accepted rows or none if the upload fails part way).
     """
     g.current_user = kwargs.get('current_user')
     try:
@@ -703,137 +1014,28 @@ def upload_sales_data(**kwargs):
         if file.filename == '':
             return jsonify({'error': 'Empty filename'}), 400
         
-        # Read file
-        file_ext = file.filename.rsplit('.', 1)[1].lower()
-        if file_ext == 'csv':
-            df = pd.read_csv(file)
-        elif file_ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file)
-        else:
+        if get_file_ext(file.filename) not in UPLOAD_EXTENSIONS:
             return jsonify({'error': 'Unsupported file format. Use CSV or Excel.'}), 400
         
-        # Normalize column names - replace both spaces and slashes with underscores
-        df.columns = [c.strip().lower().replace(' ', '_').replace('/', '_') for c in df.columns]
-        
-        records_processed = 0
-        errors = []
-        
-        for idx, row in df.iterrows():
-            try:
-                # Get or create district (accept both 'area' and 'district')
-                district_name = str(row.get('area', row.get('district', ''))).strip()
-                if not district_name:
-                    errors.append(f"Row {idx+2}: Missing area/district name")
-                    continue
-                
-                district = District.query.filter_by(name=district_name).first()
-                if not district:
-                    district = District(name=district_name)
-                    db.session.add(district)
-                    db.session.flush()
-                
-                # Get or create formula
-                formula_name = str(row.get('formula', '')).strip()
-                if not formula_name:
-                    errors.append(f"Row {idx+2}: Missing formula name")
-                    continue
-                
-                formula = Formula.query.filter_by(name=formula_name).first()
-                if not formula:
-                    errors.append(f"Row {idx+2}: Formula '{formula_name}' does not exist. Create it first in Manage Formulas.")
-                    continue
-                
-                # Get medicine by name/ID and optional dosage
-                # Column "Medicine Name/ID" becomes "medicine_name_id" after normalization
-                medicine_identifier = str(row.get('medicine_name_id', row.get('medicine_name', row.get('medicine_brand', '')))).strip()
-                dosage = str(row.get('dosage', '')).strip()
-                
-                if not medicine_identifier:
-                    errors.append(f"Row {idx+2}: Missing medicine name/ID")
-                    continue
-                
-                # Try to find medicine by brand name (medicine_id column removed)
-                # First try exact match with formula and brand name
-                query = Medicine.query.filter_by(
-                    formula_id=formula.id,
-                    brand_name=medicine_identifier
-                )
-                
-                # If dosage specified, filter by it
-                if dosage:
-                    medicine = query.filter_by(dosage_strength=dosage).first()
-                    if not medicine:
-                        errors.append(f"Row {idx+2}: Medicine '{medicine_identifier}' with dosage '{dosage}' not found. Create it first in Manage Medicines.")
-                        continue
-                else:
-                    # No dosage specified, use first available
-                    medicine = query.first()
-                    if not medicine:
-                        errors.append(f"Row {idx+2}: Medicine '{medicine_identifier}' not found. Create it first in Manage Medicines.")
-                        continue
-                
-                # Get date
-                sale_date = row.get('date')
-                if pd.isna(sale_date) or not sale_date:
-                    sale_date = date.today()
-                else:
-                    try:
-                        sale_date = pd.to_datetime(sale_date).date()
-                    except:
-                        errors.append(f"Row {idx+2}: Invalid date format")
-                        continue
-                
-                # Get sale quantity
-                sale_quantity = row.get('sale_quantity', 0)
-                try:
-                    sale_quantity = int(float(sale_quantity)) if sale_quantity else 0
-                except:
-                    sale_quantity = 0
-                
-                if sale_quantity <= 0:
-                    errors.append(f"Row {idx+2}: Invalid sale quantity")
-                    continue
-                
-                # Check stock availability
-                if medicine.stock_level < sale_quantity:
-                    errors.append(f"Row {idx+2}: Insufficient stock. Available: {medicine.stock_level}, Required: {sale_quantity}")
-                    continue
-                
-                # Check if sales record exists for this medicine/district/date
-                sales_record = MedicineSales.query.filter_by(
-                    medicine_id=medicine.id,
-                    district_id=district.id,
-                    date=sale_date
-                ).first()
-                
-                if sales_record:
-                    # Restore previous quantity to stock before updating
-                    medicine.stock_level += sales_record.quantity
-                    # Update sales record
-                    sales_record.quantity = sale_quantity
-                    # Deduct new quantity from stock
-                    medicine.stock_level -= sale_quantity
-                else:
-                    # Create new sales record and reduce stock
-                    sales_record = MedicineSales(
-                        medicine_id=medicine.id,
-                        district_id=district.id,
-                        date=sale_date,
-                        quantity=sale_quantity
-                    )
-                    db.session.add(sales_record)
-                    medicine.stock_level -= sale_quantity
-                
-                # Ensure district-medicine-formula lookup entry exists
-                ensure_district_medicine_lookup(district.id, medicine.id, medicine.formula_id)
-                
-                records_processed += 1
-                
-            except Exception as e:
-                errors.append(f"Row {idx+2}: {str(e)}")
-                continue
+        if request.args.get('async', 'false').lower() == 'true':
+            return start_upload_job('sales', file, user=g.current_user)
         
-        db.session.commit()
+        # Normalize column names - replace both spaces and slashes with underscores
+        if request.args.get('mode') == 'staging':
+            records_processed, errors = ingest_sales_file(
+                file, dtype=SALES_UPLOAD_DTYPES, normalize=normalize_upload_column
+            )
+        else:
+            records_processed = 0
+            errors = []
+            
+            # Stream the file in batches, committing each one so memory stays bounded
+            batches = iter_upload_batches(file, dtype=SALES_UPLOAD_DTYPES, normalize=normalize_upload_column)
+            for df in batches:
+                batch_processed, batch_errors = process_sales_batch(df)
+                db.session.commit()
+                records_processed += batch_processed
+                errors.extend(batch_errors)
         
         # Log activity
         user = getattr(g, 'current_user', None)
@@ -858,7 +1060,7 @@ def upload_sales_data(**kwargs):
         }
         
         if errors:
-            response['errors'] = errors[:10]  # Limit to first 10 errors
+            response['errors'] = format_row_errors(errors[:10])  # Limit to first 10 errors; use ?async=true for the full list
             response['total_errors'] = len(errors)
         
         return jsonify(response), 200
@@ -876,6 +1078,7 @@ def download_stock_template():
     """
     Download Excel template for stock adjustments
     """
+    import pandas as pd
     from io import BytesIO
     from flask import send_file
     
@@ -916,12 +1119,123 @@ def download_stock_template():
         }), 500
 
 
+# Rows per IN (...) / UPDATE ... CASE statement when applying bulk stock adjustments
+STOCK_BATCH_SIZE = 1000
+
+
+def apply_stock_adjustments(df):
+    """
+    Validate and apply a frame of stock adjustments in bulk.
+    
+    Rows are validated together, ADD/REDUCE deltas are aggregated per medicine,
+    all touched medicines are fetched with batched IN queries and the new stock
+    levels are written with batched UPDATE ... CASE statements.
+    
+    REDUCE rows keep row-order semantics: a reduction is rejected if the stock
+    left after the earlier accepted rows for that medicine cannot cover it.
+    
+    Args:
+        df: DataFrame with normalized columns medicine_id, adjustment_type, quantity
+    
+    Returns:
+        tuple: (records_processed, errors) - errors are (row_number, message) tuples in file order
+    """
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import case
+    
+    def column(name):
+        if name in df.columns:
+            return df[name]
+        return pd.Series('', index=df.index)
+    
+    row_numbers = df.index.to_numpy() + 2
+    id_str = column('medicine_id').fillna('').astype(str).str.strip()
+    adjustment_type = column('adjustment_type').astype(str).str.strip().str.upper()
+    quantity = np.trunc(pd.to_numeric(column('quantity'), errors='coerce').fillna(0)).astype('int64')
+    
+    is_numeric = id_str.str.isdigit()
+    medicine_id = pd.to_numeric(id_str.where(is_numeric), errors='coerce').astype('Int64')
+    
+    # Fetch current stock for every referenced medicine, locking the rows until commit
+    stock = {}
+    candidate_ids = [int(mid) for mid in medicine_id.dropna().unique()]
+    for start in range(0, len(candidate_ids), STOCK_BATCH_SIZE):
+        chunk = candidate_ids[start:start + STOCK_BATCH_SIZE]
+        rows = db.session.query(Medicine.id, Medicine.stock_level).filter(
+            Medicine.id.in_(chunk)
+        ).with_for_update().all()
+        stock.update({mid: level for mid, level in rows})
+    
+    found = medicine_id.isin(list(stock.keys())).fillna(False).astype(bool)
+    
+    # First failing check wins, in the same order the checks have always run
+    conditions = [
+        id_str == '',
+        ~is_numeric,
+        ~found,
+        ~adjustment_type.isin(['ADD', 'REDUCE']),
+        quantity <= 0,
+    ]
+    messages = [
+        pd.Series('Missing Medicine ID', index=df.index),
+        "Medicine ID must be numeric (e.g., 1, 2, 3), got '" + id_str + "'",
+        'Medicine with ID ' + medicine_id.astype('string').fillna('') + ' not found',
+        pd.Series("Invalid adjustment type. Use 'ADD' or 'REDUCE'", index=df.index),
+        pd.Series('Invalid quantity', index=df.index),
+    ]
+    error_text = pd.Series(np.select(
+        [c.to_numpy() for c in conditions],
+        [m.to_numpy() for m in messages],
+        default=''
+    ), index=df.index)
+    
+    errors = {int(row): text for row, text in zip(row_numbers[error_text != ''], error_text[error_text != ''])}
+    
+    valid = pd.DataFrame({
+        'row': row_numbers,
+        'medicine_id': medicine_id,
+        'is_reduce': adjustment_type == 'REDUCE',
+        'quantity': quantity,
+    })[(error_text == '').to_numpy()].copy()
+    valid['medicine_id'] = valid['medicine_id'].astype('int64')
+    valid['delta'] = np.where(valid['is_reduce'], -valid['quantity'], valid['quantity'])
+    valid['accepted'] = True
+    
+    # Fast path: if the running stock never goes negative, every row is accepted.
+    # Only medicines that dip below zero need the row-by-row walk.
+    running = valid['medicine_id'].map(stock) + valid.groupby('medicine_id')['delta'].cumsum()
+    for mid in valid.loc[running < 0, 'medicine_id'].unique():
+        level = stock[int(mid)]
+        for idx, row in valid[valid['medicine_id'] == mid].iterrows():
+            if row['is_reduce'] and level < row['quantity']:
+                errors[int(row['row'])] = f"Cannot reduce {row['quantity']} units. Available stock: {level}"
+                valid.at[idx, 'accepted'] = False
+            else:
+                level += row['delta']
+    
+    accepted = valid[valid['accepted']]
+    deltas = accepted.groupby('medicine_id')['delta'].sum()
+    deltas = {int(mid): int(delta) for mid, delta in deltas.items() if delta != 0}
+    
+    delta_ids = list(deltas.keys())
+    for start in range(0, len(delta_ids), STOCK_BATCH_SIZE):
+        chunk = {mid: deltas[mid] for mid in delta_ids[start:start + STOCK_BATCH_SIZE]}
+        db.session.query(Medicine).filter(Medicine.id.in_(list(chunk.keys()))).update(
+            {Medicine.stock_level: Medicine.stock_level + case(chunk, value=Medicine.id, else_=0)},
+            synchronize_session=False
+        )
+    
+    return len(accepted), sorted(errors.items())
+
+
 @medicines_bp.route('/medicines/stock/upload', methods=['POST'])
 @require_auth
 def upload_stock_adjustments(**kwargs):
     """
     Upload stock adjustments from Excel/CSV file
     Expected columns: Medicine Name/ID, Adjustment Type (ADD/REDUCE), Quantity
+    Pass ?async=true to run the upload as a background job and get a job id back immediately.
     """
     g.current_user = kwargs.get('current_user')
     try:
@@ -932,74 +1246,23 @@ def upload_stock_adjustments(**kwargs):
         if file.filename == '':
             return jsonify({'error': 'Empty filename'}), 400
         
-        # Read file
-        file_ext = file.filename.rsplit('.', 1)[1].lower()
-        if file_ext == 'csv':
-            df = pd.read_csv(file)
-        elif file_ext in ['xlsx', 'xls']:
-            df = pd.read_excel(file)
-        else:
+        if get_file_ext(file.filename) not in UPLOAD_EXTENSIONS:
             return jsonify({'error': 'Unsupported file format. Use CSV or Excel.'}), 400
         
-        # Normalize column names
-        df.columns = [c.strip().lower().replace(' ', '_').replace('/', '_') for c in df.columns]
+        if request.args.get('async', 'false').lower() == 'true':
+            return start_upload_job('stock', file, user=g.current_user)
         
         records_processed = 0
         errors = []
         
-        for idx, row in df.iterrows():
-            try:
-                # Get medicine ID (must be numeric)
-                medicine_id_str = str(row.get('medicine_id', '')).strip()
-                if not medicine_id_str:
-                    errors.append(f"Row {idx+2}: Missing Medicine ID")
-                    continue
-                
-                # Validate that it's a numeric ID
-                if not medicine_id_str.isdigit():
-                    errors.append(f"Row {idx+2}: Medicine ID must be numeric (e.g., 1, 2, 3), got '{medicine_id_str}'")
-                    continue
-                
-                medicine_id = int(medicine_id_str)
-                medicine = Medicine.query.get(medicine_id)
-                
-                if not medicine:
-                    errors.append(f"Row {idx+2}: Medicine with ID {medicine_id} not found")
-                    continue
-                
-                # Get adjustment type
-                adjustment_type = str(row.get('adjustment_type', '')).strip().upper()
-                if adjustment_type not in ['ADD', 'REDUCE']:
-                    errors.append(f"Row {idx+2}: Invalid adjustment type. Use 'ADD' or 'REDUCE'")
-                    continue
-                
-                # Get quantity
-                quantity = row.get('quantity', 0)
-                try:
-                    quantity = int(float(quantity)) if quantity else 0
-                except:
-                    quantity = 0
-                
-                if quantity <= 0:
-                    errors.append(f"Row {idx+2}: Invalid quantity")
-                    continue
-                
-                # Apply adjustment
-                if adjustment_type == 'ADD':
-                    medicine.stock_level += quantity
-                else:  # REDUCE
-                    if medicine.stock_level < quantity:
-                        errors.append(f"Row {idx+2}: Cannot reduce {quantity} units. Available stock: {medicine.stock_level}")
-                        continue
-                    medicine.stock_level -= quantity
-                
-                records_processed += 1
-                
-            except Exception as e:
-                errors.append(f"Row {idx+2}: {str(e)}")
-                continue
-        
-        db.session.commit()
+        # Batches are applied and committed in file order, so REDUCE checks
+        # in later batches see the stock left by earlier ones
+        batches = iter_upload_batches(file, dtype=STOCK_UPLOAD_DTYPES, normalize=normalize_upload_column)
+        for df in batches:
+            batch_processed, batch_errors = apply_stock_adjustments(df)
+            db.session.commit()
+            records_processed += batch_processed
+            errors.extend(batch_errors)
         
         # Log activity
         user = getattr(g, 'current_user', None)
@@ -1024,7 +1287,7 @@ def upload_stock_adjustments(**kwargs):
         }
         
         if errors:
-            response['errors'] = errors[:10]  # Limit to first 10 errors
+            response['errors'] = format_row_errors(errors[:10])  # Limit to first 10 errors; use ?async=true for the full list
             response['total_errors'] = len(errors)
         
         return jsonify(response), 200
@@ -1036,3 +1299,11 @@ def upload_stock_adjustments(**kwargs):
             'error': str(e)
         }), 500
 
+
+# Background upload job handlers (see services/upload_jobs.py)
+register_upload_handler('medicines', process_medicine_batch, entity_type='medicine',
+                        dtype=MEDICINE_UPLOAD_DTYPES)
+register_upload_handler('sales', process_sales_batch, entity_type='sales_data',
+                        dtype=SALES_UPLOAD_DTYPES, normalize=normalize_upload_column)
+register_upload_handler('stock', apply_stock_adjustments, entity_type='stock_data',
+                        dtype=STOCK_UPLOAD_DTYPES, normalize=normalize_upload_column)
@@ -1,6 +1,7 @@
 """Report generation routes - PDF reports with role-based access control"""
 from flask import Blueprint, request, jsonify, send_file, make_response
 from middleware.auth import require_role
+from utils.db_routing import route_reads_to_replica
 from database import db
 from models import MedicineSales, MedicineForecast, Formula, District
 from sqlalchemy import func, extract, distinct
@@ -8,12 +9,11 @@ import os
 import sys
 from io import BytesIO
 from datetime import datetime
-from generate_all_reports import generate_district_report
 
 # Add parent directory for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-reports_bp = Blueprint('reports', __name__)
+reports_bp = route_reads_to_replica(Blueprint('reports', __name__))
 
 
 @reports_bp.after_request
@@ -273,6 +273,7 @@ def generate_area_summary_report_api(**kwargs):
         year = request.args.get('year', datetime.now().year, type=int)
         
         # Import report generation function
+        from generate_all_reports import generate_district_report
         print(f"Generating area summary report for year: {year}")
         generate_district_report(year)
         
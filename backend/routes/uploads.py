@@ -0,0 +1,97 @@
+"""Upload job routes - progress and error reports for background uploads"""
+import csv
+import io
+from flask import Blueprint, jsonify, Response, stream_with_context
+from werkzeug.utils import secure_filename
+from database import db
+from models import UploadJob
+from middleware.auth import require_auth
+from services.upload_jobs import submit_upload_job, iter_job_errors
+
+uploads_bp = Blueprint('uploads', __name__)
+
+
+def start_upload_job(upload_type, file, user=None):
+    """
+    Queue an upload as a background job and build the 202 response.
+    Used by the upload routes when called with ?async=true.
+    """
+    job = submit_upload_job(upload_type, file, user=user)
+    return jsonify({
+        'success': True,
+        'message': f'Upload queued: {job.file_name}',
+        'jobId': job.id,
+        'job': job.to_dict()
+    }), 202
+
+
+def get_visible_job(job_id, user):
+    """
+    The job, if the user may see it: its own uploads, or any upload for admins
+    (jobs without a user, such as medicine uploads, are admin-only).
+
+    Returns:
+        tuple: (job, None) or (None, error response)
+    """
+    job = db.session.get(UploadJob, job_id)
+    # Someone else's job is reported as missing rather than forbidden
+    if not job or (user.role != 'admin' and job.user_id != user.id):
+        return None, (jsonify({'error': 'Upload job not found'}), 404)
+    return job, None
+
+
+@uploads_bp.route('/uploads/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_upload_job(job_id, **kwargs):
+    """
+    Get progress of a background upload job (own jobs; admins see all)
+
+    Returns:
+        {
+            "id": "3f2a...",
+            "uploadType": "sales",
+            "fileName": "sales_march.xlsx",
+            "status": "running",
+            "rowsProcessed": 15000,
+            "rowsFailed": 12,
+            "batchesCommitted": 3,
+            "rowsPerSecond": 2400.5,
+            ...
+        }
+    """
+    job, error = get_visible_job(job_id, kwargs['current_user'])
+    if error:
+        return error
+    return jsonify(job.to_dict()), 200
+
+
+@uploads_bp.route('/uploads/jobs/<job_id>/errors', methods=['GET'])
+@require_auth
+def download_upload_job_errors(job_id, **kwargs):
+    """
+    Download every row error of a background upload job as CSV (columns: Row, Error)
+    (own jobs; admins see all)
+    """
+    job, error = get_visible_job(job_id, kwargs['current_user'])
+    if error:
+        return error
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Row', 'Error'])
+        for row_number, message in iter_job_errors(job_id):
+            writer.writerow([row_number, message])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    # ASCII letters, digits, '.', '_' and '-' only, so the name can't break the header
+    safe_name = secure_filename(job.file_name.rsplit('.', 1)[0]) or 'upload'
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{safe_name}_errors.csv"'}
+    )
@@ -2,7 +2,7 @@
 from flask import Blueprint, request, jsonify
 from database import db
 from models import User
-from middleware.auth import require_role, require_auth, get_current_user, generate_token
+from middleware.auth import require_role, require_auth, get_current_user, generate_token, invalidate_cached_user
 import jwt
 import os
 
@@ -35,6 +35,7 @@ def get_user(user_id, **kwargs):
 def update_user(user_id, **kwargs):
 
     user = User.query.get_or_404(user_id)
+    previous_username = user.username
     data = request.get_json() or {}
     
     # Update username if provided
@@ -62,6 +63,7 @@ def update_user(user_id, **kwargs):
         user.set_password(data['password'])
     
     db.session.commit()
+    invalidate_cached_user(previous_username, user.username)
     return jsonify({
         "message": "user updated successfully",
         "user": user.to_dict()
@@ -79,8 +81,10 @@ def delete_user(user_id, **kwargs):
     if current_username == user.username:
         return jsonify({"error": "cannot delete your own account"}), 400
     
+    username = user.username
     db.session.delete(user)
     db.session.commit()
+    invalidate_cached_user(username)
     
     # Reset auto-increment to the maximum existing ID + 1
     result = db.session.execute("SELECT MAX(id) FROM user").scalar()
@@ -107,6 +111,7 @@ def get_profile(current_user, **kwargs):
 def update_profile(current_user, **kwargs):
 
     data = request.get_json() or {}
+    previous_username = current_user.username
     username_changed = False
     
     # Update username if provided
@@ -128,6 +133,7 @@ def update_profile(current_user, **kwargs):
     # Note: users cannot change their own role
     
     db.session.commit()
+    invalidate_cached_user(previous_username, current_user.username)
     
     # If username changed, issue a new token
     response_data = {
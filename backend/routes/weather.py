@@ -4,24 +4,44 @@ Endpoints for weather data and forecast management
 """
 from flask import Blueprint, jsonify, request, g
 from middleware.auth import require_auth, require_role
-from services.weather_service import update_weather_database, get_weather_data
+from services.weather_service import (
+    update_weather_database, get_weather_data, get_district_location, upsert_weather_records,
+    last_update_durations, KARACHI_LATITUDE, KARACHI_LONGITUDE
+)
+from models import DEFAULT_WEATHER_LOCATION
+from utils.upload_reader import iter_upload_batches, get_file_ext, format_row_errors
+from services.upload_jobs import register_upload_handler
+from routes.uploads import start_upload_job
+from utils.db_routing import read_from_replica
+import itertools
 
 weather_bp = Blueprint('weather', __name__)
 
 
+def _requested_location():
+    """Weather location for the optional district_id query param"""
+    district_id = request.args.get('district_id', type=int)
+    if district_id is None:
+        return DEFAULT_WEATHER_LOCATION
+    return get_district_location(district_id)
+
+
 @weather_bp.route('/weather', methods=['GET'])
+@read_from_replica
 def get_weather():
     """
     Get weather data (historical + forecast)
     Query params:
         - days: Number of days of historical data (default: 365)
         - include_forecast: Whether to include forecast (default: true)
+        - district_id: Return the weather of this district's location (default: Karachi)
     """
     try:
         days = request.args.get('days', 365, type=int)
         include_forecast = request.args.get('include_forecast', 'true').lower() == 'true'
+        location = _requested_location()
         
-        weather_data = get_weather_data(days=days, include_forecast=include_forecast)
+        weather_data = get_weather_data(days=days, include_forecast=include_forecast, location=location)
         
         return jsonify({
             'success': True,
@@ -37,12 +57,15 @@ def get_weather():
 
 
 @weather_bp.route('/weather/forecast', methods=['GET'])
+@read_from_replica
 def get_forecast_only():
     """
     Get only forecast data (next 14 days)
+    Query params:
+        - district_id: Return the forecast of this district's location (default: Karachi)
     """
     try:
-        weather_data = get_weather_data(days=0, include_forecast=True)
+        weather_data = get_weather_data(days=0, include_forecast=True, location=_requested_location())
         # Filter only forecast records
         forecast_data = [record for record in weather_data if record.get('isForecast')]
         
@@ -74,7 +97,8 @@ def trigger_weather_update(**kwargs):
         return jsonify({
             'success': True,
             'message': f'Successfully updated {records_updated} weather forecast records',
-            'records_updated': records_updated
+            'records_updated': records_updated,
+            'phase_durations': dict(last_update_durations)
         }), 200
         
     except Exception as e:
@@ -84,6 +108,87 @@ def trigger_weather_update(**kwargs):
         }), 500
 
 
+# Columns every weather upload must provide
+WEATHER_UPLOAD_COLUMNS = [
+    'date', 'apparent_temperature_max', 'apparent_temperature_min',
+    'apparent_temperature_mean', 'relative_humidity_2m_mean',
+    'relative_humidity_2m_max', 'relative_humidity_2m_min'
+]
+WEATHER_VALUE_COLUMNS = WEATHER_UPLOAD_COLUMNS[1:]
+
+
+def process_weather_batch(df):
+    """
+    Insert or update one batch of rows from a weather upload.
+    Dates and values are parsed for the whole frame at once and the valid rows
+    are written to the default location with multi-row upserts keyed on
+    (location, date) (see upsert_weather_records).
+    
+    Returns:
+        tuple: (records_added, records_updated, errors) - errors are (row_number, message) tuples
+    
+    Raises:
+        ValueError: If required columns are missing
+    """
+    import pandas as pd
+    from models import WeatherData
+    from database import db
+    
+    missing_cols = [col for col in WEATHER_UPLOAD_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f'Missing required columns: {", ".join(missing_cols)}')
+    
+    # Parse dates (strings must be YYYY-MM-DD; Excel dates are already datetimes)
+    raw_dates = df['date']
+    dates = pd.to_datetime(raw_dates, format='%Y-%m-%d', errors='coerce')
+    row_errors = pd.Series(None, index=df.index, dtype=object)
+    row_errors[raw_dates.isna()] = 'Missing date'
+    bad_dates = raw_dates.notna() & dates.isna()
+    row_errors[bad_dates] = [
+        f"time data '{value}' does not match format '%Y-%m-%d'" for value in raw_dates[bad_dates]
+    ]
+    
+    values = {}
+    for col in WEATHER_VALUE_COLUMNS:
+        values[col] = pd.to_numeric(df[col], errors='coerce')
+        bad_values = row_errors.isna() & df[col].notna() & values[col].isna()
+        row_errors[bad_values] = [f"could not convert string to float: '{value}'" for value in df.loc[bad_values, col]]
+    
+    errors = [(idx + 2, message) for idx, message in row_errors.dropna().items()]
+    valid = row_errors.isna()
+    if not valid.any():
+        return 0, 0, errors
+    
+    batch = pd.DataFrame({'date': dates[valid].dt.date, **{col: values[col][valid] for col in WEATHER_VALUE_COLUMNS}})
+    batch = batch.astype(object).where(batch.notna(), None)
+    # Uploads are for the default (Karachi) location
+    batch['location'] = DEFAULT_WEATHER_LOCATION
+    batch['latitude'] = KARACHI_LATITUDE
+    batch['longitude'] = KARACHI_LONGITUDE
+    batch['is_forecast'] = True  # Manual uploads treated as forecast
+    
+    # Repeated dates in the file: the last row wins and the earlier ones count as updates
+    unique_dates = batch['date'].drop_duplicates()
+    existing_dates = {
+        d for (d,) in db.session.query(WeatherData.date).filter(
+            WeatherData.location == DEFAULT_WEATHER_LOCATION,
+            WeatherData.date.between(unique_dates.min(), unique_dates.max())
+        )
+    }
+    records_added = int((~unique_dates.isin(existing_dates)).sum())
+    records_updated = len(batch) - records_added
+    
+    upsert_weather_records(batch.drop_duplicates('date', keep='last').to_dict('records'))
+    
+    return records_added, records_updated, errors
+
+
+def _process_weather_job_batch(df):
+    """Adapt process_weather_batch to the (records_processed, errors) shape used by upload jobs"""
+    records_added, records_updated, errors = process_weather_batch(df)
+    return records_added + records_updated, errors
+
+
 @weather_bp.route('/weather/upload', methods=['POST'])
 @require_auth
 @require_role(['admin', 'analyst'])
@@ -93,10 +198,8 @@ def upload_weather_data(**kwargs):
     Expected columns: date, apparent_temperature_max, apparent_temperature_min, 
                      apparent_temperature_mean, relative_humidity_2m_mean,
                      relative_humidity_2m_max, relative_humidity_2m_min
+    Pass ?async=true to run the upload as a background job and get a job id back immediately.
     """
-    import pandas as pd
-    from datetime import datetime
-    from models import WeatherData
     from database import db
     
     try:
@@ -108,25 +211,18 @@ def upload_weather_data(**kwargs):
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'}), 400
         
-        # Read Excel or CSV file
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file)
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file)
-        else:
+        if get_file_ext(file.filename) not in ('csv', 'xlsx', 'xls'):
             return jsonify({'success': False, 'error': 'Invalid file format. Use CSV or Excel'}), 400
         
-        # Normalize column names (lowercase, strip spaces)
-        df.columns = df.columns.str.lower().str.strip()
+        if request.args.get('async', 'false').lower() == 'true':
+            return start_upload_job('weather', file, user=g.current_user)
         
-        # Required columns
-        required_cols = [
-            'date', 'apparent_temperature_max', 'apparent_temperature_min',
-            'apparent_temperature_mean', 'relative_humidity_2m_mean',
-            'relative_humidity_2m_max', 'relative_humidity_2m_min'
-        ]
+        # Stream the file in batches (column names are lowercased and stripped)
+        batches = iter_upload_batches(file)
+        df = next(batches, None)
         
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        columns = df.columns if df is not None else []
+        missing_cols = [col for col in WEATHER_UPLOAD_COLUMNS if col not in columns]
         if missing_cols:
             return jsonify({
                 'success': False,
@@ -138,46 +234,12 @@ def upload_weather_data(**kwargs):
         records_updated = 0
         errors = []
         
-        for idx, row in df.iterrows():
-            try:
-                # Parse date
-                if isinstance(row['date'], str):
-                    date_obj = datetime.strptime(row['date'], '%Y-%m-%d').date()
-                else:
-                    date_obj = pd.to_datetime(row['date']).date()
-                
-                # Check if record exists
-                existing = WeatherData.query.filter_by(date=date_obj).first()
-                
-                weather_data = {
-                    'date': date_obj,
-                    'latitude': 24.8607,  # Karachi coordinates
-                    'longitude': 67.0011,
-                    'apparent_temperature_max': float(row['apparent_temperature_max']),
-                    'apparent_temperature_min': float(row['apparent_temperature_min']),
-                    'apparent_temperature_mean': float(row['apparent_temperature_mean']),
-                    'relative_humidity_2m_mean': float(row['relative_humidity_2m_mean']),
-                    'relative_humidity_2m_max': float(row['relative_humidity_2m_max']),
-                    'relative_humidity_2m_min': float(row['relative_humidity_2m_min']),
-                    'is_forecast': True  # Manual uploads treated as forecast
-                }
-                
-                if existing:
-                    # Update existing record
-                    for key, value in weather_data.items():
-                        if key != 'date':
-                            setattr(existing, key, value)
-                    records_updated += 1
-                else:
-                    # Create new record
-                    new_weather = WeatherData(**weather_data)
-                    db.session.add(new_weather)
-                    records_added += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {idx + 2}: {str(e)}")
-        
-        db.session.commit()
+        for df in itertools.chain([df], batches):
+            batch_added, batch_updated, batch_errors = process_weather_batch(df)
+            db.session.commit()
+            records_added += batch_added
+            records_updated += batch_updated
+            errors.extend(batch_errors)
         
         message = f'Successfully added {records_added} and updated {records_updated} weather records'
         if errors:
@@ -188,7 +250,7 @@ def upload_weather_data(**kwargs):
             'message': message,
             'records_added': records_added,
             'records_updated': records_updated,
-            'errors': errors[:10]  # Return first 10 errors
+            'errors': format_row_errors(errors[:10])  # Return first 10 errors
         }), 200
         
     except Exception as e:
@@ -261,3 +323,7 @@ def download_weather_template(**kwargs):
             'success': False,
             'error': str(e)
         }), 500
+
+
+# Background upload job handler (see services/upload_jobs.py)
+register_upload_handler('weather', _process_weather_job_batch, entity_type='weather_data')
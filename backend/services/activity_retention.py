@@ -0,0 +1,198 @@
+"""
+Activity Retention Service - Rollup and monthly archiving of the activity log
+Complete days are summarized into activity_daily_summary, then whole months
+older than ACTIVITY_RETENTION_MONTHS are written to gzip-compressed CSV files
+and deleted from the activity table, oldest month first.
+
+Activity timestamps are naive server-local times (utils/activity_logger.py
+stamps them with datetime.now()), so days and months are cut at local
+midnight, using date.today() on the same clock.
+"""
+import csv
+import gzip
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, func
+from database import db
+from models import Activity, ActivityDailySummary
+
+ACTIVITY_RETENTION_MONTHS = int(os.getenv('ACTIVITY_RETENTION_MONTHS', '12'))
+ACTIVITY_ARCHIVE_DIR = os.getenv(
+    'ACTIVITY_ARCHIVE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archives', 'activity')
+)
+# Rows per read while archiving and per DELETE afterwards
+ACTIVITY_ARCHIVE_BATCH_SIZE = int(os.getenv('ACTIVITY_ARCHIVE_BATCH_SIZE', '5000'))
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'user_name', 'action_type', 'entity_type', 'entity_id', 'details', 'timestamp')
+
+activity = Activity.__table__
+summary = ActivityDailySummary.__table__
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    'runs': 0,
+    'failures': 0,
+    'totalRowsArchived': 0,
+    'totalDaysRolledUp': 0,
+    'lastRun': None,
+}
+
+
+def get_retention_metrics():
+    """Counters of the retention job in this process and the result of its last run"""
+    with _metrics_lock:
+        return {**_metrics, 'lastRun': dict(_metrics['lastRun']) if _metrics['lastRun'] else None}
+
+
+def _month_start(day, months_back=0):
+    """First day of the month `months_back` months before the month of `day`"""
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def rollup_activity_days(until=None):
+    """
+    Add summary rows for every complete day not summarized yet.
+
+    Args:
+        until: First day not to summarize (default: today in server-local time,
+            like the activity timestamps; it is still filling up)
+
+    Returns:
+        int: Number of days summarized
+    """
+    until = until or date.today()
+    last_day = db.session.execute(select(func.max(summary.c.day))).scalar()
+    if last_day is not None:
+        start = last_day + timedelta(days=1)
+    else:
+        first = db.session.execute(select(func.min(activity.c.timestamp))).scalar()
+        if first is None:
+            return 0
+        start = first.date()
+    if start >= until:
+        return 0
+
+    day = func.date(activity.c.timestamp)
+    counts = select(
+        day, activity.c.user_id, func.max(activity.c.user_name), activity.c.action_type, func.count()
+    ).where(
+        activity.c.timestamp >= datetime.combine(start, datetime.min.time()),
+        activity.c.timestamp < datetime.combine(until, datetime.min.time())
+    ).group_by(day, activity.c.user_id, activity.c.action_type)
+    db.session.execute(
+        insert(summary).from_select(['day', 'user_id', 'user_name', 'action_type', 'activity_count'], counts)
+    )
+    db.session.commit()
+    return (until - start).days
+
+
+def archive_activity_month(month_start):
+    """
+    Write one month of activity rows to a .csv.gz file, then delete them.
+    The file is complete before anything is deleted, so a failed run loses
+    nothing; the next run writes the remaining rows to a new file.
+
+    Returns:
+        tuple: (rows archived, archive file path or None)
+    """
+    month_end = _month_start(month_start + timedelta(days=32))
+    in_month = (
+        activity.c.timestamp >= datetime.combine(month_start, datetime.min.time()),
+        activity.c.timestamp < datetime.combine(month_end, datetime.min.time())
+    )
+    id_range = db.session.execute(
+        select(func.min(activity.c.id), func.max(activity.c.id), func.count()).where(*in_month)
+    ).one()
+    first_id, last_id, row_count = id_range
+    if not row_count:
+        return 0, None
+
+    os.makedirs(ACTIVITY_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(
+        ACTIVITY_ARCHIVE_DIR, f"activity_{month_start:%Y_%m}_{first_id}-{last_id}.csv.gz"
+    )
+    temp_path = path + '.tmp'
+
+    # Read in id order one batch at a time so memory stays flat for large months
+    archived_ids = []
+    with gzip.open(temp_path, 'wt', newline='', encoding='utf-8') as archive:
+        writer = csv.writer(archive)
+        writer.writerow(ARCHIVE_COLUMNS)
+        after_id = first_id - 1
+        while True:
+            rows = db.session.execute(
+                select(*[activity.c[name] for name in ARCHIVE_COLUMNS])
+                .where(*in_month, activity.c.id > after_id, activity.c.id <= last_id)
+                .order_by(activity.c.id)
+                .limit(ACTIVITY_ARCHIVE_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            writer.writerows(rows)
+            archived_ids.extend(row.id for row in rows)
+            after_id = rows[-1].id
+    os.replace(temp_path, path)
+
+    for i in range(0, len(archived_ids), ACTIVITY_ARCHIVE_BATCH_SIZE):
+        db.session.execute(delete(activity).where(activity.c.id.in_(archived_ids[i:i + ACTIVITY_ARCHIVE_BATCH_SIZE])))
+        db.session.commit()
+
+    return len(archived_ids), path
+
+
+def run_activity_retention(today=None):
+    """
+    Summarize complete days, then archive and delete every month older than
+    the retention window.
+
+    Returns:
+        dict: Result of the run (also kept as the lastRun metric)
+    """
+    today = today or date.today()
+    cutoff = _month_start(today, ACTIVITY_RETENTION_MONTHS)
+    started = time.perf_counter()
+    result = {
+        'startedAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'cutoff': cutoff.isoformat(),
+        'daysRolledUp': 0,
+        'monthsArchived': [],
+        'rowsArchived': 0,
+        'files': [],
+        'status': 'completed',
+        'error': None,
+    }
+    try:
+        result['daysRolledUp'] = rollup_activity_days(until=today)
+
+        while True:
+            oldest = db.session.execute(
+                select(func.min(activity.c.timestamp))
+                .where(activity.c.timestamp < datetime.combine(cutoff, datetime.min.time()))
+            ).scalar()
+            if oldest is None:
+                break
+            month = _month_start(oldest.date())
+            rows, path = archive_activity_month(month)
+            if not rows:
+                break
+            result['monthsArchived'].append(f"{month:%Y-%m}")
+            result['rowsArchived'] += rows
+            if path:
+                result['files'].append(path)
+    except Exception as e:
+        db.session.rollback()
+        result['status'], result['error'] = 'failed', str(e)
+        print(f"Activity retention failed: {e}")
+    finally:
+        result['durationSeconds'] = round(time.perf_counter() - started, 3)
+        with _metrics_lock:
+            _metrics['runs'] += 1
+            _metrics['failures'] += result['status'] == 'failed'
+            _metrics['totalRowsArchived'] += result['rowsArchived']
+            _metrics['totalDaysRolledUp'] += result['daysRolledUp']
+            _metrics['lastRun'] = result
+    return result
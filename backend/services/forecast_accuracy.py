@@ -0,0 +1,444 @@
+"""
+Forecast Accuracy Service - Forecast vs. actual sales, precomputed
+Every (medicine, district, day) that has a forecast gets a row in
+forecast_accuracy with the forecast, the actual sales and the error, plus one
+row per Monday-based week summing its days. Sales writes queue a refresh of
+the weeks they touch, which a background thread runs after the write commits,
+in its own transaction, so a sale never waits on or fails with the accuracy
+rows; a nightly job covers days that passed without any sales (actual 0).
+Only days before today are scored.
+
+Metrics over a set of rows:
+    WAPE     = sum(|forecast - actual|) / sum(actual)
+    MAPE     = mean(|forecast - actual| / actual) over rows with sales
+    bias     = (sum(forecast) - sum(actual)) / sum(actual)
+    accuracy = 100 - WAPE (floored at 0)
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import event, select, insert, update, delete, func, extract, bindparam
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from database import db
+from models import ForecastAccuracy, MedicineForecast, MedicineSales, Medicine, Formula, District
+
+PERIODS = ('day', 'week')
+# Days recomputed per pass when refreshing long ranges (a multiple of 7 keeps weeks whole)
+ACCURACY_REFRESH_CHUNK_DAYS = int(os.getenv('ACCURACY_REFRESH_CHUNK_DAYS', '56'))
+# Queued sales keys are collected this long before a refresh, so a multi-batch upload is rescored once
+ACCURACY_REFRESH_DELAY = float(os.getenv('ACCURACY_REFRESH_DELAY', '1.0'))
+# Attempts per queued refresh (lock wait timeouts and deadlocks are retried with backoff)
+ACCURACY_REFRESH_ATTEMPTS = int(os.getenv('ACCURACY_REFRESH_ATTEMPTS', '3'))
+
+KEY_COLUMNS = ('period', 'medicine_id', 'district_id', 'period_start')  # idx_accuracy_key
+
+accuracy = ForecastAccuracy.__table__
+
+_queue = queue.Queue()
+_worker_lock = threading.Lock()
+_worker = None  # (pid, thread) of the background refresher
+
+
+def week_start(day):
+    """Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+def refresh_forecast_accuracy(keys):
+    """
+    Queue a refresh of the days (and their weeks) whose actuals changed. It
+    runs on a background thread once the caller's transaction commits and is
+    dropped if it rolls back.
+
+    Args:
+        keys: Iterable of (medicine_id, district_id, date) whose sales were written
+    """
+    keys = {
+        (medicine_id, district_id, day) for medicine_id, district_id, day in keys
+        if medicine_id is not None and district_id is not None and day is not None
+    }
+    if keys:
+        db.session.info.setdefault('accuracy_keys', set()).update(keys)
+        db.session.info['accuracy_app'] = current_app._get_current_object()
+
+
+@event.listens_for(Session, 'after_commit')
+def _queue_committed_refresh(session):
+    keys = session.info.pop('accuracy_keys', None)
+    app = session.info.pop('accuracy_app', None)
+    if keys:
+        _ensure_worker(app)
+        _queue.put(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_refresh(session):
+    session.info.pop('accuracy_keys', None)
+    session.info.pop('accuracy_app', None)
+
+
+def flush_accuracy_refresh(timeout=10.0):
+    """
+    Wait until every queued refresh has run.
+
+    Returns:
+        bool: True if the queue drained within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _ensure_worker(app):
+    """Start the background refresher in this process if it isn't running (also after a fork)"""
+    global _worker
+    pid = os.getpid()
+    if _worker and _worker[0] == pid and _worker[1].is_alive():
+        return
+    with _worker_lock:
+        if _worker and _worker[0] == pid and _worker[1].is_alive():
+            return
+        thread = threading.Thread(target=_run_worker, args=(app,), name='forecast-accuracy-refresh', daemon=True)
+        thread.start()
+        _worker = (pid, thread)
+
+
+def _run_worker(app):
+    """Collect queued keys for ACCURACY_REFRESH_DELAY, then refresh them in one transaction"""
+    while True:
+        batches = [_queue.get()]
+        deadline = time.monotonic() + ACCURACY_REFRESH_DELAY
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batches.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        keys = set().union(*batches)
+        with app.app_context():
+            for attempt in range(1, ACCURACY_REFRESH_ATTEMPTS + 1):
+                try:
+                    _refresh_keys(keys)
+                    db.session.commit()
+                    break
+                except OperationalError as e:
+                    db.session.rollback()
+                    if attempt == ACCURACY_REFRESH_ATTEMPTS:
+                        print(f"Forecast accuracy refresh of {len(keys)} sales keys failed: {e}")
+                    else:
+                        time.sleep(0.5 * 2 ** (attempt - 1))
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Forecast accuracy refresh of {len(keys)} sales keys failed: {e}")
+                    break
+            db.session.remove()
+        for _ in batches:
+            _queue.task_done()
+
+
+def _refresh_keys(keys):
+    """
+    Recompute accuracy for the weeks the keys fall in, per district. Runs of
+    consecutive weeks are refreshed together for the medicines written in them,
+    so a long upload doesn't rescore the weeks between its dates.
+
+    Returns:
+        int: Accuracy rows written
+    """
+    weeks = defaultdict(lambda: defaultdict(set))  # district -> Monday -> medicine ids
+    for medicine_id, district_id, day in keys:
+        weeks[district_id][week_start(day)].add(medicine_id)
+
+    written = 0
+    for district_id, district_weeks in weeks.items():
+        run_start = run_end = None
+        medicine_ids = set()
+        for monday in sorted(district_weeks):
+            if run_end is not None and monday != run_end:
+                written += refresh_accuracy_range(
+                    run_start, run_end, medicine_ids=sorted(medicine_ids), district_ids=[district_id]
+                )
+                run_start, medicine_ids = None, set()
+            run_start = run_start or monday
+            run_end = monday + timedelta(days=7)
+            medicine_ids |= district_weeks[monday]
+        written += refresh_accuracy_range(
+            run_start, run_end, medicine_ids=sorted(medicine_ids), district_ids=[district_id]
+        )
+    return written
+
+
+@atexit.register
+def _flush_on_exit():
+    if _worker and _worker[0] == os.getpid() and _worker[1].is_alive():
+        flush_accuracy_refresh(timeout=5.0)
+
+
+def refresh_accuracy_range(start, end, medicine_ids=None, district_ids=None, today=None):
+    """
+    Recompute every accuracy row in the weeks overlapping [start, end),
+    optionally limited to some medicines and districts. Runs in the caller's
+    transaction.
+
+    Returns:
+        int: Accuracy rows written
+    """
+    today = today or date.today()
+    start = week_start(start)
+    end = min(week_start(end - timedelta(days=1)) + timedelta(days=7), week_start(today) + timedelta(days=7))
+    written = 0
+    while start < end:
+        chunk_end = min(start + timedelta(days=ACCURACY_REFRESH_CHUNK_DAYS), end)
+        written += _refresh_chunk(start, chunk_end, medicine_ids, district_ids, today)
+        start = chunk_end
+    return written
+
+
+def _refresh_chunk(start, end, medicine_ids, district_ids, today):
+    """Replace the accuracy rows of whole weeks [start, end) with freshly computed ones"""
+    scored_end = min(end, today)
+
+    def scope(medicine_column, district_column):
+        criteria = []
+        if medicine_ids is not None:
+            criteria.append(medicine_column.in_(medicine_ids))
+        if district_ids is not None:
+            criteria.append(district_column.in_(district_ids))
+        return criteria
+
+    forecasts = db.session.execute(
+        select(
+            MedicineForecast.medicine_id, MedicineForecast.district_id, MedicineForecast.forecast_date,
+            func.sum(MedicineForecast.forecasted_quantity)
+        ).where(
+            MedicineForecast.forecast_date >= start,
+            MedicineForecast.forecast_date < scored_end,
+            *scope(MedicineForecast.medicine_id, MedicineForecast.district_id)
+        ).group_by(MedicineForecast.medicine_id, MedicineForecast.district_id, MedicineForecast.forecast_date)
+    ).all()
+
+    actuals = {}
+    if forecasts:
+        actuals = {
+            (medicine_id, district_id, day): quantity
+            for medicine_id, district_id, day, quantity in db.session.execute(
+                select(
+                    MedicineSales.medicine_id, MedicineSales.district_id, MedicineSales.date,
+                    func.sum(MedicineSales.quantity)
+                ).where(
+                    MedicineSales.date >= start,
+                    MedicineSales.date < scored_end,
+                    *scope(MedicineSales.medicine_id, MedicineSales.district_id)
+                ).group_by(MedicineSales.medicine_id, MedicineSales.district_id, MedicineSales.date)
+            )
+        }
+
+    rows = []
+    weeks = defaultdict(lambda: [0, 0])
+    for medicine_id, district_id, day, forecasted in forecasts:
+        forecasted = int(forecasted or 0)
+        actual = int(actuals.get((medicine_id, district_id, day)) or 0)
+        rows.append(_accuracy_row(medicine_id, district_id, 'day', day, forecasted, actual))
+        totals = weeks[(medicine_id, district_id, week_start(day))]
+        totals[0] += forecasted
+        totals[1] += actual
+    for (medicine_id, district_id, monday), (forecasted, actual) in weeks.items():
+        rows.append(_accuracy_row(medicine_id, district_id, 'week', monday, forecasted, actual))
+
+    # Upsert on idx_accuracy_key and delete only rows whose forecast is gone, by id:
+    # a range DELETE takes gap locks that deadlock concurrent refreshes of the same weeks
+    fresh_keys = {tuple(row[column] for column in KEY_COLUMNS) for row in rows}
+    stale_ids = [
+        row.id for row in db.session.execute(
+            select(accuracy.c.id, *[accuracy.c[column] for column in KEY_COLUMNS]).where(
+                accuracy.c.period_start >= start,
+                accuracy.c.period_start < end,
+                *scope(accuracy.c.medicine_id, accuracy.c.district_id)
+            )
+        )
+        if tuple(row[1:]) not in fresh_keys
+    ]
+    if stale_ids:
+        db.session.execute(delete(accuracy).where(accuracy.c.id.in_(stale_ids)))
+    if rows:
+        _upsert_accuracy_rows(rows)
+    return len(rows)
+
+
+def _upsert_accuracy_rows(rows):
+    """Insert or update accuracy rows keyed on idx_accuracy_key"""
+    value_columns = [column for column in rows[0] if column not in KEY_COLUMNS]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as upsert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        _write_accuracy_rows_generic(rows, value_columns)
+        return
+
+    stmt = upsert(accuracy)
+    if dialect == 'mysql':
+        values = {column: stmt.inserted[column] for column in value_columns}
+        values['updated_at'] = func.current_timestamp()
+        stmt = stmt.on_duplicate_key_update(values)
+    else:
+        values = {column: stmt.excluded[column] for column in value_columns}
+        values['updated_at'] = func.current_timestamp()
+        stmt = stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_=values)
+    db.session.execute(stmt, rows)
+
+
+def _write_accuracy_rows_generic(rows, value_columns):
+    """Upsert for databases without a native upsert: select existing keys, then insert or update"""
+    existing = {
+        tuple(row) for row in db.session.execute(
+            select(*[accuracy.c[column] for column in KEY_COLUMNS]).where(
+                accuracy.c.medicine_id.in_({row['medicine_id'] for row in rows}),
+                accuracy.c.district_id.in_({row['district_id'] for row in rows}),
+                accuracy.c.period_start.in_({row['period_start'] for row in rows})
+            )
+        )
+    }
+    new_rows, updates = [], []
+    for row in rows:
+        if tuple(row[column] for column in KEY_COLUMNS) in existing:
+            updates.append({**{f'key_{c}': row[c] for c in KEY_COLUMNS}, **{f'new_{c}': row[c] for c in value_columns}})
+        else:
+            new_rows.append(row)
+    if new_rows:
+        db.session.execute(insert(accuracy), new_rows)
+    if updates:
+        db.session.execute(
+            update(accuracy).where(*[accuracy.c[c] == bindparam(f'key_{c}') for c in KEY_COLUMNS]).values(
+                {c: bindparam(f'new_{c}') for c in value_columns} | {'updated_at': func.current_timestamp()}
+            ),
+            updates
+        )
+
+
+def _accuracy_row(medicine_id, district_id, period, period_start, forecasted, actual):
+    error = abs(forecasted - actual)
+    return {
+        'medicine_id': medicine_id,
+        'district_id': district_id,
+        'period': period,
+        'period_start': period_start,
+        'forecasted_quantity': forecasted,
+        'actual_quantity': actual,
+        'absolute_error': error,
+        'percentage_error': error / actual if actual else None,
+    }
+
+
+def run_daily_accuracy_refresh(today=None):
+    """
+    Score every day since the last scored day through yesterday, including
+    days without sales, so nights the job didn't run are caught up. The first
+    run (empty table) backfills from the earliest forecast. Commits.
+
+    Returns:
+        dict: Range refreshed, rows written and duration
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+    last_scored = db.session.execute(
+        select(func.max(accuracy.c.period_start)).where(accuracy.c.period == 'day')
+    ).scalar()
+    if last_scored is None:
+        start = db.session.execute(select(func.min(MedicineForecast.forecast_date))).scalar() or today
+    else:
+        # Yesterday is always rescored: its sales may have come in after the last run
+        start = min(last_scored + timedelta(days=1), today - timedelta(days=1))
+    try:
+        written = refresh_accuracy_range(start, today, today=today)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {
+        'from': week_start(start).isoformat(),
+        'to': today.isoformat(),
+        'rowsWritten': written,
+        'durationSeconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def accuracy_metrics(forecasted, actual, absolute_error, mean_percentage_error):
+    """WAPE, MAPE, bias (all in %) and accuracy from summed accuracy rows"""
+    forecasted, actual, absolute_error = int(forecasted or 0), int(actual or 0), int(absolute_error or 0)
+    wape = absolute_error / actual * 100 if actual else None
+    return {
+        'forecasted': forecasted,
+        'actual': actual,
+        'wape': round(wape, 2) if wape is not None else None,
+        'mape': round(mean_percentage_error * 100, 2) if mean_percentage_error is not None else None,
+        'bias': round((forecasted - actual) / actual * 100, 2) if actual else None,
+        'accuracy': round(max(0.0, 100 - wape), 2) if wape is not None else 0.0,
+    }
+
+
+# (columns selected and grouped, output keys, joins needed) per group_by option
+_GROUPINGS = {
+    'medicine': ((Medicine.id, Medicine.brand_name), ('medicineId', 'medicine'), ()),
+    'district': ((District.id, District.name), ('districtId', 'district'), (District,)),
+    'formula': ((Formula.id, Formula.name), ('formulaId', 'formula'), (Formula,)),
+    'month': ((extract('month', ForecastAccuracy.period_start),), ('month',), ()),
+    'period': ((ForecastAccuracy.period_start,), ('periodStart',), ()),
+}
+
+
+def summarize_accuracy(*criteria, group_by=None, period='day'):
+    """
+    Aggregate precomputed accuracy rows.
+
+    Args:
+        criteria: Filters on ForecastAccuracy or Medicine columns
+            (e.g. period_filter(ForecastAccuracy.period_start, year, months), Medicine.formula_id == 3)
+        group_by: None for one overall row, or 'medicine', 'district', 'formula', 'month', 'period'
+        period: 'day' or 'week' rows
+
+    Returns:
+        list: One dict per group with the group keys and accuracy_metrics()
+    """
+    columns, keys, joins = _GROUPINGS[group_by] if group_by else ((), (), ())
+    query = select(
+        *columns,
+        func.sum(ForecastAccuracy.forecasted_quantity),
+        func.sum(ForecastAccuracy.actual_quantity),
+        func.sum(ForecastAccuracy.absolute_error),
+        func.avg(ForecastAccuracy.percentage_error),
+    ).join(Medicine, Medicine.id == ForecastAccuracy.medicine_id).where(
+        ForecastAccuracy.period == period, *criteria
+    )
+    if District in joins:
+        query = query.join(District, District.id == ForecastAccuracy.district_id)
+    if Formula in joins:
+        query = query.join(Formula, Formula.id == Medicine.formula_id)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+
+    results = []
+    for row in db.session.execute(query):
+        result = dict(zip(keys, row[:len(keys)]))
+        if 'month' in result:
+            result['month'] = int(result['month'])
+        if 'periodStart' in result:
+            result['periodStart'] = result['periodStart'].isoformat()
+        result.update(accuracy_metrics(*row[len(keys):]))
+        results.append(result)
+    return results
@@ -0,0 +1,315 @@
+"""
+Sales Ingest Service - Staging-table ingest for sales uploads
+The raw file is bulk-loaded into sales_upload_staging, validated and resolved
+with set-based statements, then merged into medicine_sales, medicine stock and
+the district lookup in one short transaction. A failure at any point leaves the
+live tables untouched.
+"""
+import uuid
+from datetime import date
+from sqlalchemy import select, insert, update, delete, exists, and_, case, func, literal, bindparam
+from database import db
+from models import SalesUploadStaging, District, Formula, Medicine, MedicineSales, DistrictMedicineLookup
+from services.forecast_accuracy import refresh_forecast_accuracy
+from utils.names import normalized_name_sql
+from utils.upload_reader import iter_upload_batches, text_column
+
+staging = SalesUploadStaging.__table__
+sales = MedicineSales.__table__
+medicines = Medicine.__table__
+lookup = DistrictMedicineLookup.__table__
+
+# Unknown districts are created, so names that don't fit district.name are rejected up front
+MAX_DISTRICT_NAME_LENGTH = District.__table__.c.name.type.length
+DISTRICT_NAME_TOO_LONG = f'Area/district name is longer than {MAX_DISTRICT_NAME_LENGTH} characters'
+
+
+def ingest_sales_file(file, dtype=None, normalize=None):
+    """
+    Ingest a sales upload through the staging table.
+
+    Row rules match the row-by-row upload: unknown formulas and medicines are
+    rejected, unknown districts of accepted rows are created, a row for an existing
+    (medicine, district, date) replaces its quantity, and a row is rejected if
+    the medicine's stock (after the rows before it) cannot cover it.
+
+    Args:
+        file: Uploaded file (werkzeug FileStorage)
+        dtype: Pinned column dtypes passed to iter_upload_batches
+        normalize: Header normalization passed to iter_upload_batches
+
+    Returns:
+        tuple: (records_processed, errors) - errors are (row_number, message) tuples
+    """
+    batch_id = uuid.uuid4().hex
+    try:
+        _load(file, batch_id, dtype, normalize)
+        _validate(batch_id)
+        _merge(batch_id)
+
+        in_batch = staging.c.batch_id == batch_id
+        records_processed = db.session.execute(
+            select(func.count()).where(in_batch, staging.c.error.is_(None))
+        ).scalar()
+        errors = [
+            (row_number, message) for row_number, message in db.session.execute(
+                select(staging.c.row_number, staging.c.error)
+                .where(in_batch, staging.c.error.isnot(None))
+                .order_by(staging.c.row_number)
+            )
+        ]
+        return records_processed, errors
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.execute(delete(staging).where(staging.c.batch_id == batch_id))
+        db.session.commit()
+
+
+def _staging_rows(df, batch_id):
+    """Coerce one upload batch into staging rows (vectorized type parsing only, no lookups)"""
+    import numpy as np
+    import pandas as pd
+
+    today = date.today()
+
+    # Blank dates default to today; unparseable ones are flagged for validation
+    raw_date = df['date'] if 'date' in df.columns else pd.Series(np.nan, index=df.index)
+    blank = raw_date.isna() | (raw_date.astype('string').str.strip() == '').fillna(False)
+    parsed = pd.to_datetime(raw_date.where(~blank), errors='coerce', format='mixed')
+    date_invalid = ~blank & parsed.isna()
+    sale_date = pd.Series(parsed.dt.date, index=df.index).astype(object)
+    sale_date[blank] = today
+    sale_date[date_invalid] = None
+
+    raw_quantity = df['sale_quantity'] if 'sale_quantity' in df.columns else pd.Series(0, index=df.index)
+    quantity = np.trunc(pd.to_numeric(raw_quantity, errors='coerce').fillna(0)).astype('int64')
+
+    district_name = text_column(df, 'area', 'district')
+    # The row-by-row upload checks this right after a missing name, before any other check
+    district_too_long = district_name.map(lambda name: name is not None and len(name) > MAX_DISTRICT_NAME_LENGTH)
+
+    rows = pd.DataFrame({
+        'batch_id': batch_id,
+        'row_number': df.index + 2,
+        'district_name': district_name,
+        'formula_name': text_column(df, 'formula'),
+        'medicine_identifier': text_column(df, 'medicine_name_id', 'medicine_name', 'medicine_brand'),
+        'dosage': text_column(df, 'dosage'),
+        'sale_date': sale_date,
+        'date_invalid': date_invalid,
+        'quantity': quantity,
+        'error': pd.Series(None, index=df.index, dtype=object).mask(district_too_long, DISTRICT_NAME_TOO_LONG),
+    })
+    return rows.to_dict('records')
+
+
+def _load(file, batch_id, dtype, normalize):
+    """Bulk-load the raw file into the staging table, one executemany per batch"""
+    kwargs = {'dtype': dtype}
+    if normalize:
+        kwargs['normalize'] = normalize
+    for df in iter_upload_batches(file, **kwargs):
+        rows = _staging_rows(df, batch_id)
+        if rows:
+            db.session.execute(insert(staging), rows)
+            db.session.commit()
+
+
+def _validate(batch_id):
+    """Resolve formula and medicine ids and flag invalid rows (staging writes only)"""
+    in_batch = staging.c.batch_id == batch_id
+
+    db.session.execute(
+        update(staging).where(in_batch).values(
+            formula_id=select(Formula.id).where(
+                Formula.name_normalized == normalized_name_sql(staging.c.formula_name)
+            ).scalar_subquery()
+        )
+    )
+    # Names compare like dimension_cache.find_medicine; no dosage given: use the first
+    # medicine with that brand name under the formula
+    db.session.execute(
+        update(staging).where(in_batch, staging.c.formula_id.isnot(None)).values(
+            medicine_id=select(func.min(Medicine.id)).where(
+                Medicine.formula_id == staging.c.formula_id,
+                normalized_name_sql(Medicine.brand_name) == normalized_name_sql(staging.c.medicine_identifier),
+                (staging.c.dosage.is_(None))
+                | (normalized_name_sql(Medicine.dosage_strength) == normalized_name_sql(staging.c.dosage))
+            ).scalar_subquery()
+        )
+    )
+    # Same checks, in the same order, as the row-by-row upload (rows flagged while loading keep their error)
+    db.session.execute(
+        update(staging).where(in_batch, staging.c.error.is_(None)).values(error=case(
+            (staging.c.district_name.is_(None), 'Missing area/district name'),
+            (staging.c.formula_name.is_(None), 'Missing formula name'),
+            (staging.c.formula_id.is_(None),
+             literal("Formula '") + staging.c.formula_name + "' does not exist. Create it first in Manage Formulas."),
+            (staging.c.medicine_identifier.is_(None), 'Missing medicine name/ID'),
+            (and_(staging.c.medicine_id.is_(None), staging.c.dosage.isnot(None)),
+             literal("Medicine '") + staging.c.medicine_identifier + "' with dosage '" + staging.c.dosage
+             + "' not found. Create it first in Manage Medicines."),
+            (staging.c.medicine_id.is_(None),
+             literal("Medicine '") + staging.c.medicine_identifier + "' not found. Create it first in Manage Medicines."),
+            (staging.c.date_invalid, 'Invalid date format'),
+            (staging.c.quantity <= 0, 'Invalid sale quantity'),
+            else_=None
+        ))
+    )
+    db.session.commit()
+
+
+def _existing_quantity(medicine_id, district_id, sale_date):
+    """Scalar subquery: quantity already recorded for a (medicine, district, date) key"""
+    return select(func.sum(sales.c.quantity)).where(
+        sales.c.medicine_id == medicine_id,
+        sales.c.district_id == district_id,
+        sales.c.date == sale_date
+    ).scalar_subquery()
+
+
+def _reject_insufficient_stock(batch_id):
+    """
+    Flag rows the medicine's stock cannot cover, in file order.
+
+    A window query finds the medicines whose running deduction ever exceeds
+    stock; only those medicines' rows are walked in order so later rows still
+    see the stock left by earlier accepted ones.
+    """
+    accepted = and_(staging.c.batch_id == batch_id, staging.c.error.is_(None))
+    key = (staging.c.medicine_id, staging.c.district_id, staging.c.sale_date)
+    existing = _existing_quantity(*key)
+
+    # Replacing a quantity (from the table or an earlier row) only deducts the difference
+    previous = func.lag(staging.c.quantity).over(partition_by=key, order_by=staging.c.row_number)
+    deltas = select(
+        staging.c.row_number, staging.c.medicine_id, staging.c.quantity,
+        (staging.c.quantity - func.coalesce(previous, existing, 0)).label('delta')
+    ).where(accepted).subquery()
+    deducted_before = func.coalesce(func.sum(deltas.c.delta).over(
+        partition_by=deltas.c.medicine_id, order_by=deltas.c.row_number, rows=(None, -1)
+    ), 0)
+    running = select(
+        deltas.c.medicine_id,
+        (medicines.c.stock_level - deducted_before).label('available'),
+        deltas.c.quantity
+    ).join_from(deltas, medicines, medicines.c.id == deltas.c.medicine_id).subquery()
+    short_ids = [
+        medicine_id for (medicine_id,) in db.session.execute(
+            select(running.c.medicine_id).where(running.c.available < running.c.quantity).distinct()
+        )
+    ]
+    if not short_ids:
+        return
+
+    rows = db.session.execute(
+        select(staging.c.id, staging.c.medicine_id, *key[1:], staging.c.quantity,
+               existing.label('existing'), medicines.c.stock_level)
+        .join_from(staging, medicines, medicines.c.id == staging.c.medicine_id)
+        .where(accepted, staging.c.medicine_id.in_(short_ids))
+        .order_by(staging.c.medicine_id, staging.c.row_number)
+    ).all()
+
+    stock, recorded, rejected = {}, {}, []
+    for row in rows:
+        available = stock.setdefault(row.medicine_id, row.stock_level)
+        row_key = (row.medicine_id, row.district_id, row.sale_date)
+        if available < row.quantity:
+            rejected.append({
+                'row_id': row.id,
+                'message': f"Insufficient stock. Available: {available}, Required: {row.quantity}"
+            })
+            continue
+        stock[row.medicine_id] = available - (row.quantity - recorded.get(row_key, row.existing or 0))
+        recorded[row_key] = row.quantity
+
+    if rejected:
+        db.session.execute(
+            update(staging).where(staging.c.id == bindparam('row_id')).values(error=bindparam('message')),
+            rejected
+        )
+
+
+def _merge(batch_id):
+    """Apply the validated rows to the live tables in a single transaction"""
+    in_batch = staging.c.batch_id == batch_id
+    accepted = and_(in_batch, staging.c.error.is_(None))
+
+    # Create districts that don't exist yet, once per normalized name
+    district_key = normalized_name_sql(staging.c.district_name)
+    new_districts = select(func.min(staging.c.district_name)).where(
+        accepted, ~exists().where(District.name_normalized == district_key)
+    ).group_by(district_key)
+    db.session.execute(insert(District.__table__).from_select(['name'], new_districts))
+    db.session.execute(
+        update(staging).where(accepted).values(
+            district_id=select(District.id).where(District.name_normalized == district_key).scalar_subquery()
+        )
+    )
+
+    # Lock the affected medicines so the stock check and the deduction see the same levels
+    db.session.execute(
+        select(medicines.c.id).where(medicines.c.id.in_(select(staging.c.medicine_id).where(accepted)))
+        .with_for_update()
+    ).all()
+    _reject_insufficient_stock(batch_id)
+
+    # The last accepted row for each (medicine, district, date) is the one that sticks
+    later = staging.alias('later')
+    final = select(staging.c.medicine_id, staging.c.district_id, staging.c.sale_date, staging.c.quantity).where(
+        accepted,
+        ~exists().where(
+            later.c.batch_id == batch_id,
+            later.c.error.is_(None),
+            later.c.medicine_id == staging.c.medicine_id,
+            later.c.district_id == staging.c.district_id,
+            later.c.sale_date == staging.c.sale_date,
+            later.c.row_number > staging.c.row_number
+        )
+    ).subquery('final')
+    same_key = and_(
+        final.c.medicine_id == sales.c.medicine_id,
+        final.c.district_id == sales.c.district_id,
+        final.c.sale_date == sales.c.date
+    )
+
+    # Stock first, while medicine_sales still holds the quantities being replaced
+    existing = _existing_quantity(final.c.medicine_id, final.c.district_id, final.c.sale_date)
+    deduction = select(func.sum(final.c.quantity - func.coalesce(existing, 0))).where(
+        final.c.medicine_id == medicines.c.id
+    ).scalar_subquery()
+    db.session.execute(
+        update(medicines).where(medicines.c.id.in_(select(final.c.medicine_id)))
+        .values(stock_level=medicines.c.stock_level - deduction)
+    )
+
+    db.session.execute(
+        update(sales).where(exists().where(same_key))
+        .values(quantity=select(final.c.quantity).where(same_key).scalar_subquery())
+    )
+    db.session.execute(
+        insert(sales).from_select(
+            ['medicine_id', 'district_id', 'date', 'quantity'],
+            select(final.c.medicine_id, final.c.district_id, final.c.sale_date, final.c.quantity)
+            .where(~exists().where(same_key))
+        )
+    )
+
+    new_lookups = select(staging.c.district_id, staging.c.medicine_id, staging.c.formula_id).where(
+        accepted,
+        ~exists().where(
+            lookup.c.district_id == staging.c.district_id,
+            lookup.c.medicine_id == staging.c.medicine_id,
+            lookup.c.formula_id == staging.c.formula_id
+        )
+    ).distinct()
+    db.session.execute(insert(lookup).from_select(['district_id', 'medicine_id', 'formula_id'], new_lookups))
+
+    # Actuals changed for these days; their forecast accuracy is rescored once this commits
+    refresh_forecast_accuracy(db.session.execute(
+        select(staging.c.medicine_id, staging.c.district_id, staging.c.sale_date).where(accepted).distinct()
+    ).all())
+
+    db.session.commit()
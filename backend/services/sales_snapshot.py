@@ -0,0 +1,314 @@
+"""
+Sales Snapshot Service - Columnar daily sales series on disk
+Materializes medicine_sales as one daily series per (district, formula), one
+NumPy file per year, so forecasting and reports can memory-map the history
+instead of re-parsing CSV files or re-aggregating the sales table.
+
+Files in SALES_SNAPSHOT_DIR:
+    sales_daily_<year>.npy   int32 matrix, one row per (district, formula), sorted:
+                             [district_id, formula_id, units on Jan 1, ..., units on Dec 31]
+    sales_daily_<year>.json  year, series count, exportedAt and through (last complete day)
+
+Files are written under a temporary name and renamed, so readers never see a
+partial file; processes that still map the previous file keep reading it.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func
+from database import db
+from models import MedicineSales, Medicine
+from utils.periods import month_ranges
+
+SALES_SNAPSHOT_DIR = os.getenv(
+    'SALES_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'snapshots', 'sales')
+)
+# Reports ignore snapshots older than this and query the sales table instead
+SALES_SNAPSHOT_MAX_AGE_HOURS = float(os.getenv('SALES_SNAPSHOT_MAX_AGE_HOURS', '36'))
+
+KEY_COLUMNS = 2  # district_id, formula_id
+
+SalesYear = namedtuple('SalesYear', ['year', 'keys', 'values', 'meta'])
+
+# Mapped snapshot files: path -> ((mtime, size, metadata mtime), SalesYear).
+# A re-exported year has new mtimes and is mapped again on next use.
+_snapshot_cache = {}
+_snapshot_cache_lock = threading.Lock()
+
+
+def snapshot_path(year, suffix='.npy'):
+    return os.path.join(SALES_SNAPSHOT_DIR, f'sales_daily_{year}{suffix}')
+
+
+def snapshot_years():
+    """Years that have an exported snapshot, oldest first"""
+    if not os.path.isdir(SALES_SNAPSHOT_DIR):
+        return []
+    years = []
+    for name in os.listdir(SALES_SNAPSHOT_DIR):
+        if name.startswith('sales_daily_') and name.endswith('.npy'):
+            year = name[len('sales_daily_'):-len('.npy')]
+            if year.isdigit():
+                years.append(int(year))
+    return sorted(years)
+
+
+def export_sales_snapshot(years=None, today=None):
+    """
+    Write the daily (district, formula) series for the given years, by default
+    every year from the first sale to today; snapshots of years without sales
+    are removed.
+
+    Returns:
+        dict: Years exported, series written and duration
+    """
+    today = today or date.today()
+    started = time.perf_counter()
+    if years is None:
+        first, last = db.session.execute(
+            select(func.min(MedicineSales.date), func.max(MedicineSales.date))
+        ).one()
+        years = range(first.year, max(last.year, today.year) + 1) if first else []
+        for stale_year in set(snapshot_years()) - set(years):
+            for suffix in ('.npy', '.json'):
+                if os.path.exists(snapshot_path(stale_year, suffix)):
+                    os.remove(snapshot_path(stale_year, suffix))
+
+    os.makedirs(SALES_SNAPSHOT_DIR, exist_ok=True)
+    series = 0
+    for year in years:
+        series += _export_year(year, today)
+    return {
+        'years': list(years),
+        'series': series,
+        'durationSeconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def _export_year(year, today):
+    import numpy as np
+
+    first_day = date(year, 1, 1)
+    next_year = date(year + 1, 1, 1)
+    days = (next_year - first_day).days
+
+    rows = db.session.execute(
+        select(
+            MedicineSales.district_id, Medicine.formula_id, MedicineSales.date,
+            func.sum(MedicineSales.quantity)
+        ).join(Medicine, Medicine.id == MedicineSales.medicine_id).where(
+            MedicineSales.date >= first_day,
+            MedicineSales.date < next_year
+        ).group_by(MedicineSales.district_id, Medicine.formula_id, MedicineSales.date)
+    ).all()
+
+    data = np.array(
+        [(district_id, formula_id, (day - first_day).days, int(quantity or 0))
+         for district_id, formula_id, day, quantity in rows],
+        dtype=np.int64
+    ).reshape(-1, 4)
+    keys, series_index = np.unique(data[:, :KEY_COLUMNS], axis=0, return_inverse=True)
+    matrix = np.zeros((len(keys), KEY_COLUMNS + days), dtype=np.int32)
+    matrix[:, :KEY_COLUMNS] = keys
+    np.add.at(matrix, (series_index.reshape(-1), data[:, 2] + KEY_COLUMNS), data[:, 3])
+
+    # Today's sales are still coming in; the last complete day is yesterday
+    through = min(next_year, today) - timedelta(days=1)
+    meta = {
+        'year': year,
+        'series': len(keys),
+        'exportedAt': datetime.now().isoformat(timespec='seconds'),
+        'through': through.isoformat() if through >= first_day else None,
+    }
+
+    path = snapshot_path(year)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, matrix)
+    os.replace(path + '.tmp', path)
+    meta_path = snapshot_path(year, '.json')
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return len(keys)
+
+
+def load_year(year):
+    """
+    Memory-map one year's snapshot, reusing the mapping while the file is unchanged.
+
+    Returns:
+        SalesYear: keys (district_id, formula_id) and values (units per day of
+        the year) are read-only views of the mapped file; None without a snapshot
+    """
+    import numpy as np
+
+    path = snapshot_path(year)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    try:
+        meta_mtime = os.stat(snapshot_path(year, '.json')).st_mtime_ns
+    except FileNotFoundError:
+        meta_mtime = None
+    version = (stat.st_mtime_ns, stat.st_size, meta_mtime)
+    with _snapshot_cache_lock:
+        cached = _snapshot_cache.get(path)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    matrix = np.load(path, mmap_mode='r')
+    try:
+        with open(snapshot_path(year, '.json')) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        meta = {}
+    snapshot = SalesYear(year, matrix[:, :KEY_COLUMNS], matrix[:, KEY_COLUMNS:], meta)
+    with _snapshot_cache_lock:
+        _snapshot_cache[path] = (version, snapshot)
+    return snapshot
+
+
+def _matching_rows(snapshot, district_id=None, formula_id=None):
+    """Rows of the series for a district and/or formula; every row (a plain slice) without filters"""
+    import numpy as np
+
+    if district_id is None and formula_id is None:
+        return slice(None)
+    rows = np.ones(len(snapshot.keys), dtype=bool)
+    if district_id is not None:
+        rows &= snapshot.keys[:, 0] == district_id
+    if formula_id is not None:
+        rows &= snapshot.keys[:, 1] == formula_id
+    return np.flatnonzero(rows)
+
+
+def _series_values(snapshot, district_id=None, formula_id=None):
+    """Daily values of the matching series, summed; a view of the mapped file when one series matches"""
+    import numpy as np
+
+    rows = _matching_rows(snapshot, district_id, formula_id)
+    if not isinstance(rows, slice) and len(rows) == 1:
+        return snapshot.values[rows[0]]
+    return snapshot.values[rows].sum(axis=0, dtype=np.int64)
+
+
+def daily_series(district_id=None, formula_id=None):
+    """
+    Daily units sold up to the last complete exported day, from the first sale on.
+
+    Args:
+        district_id: Limit to one district (default: all)
+        formula_id: Limit to one formula (default: all)
+
+    Returns:
+        pd.Series: Units indexed by day, or None without snapshot data or when
+        the exported years don't form one unbroken series (a missing year, or a
+        year before the last that doesn't run through Dec 31); callers then
+        fall back to their CSV data
+    """
+    import numpy as np
+    import pandas as pd
+
+    years = snapshot_years()
+    parts = []
+    for year in years:
+        snapshot = load_year(year)
+        through = snapshot.meta.get('through') if snapshot else None
+        if not through:
+            # Only the current year can have no complete day yet (exported on Jan 1)
+            if year == years[-1] and parts:
+                break
+            return None
+        through = date.fromisoformat(through)
+        if parts and year != parts[-1][0] + 1:
+            return None
+        if year != years[-1] and through != date(year, 12, 31):
+            return None
+        days = (through - date(year, 1, 1)).days + 1
+        parts.append((year, _series_values(snapshot, district_id, formula_id)[:days]))
+
+    if not parts:
+        return None
+    values = parts[0][1] if len(parts) == 1 else np.concatenate([part for _, part in parts])
+    sold = np.flatnonzero(values)
+    if not len(sold):
+        return None
+    index = pd.date_range(date(parts[0][0], 1, 1), periods=len(values), freq='D')
+    return pd.Series(values, index=index, copy=False)[sold[0]:]
+
+
+def weekly_history(district_id=None, formula_id=None):
+    """
+    Weekly units sold in the ds/y frame the Prophet models are trained on
+    (same weeks as resampling the forecasting CSV files).
+
+    Returns:
+        pd.DataFrame: Columns ds and y, or None without snapshot data
+    """
+    series = daily_series(district_id, formula_id)
+    if series is None:
+        return None
+    weekly = series.resample('W').sum()
+    return weekly.rename_axis('ds').reset_index(name='y')
+
+
+def _is_complete(snapshot):
+    """A closed year exported after it ended, recently enough to match the sales table"""
+    meta = snapshot.meta
+    if meta.get('through') != date(snapshot.year, 12, 31).isoformat() or not meta.get('exportedAt'):
+        return False
+    age = datetime.now() - datetime.fromisoformat(meta['exportedAt'])
+    return age <= timedelta(hours=SALES_SNAPSHOT_MAX_AGE_HOURS)
+
+
+def report_totals(year, months, group_by=None, district_id=None, formula_id=None):
+    """
+    Units sold in some months of a closed year, from the snapshot.
+
+    Args:
+        year: Calendar year; the current year is never served from the snapshot
+        months: Month numbers (1-12)
+        group_by: None for one total, or 'district', 'formula' or 'month'
+        district_id / formula_id: Limit to one district or formula
+
+    Returns:
+        int or dict: Total, or {district_id|formula_id|month: units}; None when
+        the snapshot can't answer (missing, still open or stale) and the caller
+        should query the sales table
+    """
+    import numpy as np
+
+    snapshot = load_year(year)
+    if snapshot is None or not _is_complete(snapshot):
+        return None
+
+    first_day = date(year, 1, 1)
+
+    def columns(start, end):
+        return slice((start - first_day).days, (end - first_day).days)
+
+    if group_by == 'month':
+        values = _series_values(snapshot, district_id, formula_id)
+        return {
+            month: int(values[columns(*month_ranges(year, [month])[0])].sum(dtype=np.int64))
+            for month in sorted(set(months))
+        }
+
+    rows = _matching_rows(snapshot, district_id, formula_id)
+    keys = snapshot.keys[rows]
+    per_series = np.zeros(len(keys), dtype=np.int64)
+    for start, end in month_ranges(year, months):
+        per_series += snapshot.values[rows, columns(start, end)].sum(axis=1, dtype=np.int64)
+
+    if group_by is None:
+        return int(per_series.sum())
+    group_ids = keys[:, 0 if group_by == 'district' else 1]
+    totals = {}
+    for group_id, units in zip(group_ids.tolist(), per_series.tolist()):
+        totals[group_id] = totals.get(group_id, 0) + units
+    return {group_id: units for group_id, units in totals.items() if units}
@@ -0,0 +1,276 @@
+"""
+Upload Job Service - Runs file uploads in the background
+Uploads are saved to disk, then parsed and committed batch by batch on a worker
+thread. Progress and per-row errors are stored in the database so any process
+can report on a job.
+
+Each process refreshes heartbeat_at of its queued and running jobs every
+UPLOAD_JOB_HEARTBEAT_SECONDS. A job whose process died (crash, restart,
+worker recycled past graceful_timeout) stops beating; fail_orphaned_upload_jobs,
+run by the scheduler, marks it failed and deletes its saved file.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import or_, and_
+from database import db
+from models import UploadJob, UploadJobError
+from utils.activity_logger import log_activity
+from utils.upload_reader import iter_upload_batches, normalize_column
+
+UPLOAD_JOB_WORKERS = int(os.getenv('UPLOAD_JOB_WORKERS', '2'))
+UPLOAD_JOB_DIR = os.getenv('UPLOAD_JOB_DIR', os.path.join(tempfile.gettempdir(), 'medicine_upload_jobs'))
+UPLOAD_JOB_HEARTBEAT_SECONDS = float(os.getenv('UPLOAD_JOB_HEARTBEAT_SECONDS', '30'))
+# Queued/running jobs without a heartbeat for this long are failed by the sweep
+UPLOAD_JOB_STALE_SECONDS = float(os.getenv('UPLOAD_JOB_STALE_SECONDS', '300'))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+UploadHandler = namedtuple('UploadHandler', ['process_batch', 'entity_type', 'dtype', 'normalize'])
+
+_handlers = {}
+_executor = None
+
+# Jobs queued or running in this process, kept alive by the heartbeat thread
+_active_jobs = set()
+_active_jobs_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _utcnow():
+    """Naive UTC now, as stored in the upload_job datetime columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def active_upload_jobs():
+    """Number of upload jobs queued or running in this process"""
+    with _active_jobs_lock:
+        return len(_active_jobs)
+
+
+def register_upload_handler(upload_type, process_batch, entity_type, dtype=None, normalize=normalize_column):
+    """
+    Register how an upload type is processed by background jobs.
+
+    Args:
+        upload_type: Job type name (e.g. 'sales')
+        process_batch: Function taking a DataFrame batch and returning
+                       (records_processed, errors) with (row_number, message) errors.
+                       It writes to db.session; the job commits after each batch.
+        entity_type: Entity type used for the activity log entry
+        dtype: Pinned column dtypes passed to iter_upload_batches
+        normalize: Header normalization passed to iter_upload_batches
+    """
+    _handlers[upload_type] = UploadHandler(process_batch, entity_type, dtype, normalize)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=UPLOAD_JOB_WORKERS, thread_name_prefix='upload-job')
+    return _executor
+
+
+def _ensure_heartbeat(app):
+    """Start this process's heartbeat thread (after a fork the parent's thread is gone)"""
+    global _heartbeat_thread
+    with _active_jobs_lock:
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat_loop, args=(app,), name='upload-job-heartbeat', daemon=True
+            )
+            _heartbeat_thread.start()
+
+
+def _heartbeat_loop(app):
+    """Refresh heartbeat_at of this process's active jobs"""
+    while True:
+        time.sleep(UPLOAD_JOB_HEARTBEAT_SECONDS)
+        with _active_jobs_lock:
+            job_ids = list(_active_jobs)
+        if not job_ids:
+            continue
+        with app.app_context():
+            try:
+                UploadJob.query.filter(
+                    UploadJob.id.in_(job_ids), UploadJob.status.in_(ACTIVE_STATUSES)
+                ).update({UploadJob.heartbeat_at: _utcnow()}, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Upload job heartbeat failed: {e}")
+            finally:
+                db.session.remove()
+
+
+def submit_upload_job(upload_type, file, user=None):
+    """
+    Save an uploaded file and queue it for background processing.
+
+    Args:
+        upload_type: A registered upload type
+        file: Uploaded file (werkzeug FileStorage)
+        user: User starting the upload (optional, used for activity logging)
+
+    Returns:
+        UploadJob: The queued job
+    """
+    if upload_type not in _handlers:
+        raise ValueError(f'Unknown upload type: {upload_type}')
+
+    job = UploadJob(
+        id=uuid.uuid4().hex,
+        upload_type=upload_type,
+        file_name=file.filename,
+        status='queued',
+        user_id=user.id if user else None,
+        user_name=user.username if user else None,
+        heartbeat_at=_utcnow()
+    )
+
+    # The request stream is gone once we return, so keep a copy for the worker
+    os.makedirs(UPLOAD_JOB_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_JOB_DIR, job.id)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(file.stream, out)
+
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    with _active_jobs_lock:
+        _active_jobs.add(job.id)
+    _ensure_heartbeat(app)
+    _get_executor().submit(_run_upload_job, app, job.id, path)
+    return job
+
+
+def _run_upload_job(app, job_id, path):
+    """Worker entry point: process the saved file batch by batch"""
+    with app.app_context():
+        job = None
+        try:
+            job = db.session.get(UploadJob, job_id)
+            if job is None or job.status != 'queued':
+                # Already failed by the orphan sweep while it waited
+                db.session.remove()
+                job = None
+                return
+            handler = _handlers[job.upload_type]
+            job.status = 'running'
+            job.started_at = _utcnow()
+            db.session.commit()
+
+            with open(path, 'rb') as f:
+                batches = iter_upload_batches(
+                    f, dtype=handler.dtype, normalize=handler.normalize, filename=job.file_name
+                )
+                for df in batches:
+                    processed, errors = handler.process_batch(df)
+                    if errors:
+                        db.session.add_all([
+                            UploadJobError(job_id=job_id, row_number=row, message=message)
+                            for row, message in errors
+                        ])
+                    job.rows_processed += processed
+                    job.rows_failed += len(errors)
+                    job.batches_committed += 1
+                    job.heartbeat_at = _utcnow()
+                    # Progress is committed together with the batch it describes
+                    db.session.commit()
+
+            job.status = 'completed'
+            job.finished_at = _utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Upload job {job_id} failed: {e}")
+            job = db.session.get(UploadJob, job_id)
+            if job:
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = _utcnow()
+                db.session.commit()
+        finally:
+            with _active_jobs_lock:
+                _active_jobs.discard(job_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+        if job and job.user_id:
+            log_activity(
+                user_id=job.user_id,
+                user_name=job.user_name,
+                action_type='upload',
+                entity_type=_handlers[job.upload_type].entity_type,
+                details={
+                    'file_name': job.file_name,
+                    'records_processed': job.rows_processed,
+                    'total_errors': job.rows_failed,
+                    'upload_type': 'bulk',
+                    'job_id': job.id,
+                    'status': job.status
+                }
+            )
+        db.session.remove()
+
+
+def fail_orphaned_upload_jobs():
+    """
+    Mark queued or running jobs whose process stopped sending heartbeats as
+    failed, and delete saved upload files that no active job owns. Batches the
+    job committed before it stopped are kept. Commits.
+
+    Returns:
+        int: Jobs marked failed
+    """
+    cutoff = _utcnow() - timedelta(seconds=UPLOAD_JOB_STALE_SECONDS)
+    orphaned = UploadJob.query.filter(
+        UploadJob.status.in_(ACTIVE_STATUSES),
+        or_(
+            UploadJob.heartbeat_at < cutoff,
+            and_(UploadJob.heartbeat_at.is_(None), UploadJob.created_at < cutoff)
+        )
+    ).all()
+    for job in orphaned:
+        job.status = 'failed'
+        job.error = (f'Interrupted: the server processing the upload stopped after '
+                     f'{job.batches_committed} committed batches')
+        job.finished_at = _utcnow()
+    db.session.commit()
+
+    if os.path.isdir(UPLOAD_JOB_DIR):
+        active = {job_id for job_id, in db.session.query(UploadJob.id).filter(
+            UploadJob.status.in_(ACTIVE_STATUSES)
+        )}
+        # Files are written just before their job row is committed, so only old ones are removed
+        stale_mtime = time.time() - UPLOAD_JOB_STALE_SECONDS
+        for name in os.listdir(UPLOAD_JOB_DIR):
+            path = os.path.join(UPLOAD_JOB_DIR, name)
+            if name not in active and os.path.getmtime(path) < stale_mtime:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Could not remove upload file {path}: {e}")
+    return len(orphaned)
+
+
+def iter_job_errors(job_id, batch_size=1000):
+    """
+    Stream a job's row errors in file order.
+
+    Yields:
+        tuple: (row_number, message)
+    """
+    query = db.session.query(UploadJobError.row_number, UploadJobError.message).filter(
+        UploadJobError.job_id == job_id
+    ).order_by(UploadJobError.row_number, UploadJobError.id)
+    for row_number, message in query.yield_per(batch_size):
+        yield row_number, message
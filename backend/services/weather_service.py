@@ -1,146 +1,235 @@
 """
 Weather Service - Fetches weather forecast from Open-Meteo API
-Coordinates: Karachi, Pakistan (24.8607°N, 67.0011°E)
+Weather is stored per location ("lat,lon" key). Districts with coordinates get
+their own series; the rest share the default location, Karachi, Pakistan
+(24.8607°N, 67.0011°E).
 """
-import openmeteo_requests
-import pandas as pd
-import requests_cache
-from retry_requests import retry
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
-from models import WeatherData
+from sqlalchemy import tuple_, select, bindparam
+from models import WeatherData, District, DEFAULT_WEATHER_LOCATION
 from database import db
 
 # Karachi coordinates
 KARACHI_LATITUDE = 24.8607
 KARACHI_LONGITUDE = 67.0011
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+# Open-Meteo accepts several coordinates per request; larger location sets are
+# split into requests of this size and fetched concurrently
+WEATHER_COORDS_PER_REQUEST = int(os.getenv('WEATHER_COORDS_PER_REQUEST', '50'))
+WEATHER_FETCH_WORKERS = int(os.getenv('WEATHER_FETCH_WORKERS', '4'))
 
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+DAILY_VARIABLES = [
+    "apparent_temperature_max",
+    "apparent_temperature_min",
+    "apparent_temperature_mean",
+    "relative_humidity_2m_mean",
+    "relative_humidity_2m_max",
+    "relative_humidity_2m_min"
+]
 
-def fetch_weather_forecast():
+_openmeteo = None
+
+
+def get_openmeteo_client():
+    """Get the Open-Meteo API client (created on first use, with cache and retry on error)"""
+    global _openmeteo
+    if _openmeteo is None:
+        import openmeteo_requests
+        import requests_cache
+        from retry_requests import retry
+        
+        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
+        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+        _openmeteo = openmeteo_requests.Client(session=retry_session)
+    return _openmeteo
+
+
+def set_openmeteo_client(client):
+    """
+    Replace the Open-Meteo API client, e.g. with a local stub in tests.
+    The client needs a weather_api(url, params=...) method returning one
+    response per requested coordinate. Pass None to go back to the real client.
+    """
+    global _openmeteo
+    _openmeteo = client
+
+
+def location_key(latitude, longitude):
+    """Key identifying a weather location in weather_data.location"""
+    return f"{latitude:.4f},{longitude:.4f}"
+
+
+def get_weather_locations():
+    """
+    Get every location weather should be fetched for.
+    Districts sharing coordinates share a location.
+    
+    Returns:
+        dict: location key -> (latitude, longitude)
+    """
+    locations = {DEFAULT_WEATHER_LOCATION: (KARACHI_LATITUDE, KARACHI_LONGITUDE)}
+    coordinates = db.session.query(District.latitude, District.longitude).filter(
+        District.latitude.isnot(None),
+        District.longitude.isnot(None)
+    ).distinct()
+    for latitude, longitude in coordinates:
+        locations.setdefault(location_key(latitude, longitude), (latitude, longitude))
+    return locations
+
+
+def get_district_location(district_id):
+    """Get the weather location key for a district (the default location if it has no coordinates)"""
+    district = db.session.get(District, district_id)
+    if district is None or district.latitude is None or district.longitude is None:
+        return DEFAULT_WEATHER_LOCATION
+    return location_key(district.latitude, district.longitude)
+
+
+def fetch_weather_forecast(locations=None):
     """
-    Fetch 14-day weather forecast from Open-Meteo API for Karachi
+    Fetch 14-day weather forecast from Open-Meteo API
+    Args:
+        locations: dict of location key -> (latitude, longitude) (default: Karachi only)
     Returns a list of dictionaries with weather data
     """
-    url = "https://api.open-meteo.com/v1/forecast"
+    if locations is None:
+        locations = {DEFAULT_WEATHER_LOCATION: (KARACHI_LATITUDE, KARACHI_LONGITUDE)}
+    
+    items = list(locations.items())
+    chunks = [items[i:i + WEATHER_COORDS_PER_REQUEST] for i in range(0, len(items), WEATHER_COORDS_PER_REQUEST)]
+    
+    try:
+        if len(chunks) <= 1:
+            results = [_fetch_forecast_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(WEATHER_FETCH_WORKERS, len(chunks))) as pool:
+                results = list(pool.map(_fetch_forecast_chunk, chunks))
+        
+        return [record for records in results for record in records]
+        
+    except Exception as e:
+        print(f"Error fetching weather forecast: {e}")
+        raise
+
+
+def _fetch_forecast_chunk(chunk):
+    """Fetch the forecast for up to WEATHER_COORDS_PER_REQUEST locations in one API call"""
     params = {
-        "latitude": KARACHI_LATITUDE,
-        "longitude": KARACHI_LONGITUDE,
-        "daily": [
-            "apparent_temperature_max",
-            "apparent_temperature_min",
-            "apparent_temperature_mean",
-            "relative_humidity_2m_mean",
-            "relative_humidity_2m_max",
-            "relative_humidity_2m_min"
-        ],
+        "latitude": [latitude for _, (latitude, _) in chunk],
+        "longitude": [longitude for _, (_, longitude) in chunk],
+        "daily": DAILY_VARIABLES,
         "timezone": "auto",
         "forecast_days": 14,
     }
+    responses = get_openmeteo_client().weather_api(FORECAST_URL, params=params)
     
-    try:
-        responses = openmeteo.weather_api(url, params=params)
-        response = responses[0]
-        
+    weather_records = []
+    # Responses come back in the order the coordinates were requested
+    for (key, (latitude, longitude)), response in zip(chunk, responses):
         print(f"Fetching weather for Coordinates: {response.Latitude()}°N {response.Longitude()}°E")
         print(f"Elevation: {response.Elevation()} m asl")
         print(f"Timezone: {response.Timezone()} {response.TimezoneAbbreviation()}")
-        
-        # Process daily data
-        daily = response.Daily()
-        daily_apparent_temperature_max = daily.Variables(0).ValuesAsNumpy()
-        daily_apparent_temperature_min = daily.Variables(1).ValuesAsNumpy()
-        daily_apparent_temperature_mean = daily.Variables(2).ValuesAsNumpy()
-        daily_relative_humidity_2m_mean = daily.Variables(3).ValuesAsNumpy()
-        daily_relative_humidity_2m_max = daily.Variables(4).ValuesAsNumpy()
-        daily_relative_humidity_2m_min = daily.Variables(5).ValuesAsNumpy()
-        
-        # Create dataframe
-        daily_data = {
-            "date": pd.date_range(
-                start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-                end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-                freq=pd.Timedelta(seconds=daily.Interval()),
-                inclusive="left"
-            )
+        weather_records.extend(_daily_records(response.Daily(), key, latitude, longitude))
+    return weather_records
+
+
+def _daily_records(daily, key, latitude, longitude):
+    """Build weather records for one location straight from the daily NumPy arrays"""
+    import pandas as pd
+    
+    dates = pd.date_range(
+        start=pd.to_datetime(daily.Time(), unit="s", utc=True),
+        end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
+        freq=pd.Timedelta(seconds=daily.Interval()),
+        inclusive="left"
+    ).date
+    columns = {
+        name: _as_values(daily.Variables(i).ValuesAsNumpy())
+        for i, name in enumerate(DAILY_VARIABLES)
+    }
+    
+    return [
+        {
+            'location': key,
+            'date': day,
+            'latitude': latitude,
+            'longitude': longitude,
+            **{name: values[i] for name, values in columns.items()},
+            'is_forecast': True  # Mark as forecast data
         }
-        
-        daily_data["apparent_temperature_max"] = daily_apparent_temperature_max
-        daily_data["apparent_temperature_min"] = daily_apparent_temperature_min
-        daily_data["apparent_temperature_mean"] = daily_apparent_temperature_mean
-        daily_data["relative_humidity_2m_mean"] = daily_relative_humidity_2m_mean
-        daily_data["relative_humidity_2m_max"] = daily_relative_humidity_2m_max
-        daily_data["relative_humidity_2m_min"] = daily_relative_humidity_2m_min
-        
-        daily_dataframe = pd.DataFrame(data=daily_data)
-        
-        # Convert to list of dictionaries
-        weather_records = []
-        for _, row in daily_dataframe.iterrows():
-            weather_records.append({
-                'date': row['date'].date(),
-                'latitude': KARACHI_LATITUDE,
-                'longitude': KARACHI_LONGITUDE,
-                'apparent_temperature_max': float(row['apparent_temperature_max']),
-                'apparent_temperature_min': float(row['apparent_temperature_min']),
-                'apparent_temperature_mean': float(row['apparent_temperature_mean']),
-                'relative_humidity_2m_mean': float(row['relative_humidity_2m_mean']),
-                'relative_humidity_2m_max': float(row['relative_humidity_2m_max']),
-                'relative_humidity_2m_min': float(row['relative_humidity_2m_min']),
-                'is_forecast': True  # Mark as forecast data
-            })
-        
-        return weather_records
-        
-    except Exception as e:
-        print(f"Error fetching weather forecast: {e}")
-        raise
+        for i, day in enumerate(dates)
+    ]
+
+
+def _as_values(array):
+    """Convert a float array to a list of Python floats, with NaN as None"""
+    import numpy as np
+    
+    array = np.asarray(array, dtype=float)
+    values = array.astype(object)
+    values[np.isnan(array)] = None
+    return values.tolist()
+
+
+# Phase durations (seconds) of the most recent update_weather_database run
+last_update_durations = {}
 
 
 def update_weather_database():
     """
     Fetch weather forecast and update database
+    The historical flip, the removal of stale forecasts and the upsert of the
+    fresh forecast run in a single transaction.
     Returns number of records updated/inserted
     """
+    durations = {}
+    phase_start = time.perf_counter()
+    
+    def end_phase(name):
+        nonlocal phase_start
+        now = time.perf_counter()
+        durations[name] = round(now - phase_start, 4)
+        phase_start = now
+    
     try:
-        weather_records = fetch_weather_forecast()
+        weather_records = fetch_weather_forecast(get_weather_locations())
+        end_phase('fetch')
         
         # Mark all existing forecast records as non-forecast (convert to historical)
         today = date.today()
         WeatherData.query.filter(
             WeatherData.is_forecast == True,
             WeatherData.date < today
-        ).update({'is_forecast': False})
+        ).update({'is_forecast': False}, synchronize_session=False)
+        end_phase('historical_flip')
         
-        # Delete old forecast records to replace with fresh data
+        # Delete forecast records the fresh forecast no longer covers
+        # (dates it does cover are overwritten in place by the upsert)
         WeatherData.query.filter(
             WeatherData.is_forecast == True,
-            WeatherData.date >= today
-        ).delete()
+            WeatherData.date >= today,
+            tuple_(WeatherData.location, WeatherData.date).notin_(
+                [(record['location'], record['date']) for record in weather_records]
+            )
+        ).delete(synchronize_session=False)
+        end_phase('delete')
         
-        # Insert new forecast records
-        records_added = 0
-        for record in weather_records:
-            # Check if record already exists (for historical conversion)
-            existing = WeatherData.query.filter_by(date=record['date']).first()
-            
-            if existing:
-                # Update existing record
-                for key, value in record.items():
-                    if key != 'date':  # Don't update the primary key field
-                        setattr(existing, key, value)
-            else:
-                # Create new record
-                weather_data = WeatherData(**record)
-                db.session.add(weather_data)
-            
-            records_added += 1
+        # Insert new forecast records, updating any day that already exists
+        upsert_weather_records(weather_records)
+        end_phase('upsert')
         
         db.session.commit()
-        print(f"Successfully updated {records_added} weather forecast records")
+        end_phase('commit')
+        
+        records_added = len(weather_records)
+        last_update_durations.clear()
+        last_update_durations.update(durations)
+        print(f"Successfully updated {records_added} weather forecast records "
+              f"(phase durations: {durations})")
         return records_added
         
     except Exception as e:
@@ -149,19 +238,110 @@ def update_weather_database():
         raise
 
 
-def get_weather_data(days=365, include_forecast=True):
+def has_current_forecast():
+    """
+    Check whether today's forecast refresh has already been stored
+    (the default location has a forecast row for the last day of a 14-day forecast).
+    """
+    last_day = date.today() + timedelta(days=13)
+    return db.session.query(
+        WeatherData.query.filter(
+            WeatherData.location == DEFAULT_WEATHER_LOCATION,
+            WeatherData.is_forecast == True,
+            WeatherData.date == last_day
+        ).exists()
+    ).scalar()
+
+
+# Rows per multi-row upsert statement
+WEATHER_UPSERT_CHUNK_SIZE = 1000
+
+
+def upsert_weather_records(records):
+    """
+    Insert or update weather rows keyed on the unique (location, date) pair using
+    multi-row INSERT ... ON DUPLICATE KEY UPDATE (ON CONFLICT on SQLite/PostgreSQL).
+    Other databases look up the existing keys first, then insert the new rows and
+    update the rest. Does not commit.
+    
+    Args:
+        records: List of dicts with WeatherData column names, including location
+    """
+    if not records:
+        return
+    
+    table = WeatherData.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        _upsert_weather_records_generic(records)
+        return
+    
+    update_columns = [col for col in records[0] if col not in ('location', 'date')]
+    for start in range(0, len(records), WEATHER_UPSERT_CHUNK_SIZE):
+        stmt = insert(table).values(records[start:start + WEATHER_UPSERT_CHUNK_SIZE])
+        if dialect == 'mysql':
+            values = {col: stmt.inserted[col] for col in update_columns}
+            values['updated_at'] = db.func.current_timestamp()
+            stmt = stmt.on_duplicate_key_update(values)
+        else:
+            values = {col: stmt.excluded[col] for col in update_columns}
+            values['updated_at'] = db.func.current_timestamp()
+            stmt = stmt.on_conflict_do_update(index_elements=['location', 'date'], set_=values)
+        db.session.execute(stmt)
+
+
+def _upsert_weather_records_generic(records):
+    """Upsert for databases without a native upsert: select existing keys, then insert or update"""
+    table = WeatherData.__table__
+    update_columns = [col for col in records[0] if col not in ('location', 'date')]
+    update_stmt = table.update().where(
+        table.c.location == bindparam('key_location'),
+        table.c.date == bindparam('key_date')
+    ).values(
+        {col: bindparam(f'new_{col}') for col in update_columns} | {'updated_at': db.func.current_timestamp()}
+    )
+    for start in range(0, len(records), WEATHER_UPSERT_CHUNK_SIZE):
+        chunk = records[start:start + WEATHER_UPSERT_CHUNK_SIZE]
+        existing = set(db.session.execute(
+            select(table.c.location, table.c.date).where(
+                table.c.location.in_({r['location'] for r in chunk}),
+                table.c.date.in_({r['date'] for r in chunk})
+            )
+        ).all())
+        new_rows = [r for r in chunk if (r['location'], r['date']) not in existing]
+        updates = [
+            dict({f'new_{col}': r[col] for col in update_columns}, key_location=r['location'], key_date=r['date'])
+            for r in chunk if (r['location'], r['date']) in existing
+        ]
+        if new_rows:
+            db.session.execute(table.insert(), new_rows)
+        if updates:
+            db.session.execute(update_stmt, updates)
+
+
+def get_weather_data(days=365, include_forecast=True, location=DEFAULT_WEATHER_LOCATION):
     """
     Get weather data from database
     Args:
         days: Number of days of historical data to fetch
         include_forecast: Whether to include forecast data
+        location: Weather location key (default: Karachi)
     Returns:
         List of weather records as dictionaries
     """
     try:
         cutoff_date = date.today() - timedelta(days=days)
         
-        query = WeatherData.query.filter(WeatherData.date >= cutoff_date)
+        query = WeatherData.query.filter(
+            WeatherData.location == location,
+            WeatherData.date >= cutoff_date
+        )
         
         if not include_forecast:
             query = query.filter(WeatherData.is_forecast == False)
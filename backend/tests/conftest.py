@@ -0,0 +1,61 @@
+"""
+Shared fixtures: the API blueprint on a fresh SQLite database per test,
+seeded with a few districts, formulas and medicines.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RUN_SCHEDULER', 'false')
+
+
+def create_test_app(db_path):
+    """Flask app with the API blueprint on a new seeded SQLite database"""
+    from flask import Flask
+    from database import db
+    from models import User, District, Formula, Medicine
+    from routes import api_bp
+    from utils import dimension_cache
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    db.init_app(app)
+    app.register_blueprint(api_bp)
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin', role='admin')
+        user.set_password('admin')
+        paracetamol = Formula(name='Paracetamol')
+        aspirin = Formula(name='Acetylsalicylic Acid')
+        db.session.add_all([user, District(name='Bahadurabad'), District(name='Clifton'), paracetamol, aspirin])
+        db.session.flush()
+        db.session.add_all([
+            Medicine(formula_id=paracetamol.id, brand_name='Panadol', dosage_strength='500mg', stock_level=1000),
+            Medicine(formula_id=paracetamol.id, brand_name='Calpol', dosage_strength='250mg', stock_level=50),
+            Medicine(formula_id=aspirin.id, brand_name='Disprin', dosage_strength='300mg', stock_level=0),
+        ])
+        db.session.commit()
+    # The dimension cache is process-wide; don't serve one test database's rows to the next
+    dimension_cache._snapshot = None
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_test_app(tmp_path / 'test.db')
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    from middleware.auth import generate_token
+    return {'Authorization': 'Bearer ' + generate_token('admin', 'admin')}
@@ -0,0 +1,58 @@
+"""Activity log writer: events survive a database outage"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from utils import activity_logger
+
+
+def make_row(n):
+    return {
+        'user_id': 1, 'user_name': 'admin', 'action_type': 'create', 'entity_type': 'medicine',
+        'entity_id': str(n), 'details': None, 'timestamp': datetime(2026, 1, 5, 9, 0, n)
+    }
+
+
+@pytest.fixture
+def flaky_writes(monkeypatch, tmp_path):
+    """Fail the next N batch writes as if the database were down"""
+    monkeypatch.setattr(activity_logger, 'ACTIVITY_SPILL_DIR', str(tmp_path / 'spill'))
+    monkeypatch.setattr(activity_logger, 'ACTIVITY_RETRY_BACKOFF', 0)
+    write_batch = activity_logger._write_batch
+    failures = {'left': 0}
+
+    def flaky(app, rows):
+        if failures['left']:
+            failures['left'] -= 1
+            raise OperationalError('INSERT', {}, Exception('server has gone away'))
+        write_batch(app, rows)
+
+    monkeypatch.setattr(activity_logger, '_write_batch', flaky)
+    return failures
+
+
+def logged_ids():
+    from models import Activity
+    return sorted(int(a.entity_id) for a in Activity.query.all())
+
+
+def test_transient_failure_is_retried(app, flaky_writes):
+    flaky_writes['left'] = 1
+    assert activity_logger._write_or_spill(app, [make_row(1), make_row(2)], attempts=2)
+    assert logged_ids() == [1, 2]
+    assert activity_logger._spill_files() == []
+
+
+def test_failed_batch_is_spilled_and_replayed(app, flaky_writes):
+    flaky_writes['left'] = 2
+    assert activity_logger._write_or_spill(app, [make_row(1), make_row(2)], attempts=2)
+    assert logged_ids() == []
+    assert len(activity_logger._spill_files()) == 1
+
+    # The next successful write brings the spilled events back, timestamps intact
+    assert activity_logger._write_or_spill(app, [make_row(3)], attempts=2)
+    assert logged_ids() == [1, 2, 3]
+    assert activity_logger._spill_files() == []
+    from models import Activity
+    assert Activity.query.filter_by(entity_id='1').one().timestamp == datetime(2026, 1, 5, 9, 0, 1)
@@ -0,0 +1,27 @@
+"""Name normalization: Python and SQL sides agree"""
+import pytest
+from sqlalchemy import literal, select
+
+from utils.names import normalize_name, normalized_name_sql
+
+NAMES = [
+    'Acetylsalicylic_Acid',
+    '  acetylsalicylic acid ',
+    '\tParacetamol',
+    'Paracetamol\n',
+    ' Para_cetamol \t ',
+    ' Clifton ',
+]
+
+
+@pytest.mark.parametrize('name', NAMES)
+def test_normalize_name_matches_sql(app, name):
+    from database import db
+
+    assert db.session.execute(select(normalized_name_sql(literal(name)))).scalar() == normalize_name(name)
+
+
+def test_only_spaces_are_trimmed():
+    assert normalize_name(' Acetylsalicylic_Acid ') == 'acetylsalicylic acid'
+    assert normalize_name('\tParacetamol\n') == '\tparacetamol\n'
+    assert normalize_name(None) is None
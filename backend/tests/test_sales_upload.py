@@ -0,0 +1,107 @@
+"""Sales upload: the row-by-row and staging modes accept and reject the same rows"""
+import io
+
+import pytest
+
+from conftest import create_test_app
+
+# Blank and whitespace-only cells, a missing date, unknown names and bad quantities
+EDGE_CASE_CSV = """Date,Area,Formula,Medicine Name/ID,Dosage,Sale Quantity
+2026-01-05,Bahadurabad,Paracetamol,Panadol,,5
+2026-01-05,Clifton,Paracetamol,Panadol,  ,3
+2026-01-06, Bahadurabad ,paracetamol,Calpol,250mg,2
+2026-01-06,Clifton,Paracetamol,Calpol,250MG,1
+2026-01-07,,Paracetamol,Panadol,,4
+2026-01-07,Bahadurabad,,Panadol,,4
+2026-01-07,Bahadurabad,Paracetamol,,,4
+2026-01-07,Bahadurabad,Paracetamol,Panadol,999mg,4
+2026-01-08,Bahadurabad,Paracetamol,Panadol,,0
+2026-01-08,Bahadurabad,Paracetamol,Panadol,,abc
+2026-01-09,Bahadurabad,Paracetamol,Panadol,,
+not-a-date,Bahadurabad,Paracetamol,Panadol,,2
+2026-01-10,Bahadurabad,Acetylsalicylic Acid,Disprin,,1
+"""
+
+LONG = 'x' * 120
+
+# New districts on rejected and accepted rows, and cells longer than the name columns
+DISTRICT_AND_LENGTH_CSV = f"""Date,Area,Formula,Medicine Name/ID,Dosage,Sale Quantity
+2026-01-11,Gulshan,Ibuprofen,Panadol,,1
+2026-01-11,Saddar,Paracetamol,Panadol,,2
+2026-01-11,{LONG},Paracetamol,Panadol,,1
+2026-01-11,Clifton,{LONG},Panadol,,1
+2026-01-11,Clifton,Paracetamol,{LONG},,1
+2026-01-11,Clifton,Paracetamol,Panadol,{LONG},1
+2026-01-11,Korangi,Paracetamol,Panadol,,0
+"""
+
+
+def upload(client, headers, mode=None, csv=EDGE_CASE_CSV):
+    """Upload a CSV; returns records processed, row errors, sales, stock and district names"""
+    from database import db
+    from models import District, Medicine, MedicineSales
+
+    query = '?mode=staging' if mode else ''
+    response = client.post(
+        f'/api/medicines/sales/upload{query}',
+        data={'file': (io.BytesIO(csv.encode()), 'sales.csv')},
+        headers=headers,
+        content_type='multipart/form-data',
+    )
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+
+    sales = sorted(
+        (sale.medicine_id, sale.district_id, sale.date.isoformat(), sale.quantity)
+        for sale in db.session.scalars(db.select(MedicineSales))
+    )
+    stock = {medicine.id: medicine.stock_level for medicine in db.session.scalars(db.select(Medicine))}
+    districts = sorted(district.name for district in db.session.scalars(db.select(District)))
+    # The response lists up to 10 errors; the test files stay under that
+    assert body.get('total_errors', 0) <= 10
+    return body['records_processed'], body.get('errors', []), sales, stock, districts
+
+
+def rejected_rows(errors):
+    return sorted(int(error.split(':')[0].removeprefix('Row ')) for error in errors)
+
+
+@pytest.mark.parametrize('mode', [None, 'staging'])
+def test_edge_case_upload(client, auth_headers, mode):
+    records_processed, errors, sales, stock, _ = upload(client, auth_headers, mode)
+
+    # Blank and whitespace-only dosages match the brand's medicine; names match
+    # regardless of case and surrounding spaces
+    assert records_processed == 4
+    assert rejected_rows(errors) == list(range(6, 15))
+    assert sales == [
+        (1, 1, '2026-01-05', 5),
+        (1, 2, '2026-01-05', 3),
+        (2, 1, '2026-01-06', 2),
+        (2, 2, '2026-01-06', 1),
+    ]
+    assert stock == {1: 992, 2: 47, 3: 0}
+
+
+@pytest.mark.parametrize('mode', [None, 'staging'])
+def test_new_districts_and_long_cells(client, auth_headers, mode):
+    records_processed, errors, sales, stock, districts = upload(client, auth_headers, mode, DISTRICT_AND_LENGTH_CSV)
+
+    assert records_processed == 1
+    assert rejected_rows(errors) == [2, 4, 5, 6, 7, 8]
+    assert 'Row 4: Area/district name is longer than 100 characters' in errors
+    assert sales == [(1, 3, '2026-01-11', 2)]
+    assert stock == {1: 998, 2: 50, 3: 0}
+    # Districts are created for accepted rows only
+    assert districts == ['Bahadurabad', 'Clifton', 'Saddar']
+
+
+@pytest.mark.parametrize('csv', [EDGE_CASE_CSV, DISTRICT_AND_LENGTH_CSV])
+def test_modes_agree(tmp_path, auth_headers, csv):
+    """The same file on two fresh databases gives the same result, errors included, in both modes"""
+    results = []
+    for mode in (None, 'staging'):
+        app = create_test_app(tmp_path / f'{mode or "rows"}.db')
+        with app.app_context():
+            results.append(upload(app.test_client(), auth_headers, mode, csv))
+    assert results[0] == results[1]
@@ -0,0 +1,50 @@
+"""Upload reader: pinned columns come out the same for CSV and Excel files"""
+import io
+import math
+
+import pytest
+from openpyxl import Workbook
+
+from utils.upload_reader import iter_upload_batches
+
+HEADER = ['Medicine ID', 'Dosage', 'Quantity']
+ROWS = [(1, 500, 5), (None, None, 3), (2, 250, None)]
+DTYPE = {'medicine id': str, 'dosage': str}
+PINNED = {'medicine id': ['1', 'nan', '2'], 'dosage': ['500', 'nan', '250']}
+
+
+def xlsx_file():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in ROWS:
+        sheet.append(row)
+    data = io.BytesIO()
+    workbook.save(data)
+    data.seek(0)
+    return data
+
+
+def csv_file():
+    lines = [','.join(HEADER)] + [','.join('' if cell is None else str(cell) for cell in row) for row in ROWS]
+    return io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+
+def read_column(file, filename, name, batch_size):
+    values = []
+    for df in iter_upload_batches(file, dtype=DTYPE, batch_size=batch_size, filename=filename):
+        values.extend(df[name].tolist())
+    return ['nan' if isinstance(value, float) and math.isnan(value) else value for value in values]
+
+
+@pytest.mark.parametrize('batch_size', [1, 3])
+@pytest.mark.parametrize('name', ['medicine id', 'dosage'])
+def test_xlsx_pinned_ints_with_blanks(name, batch_size):
+    # A blank in an integer column must not turn the other cells into '1.0'
+    assert read_column(csv_file(), 'ids.csv', name, batch_size) == PINNED[name]
+    assert read_column(xlsx_file(), 'ids.xlsx', name, batch_size) == PINNED[name]
+
+
+def test_xlsx_unpinned_columns_stay_numeric():
+    quantities = read_column(xlsx_file(), 'ids.xlsx', 'quantity', 3)
+    assert quantities == [5, 3, 'nan']
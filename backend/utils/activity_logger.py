@@ -1,13 +1,60 @@
-"""Activity logging utility for tracking user actions"""
+"""
+Activity logging utility for tracking user actions
+Events are queued in memory and written by a background thread in multi-row
+INSERTs, either when ACTIVITY_BATCH_SIZE events are waiting or
+ACTIVITY_FLUSH_INTERVAL seconds after the first one. Writes use their own
+connection, so they never commit or roll back the request's session.
+Set ACTIVITY_LOG_SYNC=true (e.g. in tests) to write each event immediately.
+A failed batch write is retried with backoff; if the database is still
+unavailable the events are spilled to JSON-lines files in ACTIVITY_SPILL_DIR
+and written by the next successful batch, so a database blip doesn't lose
+audit events.
+Every write wakes the activity stream (utils/activity_stream.py) so open
+/activities/stream connections get the new events right away.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
 from database import db
 from models import Activity
-import json
+from utils.activity_stream import notify_activity_written
+
+ACTIVITY_LOG_SYNC = os.getenv('ACTIVITY_LOG_SYNC', 'false').lower() == 'true'
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '500'))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '1.0'))
+ACTIVITY_QUEUE_SIZE = int(os.getenv('ACTIVITY_QUEUE_SIZE', '10000'))
+# How long a request waits for queue space before writing its event itself
+ACTIVITY_ENQUEUE_TIMEOUT = float(os.getenv('ACTIVITY_ENQUEUE_TIMEOUT', '2.0'))
+# Attempts per background batch write; the wait doubles after each failure
+ACTIVITY_WRITE_ATTEMPTS = int(os.getenv('ACTIVITY_WRITE_ATTEMPTS', '4'))
+ACTIVITY_RETRY_BACKOFF = float(os.getenv('ACTIVITY_RETRY_BACKOFF', '0.5'))
+ACTIVITY_SPILL_DIR = os.getenv(
+    'ACTIVITY_SPILL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'spill', 'activity')
+)
+
+_queue = queue.Queue(maxsize=ACTIVITY_QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer = None  # (pid, thread) of the background writer
+_stats_lock = threading.Lock()
+_stats = {
+    'queued': 0, 'written': 0, 'failed': 0, 'batches': 0, 'queueFull': 0,
+    'retries': 0, 'spilled': 0, 'replayed': 0
+}
 
 
 def log_activity(user_id, user_name, action_type, entity_type, entity_id=None, details=None):
     """
     Log a user activity to the database.
-    
+
     Args:
         user_id: ID of the user performing the action
         user_name: Username of the user
@@ -15,24 +62,186 @@ def log_activity(user_id, user_name, action_type, entity_type, entity_id=None, d
         entity_type: Type of entity affected ('sales_record', 'stock_adjustment', 'medicine', etc.)
         entity_id: ID of the affected entity (optional)
         details: Dictionary with additional details (will be converted to JSON string)
+
+    Returns:
+        bool: True if the event was queued or written
     """
     try:
-        details_str = json.dumps(details) if details else None
-        
-        activity = Activity(
-            user_id=user_id,
-            user_name=user_name,
-            action_type=action_type,
-            entity_type=entity_type,
-            entity_id=str(entity_id) if entity_id else None,
-            details=details_str
-        )
-        
-        db.session.add(activity)
-        db.session.commit()
-        
+        row = {
+            'user_id': user_id,
+            'user_name': user_name,
+            'action_type': action_type,
+            'entity_type': entity_type,
+            'entity_id': str(entity_id) if entity_id else None,
+            'details': json.dumps(details) if details else None,
+            # Taken now rather than at flush time
+            'timestamp': datetime.now().replace(microsecond=0)
+        }
+        app = current_app._get_current_object()
+
+        if ACTIVITY_LOG_SYNC:
+            return _write_or_spill(app, [row], attempts=1)
+
+        _ensure_writer(app)
+        try:
+            _queue.put(row, timeout=ACTIVITY_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            # Backpressure: the writer is behind, so this request writes its own event
+            with _stats_lock:
+                _stats['queueFull'] += 1
+            return _write_or_spill(app, [row], attempts=1)
+        with _stats_lock:
+            _stats['queued'] += 1
         return True
     except Exception as e:
         print(f"Error logging activity: {str(e)}")
-        db.session.rollback()
         return False
+
+
+def flush_activity_log(timeout=10.0):
+    """
+    Wait until every queued event has been written.
+
+    Returns:
+        bool: True if the queue drained within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def get_activity_log_stats():
+    """Counters of the activity writer in this process, plus the current queue depth"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['queueDepth'] = _queue.qsize()
+    stats['spillFiles'] = len(_spill_files())
+    return stats
+
+
+def _write_batch(app, rows):
+    """Insert events in one multi-row INSERT on a dedicated connection"""
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(insert(Activity.__table__), rows)
+    with _stats_lock:
+        _stats['written'] += len(rows)
+        _stats['batches'] += 1
+    notify_activity_written()
+
+
+def _write_or_spill(app, rows, attempts=ACTIVITY_WRITE_ATTEMPTS):
+    """
+    Write events, retrying with backoff, and spill them to disk if every attempt fails.
+
+    Returns:
+        bool: True if the events were written or spilled
+    """
+    delay = ACTIVITY_RETRY_BACKOFF
+    for attempt in range(1, attempts + 1):
+        try:
+            _write_batch(app, rows)
+            break
+        except Exception as e:
+            print(f"Error writing {len(rows)} activity log entries (attempt {attempt}/{attempts}): {str(e)}")
+            if attempt == attempts:
+                return _spill(rows)
+            with _stats_lock:
+                _stats['retries'] += 1
+            time.sleep(delay)
+            delay *= 2
+
+    # The database is reachable again, so write out anything spilled earlier
+    _replay_spilled(app)
+    return True
+
+
+def _spill(rows):
+    """Append events the database refused to a new JSON-lines file in ACTIVITY_SPILL_DIR"""
+    path = os.path.join(ACTIVITY_SPILL_DIR, f"activity_{os.getpid()}_{uuid.uuid4().hex}.jsonl")
+    try:
+        os.makedirs(ACTIVITY_SPILL_DIR, exist_ok=True)
+        # Written under a temporary name so a replay never reads a half-written file
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat())) + '\n')
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Error spilling {len(rows)} activity log entries, dropping them: {str(e)}")
+        with _stats_lock:
+            _stats['failed'] += len(rows)
+        return False
+    with _stats_lock:
+        _stats['spilled'] += len(rows)
+    return True
+
+
+def _spill_files():
+    return sorted(glob.glob(os.path.join(ACTIVITY_SPILL_DIR, 'activity_*.jsonl')))
+
+
+def _replay_spilled(app):
+    """Write spilled events back to the database, one file per INSERT, oldest first"""
+    for path in _spill_files():
+        # Claim the file by renaming it, so another worker replaying at the same time skips it
+        claimed = path + '.replaying'
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        try:
+            with open(claimed, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            for row in rows:
+                row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            if rows:
+                _write_batch(app, rows)
+        except Exception as e:
+            print(f"Error replaying spilled activity log entries from {path}: {str(e)}")
+            os.rename(claimed, path)
+            return
+        os.remove(claimed)
+        with _stats_lock:
+            _stats['replayed'] += len(rows)
+
+
+def _ensure_writer(app):
+    """Start the background writer in this process if it isn't running (also after a fork)"""
+    global _writer
+    pid = os.getpid()
+    if _writer and _writer[0] == pid and _writer[1].is_alive():
+        return
+    with _writer_lock:
+        if _writer and _writer[0] == pid and _writer[1].is_alive():
+            return
+        thread = threading.Thread(target=_run_writer, args=(app,), name='activity-log-writer', daemon=True)
+        thread.start()
+        _writer = (pid, thread)
+
+
+def _run_writer(app):
+    """Collect queued events into batches and write them"""
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + ACTIVITY_FLUSH_INTERVAL
+        while len(batch) < ACTIVITY_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        _write_or_spill(app, batch)
+        for _ in batch:
+            _queue.task_done()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer and _writer[0] == os.getpid() and _writer[1].is_alive():
+        flush_activity_log(timeout=5.0)
@@ -0,0 +1,138 @@
+"""
+Activity event bus for the /activities/stream SSE endpoint
+One tail thread per process reads new activity rows and fans them out to
+every connected stream, so N open dashboards cost one query per tick instead
+of N. The activity logger wakes the tail right after each write; rows written
+by other processes are picked up within ACTIVITY_STREAM_POLL_INTERVAL.
+"""
+import os
+import queue
+import threading
+from database import db
+from models import Activity
+
+ACTIVITY_STREAM_POLL_INTERVAL = float(os.getenv('ACTIVITY_STREAM_POLL_INTERVAL', '2.0'))
+# Each open stream holds a server thread, so by default streams may take half of
+# a worker's GUNICORN_THREADS and the rest stay free for ordinary requests.
+# Refused clients fall back to polling /activities/recent.
+ACTIVITY_STREAM_MAX_CLIENTS = int(os.getenv(
+    'ACTIVITY_STREAM_MAX_CLIENTS', max(1, int(os.getenv('GUNICORN_THREADS', '8')) // 2)
+))
+# Events buffered per client before a slow client is disconnected (it resumes with Last-Event-ID)
+SUBSCRIBER_QUEUE_SIZE = 100
+# Ids are assigned before commit, so a lower id can become visible after a higher
+# one; re-reading this many ids back catches rows that committed out of order
+ID_LOOKBACK = 200
+
+_lock = threading.Lock()
+_subscribers = set()
+_wake = threading.Event()
+_tail = None  # (pid, thread)
+_last_id = None  # Highest id published; None while nobody is subscribed
+
+
+def subscribe(app, after_id):
+    """
+    Register a stream for activity events.
+    The caller should then replay get_activities_after(after_id) itself; rows
+    it replays may also arrive through the subscription.
+
+    Args:
+        app: Flask app, used by the tail thread
+        after_id: Last activity id the client already has
+
+    Returns:
+        queue.Queue or None: Receives activity dicts, then None if the client
+        fell too far behind; None when the process is at ACTIVITY_STREAM_MAX_CLIENTS
+    """
+    global _last_id
+    subscription = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _lock:
+        if len(_subscribers) >= ACTIVITY_STREAM_MAX_CLIENTS:
+            return None
+        _subscribers.add(subscription)
+        if _last_id is None:
+            _last_id = after_id
+    _ensure_tail(app)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        _subscribers.discard(subscription)
+
+
+def notify_activity_written():
+    """Wake the tail thread to deliver rows this process just wrote"""
+    _wake.set()
+
+
+def get_activities_after(activity_id, limit=500):
+    """Activities with an id above activity_id, oldest first (needs an app context)"""
+    rows = Activity.query.filter(Activity.id > activity_id).order_by(Activity.id).limit(limit).all()
+    return [row.to_dict() for row in rows]
+
+
+def _publish(event):
+    with _lock:
+        subscribers = list(_subscribers)
+    for subscription in subscribers:
+        try:
+            subscription.put_nowait(event)
+        except queue.Full:
+            # Slow client: end its stream; the browser reconnects and replays from its last id
+            unsubscribe(subscription)
+            while True:
+                try:
+                    subscription.get_nowait()
+                except queue.Empty:
+                    break
+            subscription.put_nowait(None)
+
+
+def _ensure_tail(app):
+    """Start the tail thread in this process if it isn't running (also after a fork)"""
+    global _tail
+    pid = os.getpid()
+    with _lock:
+        if _tail and _tail[0] == pid and _tail[1].is_alive():
+            return
+        thread = threading.Thread(target=_run_tail, args=(app,), name='activity-stream-tail', daemon=True)
+        thread.start()
+        _tail = (pid, thread)
+
+
+def _run_tail(app):
+    """Read new activity rows while anyone is subscribed and publish them"""
+    global _last_id
+    seen = set()  # Ids inside the lookback window that were published or predate the streams
+    seeded = False
+    while True:
+        _wake.wait(timeout=ACTIVITY_STREAM_POLL_INTERVAL)
+        _wake.clear()
+        with _lock:
+            if not _subscribers:
+                _last_id, seeded = None, False
+                seen.clear()
+                continue
+            last_id = _last_id
+        try:
+            with app.app_context():
+                events = get_activities_after(max(last_id - ID_LOOKBACK, 0))
+        except Exception as e:
+            print(f"Activity stream tail failed: {e}")
+            continue
+
+        for event in events:
+            if event['id'] in seen:
+                continue
+            seen.add(event['id'])
+            # On the first read, rows at or below the starting id are history, not news
+            if seeded or event['id'] > last_id:
+                _publish(event)
+            last_id = max(last_id, event['id'])
+        seeded = True
+        seen = {activity_id for activity_id in seen if activity_id > last_id - ID_LOOKBACK}
+        with _lock:
+            if _last_id is not None:
+                _last_id = last_id
@@ -0,0 +1,76 @@
+"""Per-table data version counters used to key in-memory caches"""
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_lock = threading.Lock()
+_versions = {}
+
+
+def get_data_version(*tables):
+    """
+    Get the current version of one or more tables.
+
+    Args:
+        tables: Table names (e.g. 'medicine', 'medicine_sales')
+
+    Returns:
+        tuple: One counter per table, suitable for use in a cache key
+    """
+    with _lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+
+def bump_data_version(*tables):
+    """
+    Mark one or more tables as changed, invalidating caches keyed on them.
+    Committed ORM writes bump versions automatically; call this directly
+    after raw SQL writes that bypass the ORM.
+    """
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def touch_tables(session, *tables):
+    """
+    Mark tables (or other version keys) as written by the session's current
+    transaction; their versions are bumped when it commits.
+    """
+    _touched(session).update(tables)
+
+
+def _touched(session):
+    return session.info.setdefault('touched_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    """Remember which tables the flush wrote to until the transaction ends"""
+    touched = _touched(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            touched.add(table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk_statement_tables(orm_execute_state):
+    """Catch query.update()/query.delete() and Core insert/update/delete statements"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None:
+        _touched(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_tables(session):
+    touched = session.info.pop('touched_tables', None)
+    if touched:
+        bump_data_version(*touched)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('touched_tables', None)
@@ -0,0 +1,47 @@
+"""Database-wide named locks for work only one process should do at a time"""
+import threading
+from contextlib import contextmanager
+from sqlalchemy import text
+from database import db
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def db_lock(name, timeout=0):
+    """
+    Hold a named lock shared by every process using the database.
+
+    Uses MySQL GET_LOCK on a dedicated connection, so the lock is released if
+    the process dies. Databases without named locks (SQLite in development)
+    fall back to a process-local lock.
+
+    Args:
+        name: Lock name
+        timeout: Seconds to wait for the lock (0 = don't wait)
+
+    Yields:
+        bool: True if the lock was acquired
+    """
+    engine = db.engine
+    if engine.dialect.name == 'mysql':
+        with engine.connect() as conn:
+            acquired = conn.execute(
+                text('SELECT GET_LOCK(:name, :timeout)'), {'name': name, 'timeout': timeout}
+            ).scalar() == 1
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': name})
+        return
+
+    with _local_locks_guard:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    acquired = lock.acquire(timeout=timeout) if timeout > 0 else lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
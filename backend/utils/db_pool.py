@@ -0,0 +1,70 @@
+"""Connection pool instrumentation for the pool metrics endpoint"""
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts take and how often they time out.
+    Checkout time covers waiting for a free connection, opening overflow
+    connections and the pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_seconds = 0.0
+        self._max_checkout_seconds = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._checkouts += 1
+                self._checkout_seconds += elapsed
+                self._max_checkout_seconds = max(self._max_checkout_seconds, elapsed)
+
+    def checkout_stats(self):
+        """Checkout counters since the pool was created"""
+        with self._stats_lock:
+            return {
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'avgCheckoutMs': round(self._checkout_seconds / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'maxCheckoutMs': round(self._max_checkout_seconds * 1000, 3),
+            }
+
+
+def get_pool_stats(engine):
+    """
+    Live stats of an engine's connection pool.
+
+    Returns:
+        dict: Pool class, size, checked out / idle connections, overflow in use
+        and, for instrumented pools, checkout counters
+    """
+    pool = engine.pool
+    stats = {'poolClass': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checkedOut': pool.checkedout(),
+            'checkedIn': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'maxOverflow': pool._max_overflow,
+            'timeoutSeconds': pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.checkout_stats())
+    return stats
@@ -0,0 +1,99 @@
+"""
+Read-replica routing for read-only views
+Views marked with @read_from_replica (or every GET of a blueprint passed to
+route_reads_to_replica) send their SELECTs to the 'replica' bind. Anything that
+writes, locks rows or runs while the session flushes goes to the primary, and
+once a request has written, the rest of it reads from the primary too. When the
+replica lags more than REPLICA_MAX_LAG_SECONDS, or its lag can't be read,
+reads fall back to the primary.
+"""
+import os
+import threading
+import time
+from functools import wraps
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, text
+
+REPLICA_BIND = 'replica'
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '30'))
+# How long a lag reading is reused before asking the replica again
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+
+_lag_lock = threading.Lock()
+_lag_readings = {}  # engine url -> (checked at, lag seconds or None)
+
+
+def read_from_replica(f):
+    """Decorator: route the view's reads to the replica when one is configured"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+def route_reads_to_replica(blueprint):
+    """Route the reads of every GET request to the blueprint's views to the replica"""
+    @blueprint.before_request
+    def use_replica():
+        if request.method in ('GET', 'HEAD'):
+            g.read_replica = True
+    return blueprint
+
+
+def replica_lag_seconds(engine):
+    """
+    Replication lag of a replica engine, cached for REPLICA_LAG_CHECK_INTERVAL.
+
+    Returns:
+        float or None: Seconds behind the primary; None when replication is
+        stopped or the status can't be read. Non-MySQL engines (SQLite in
+        development) report 0.
+    """
+    if engine.dialect.name != 'mysql':
+        return 0.0
+
+    key = str(engine.url)
+    now = time.monotonic()
+    with _lag_lock:
+        reading = _lag_readings.get(key)
+    if reading and now - reading[0] < REPLICA_LAG_CHECK_INTERVAL:
+        return reading[1]
+
+    try:
+        with engine.connect() as conn:
+            status = conn.execute(text('SHOW REPLICA STATUS')).mappings().first()
+        lag = status.get('Seconds_Behind_Source') if status else None
+        lag = float(lag) if lag is not None else None
+    except Exception as e:
+        print(f"Replica lag check failed: {e}")
+        lag = None
+
+    with _lag_lock:
+        _lag_readings[key] = (now, lag)
+    return lag
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of replica-routed requests to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('read_replica'):
+            if self._flushing or not _is_plain_select(clause):
+                g.db_written = True
+            elif not g.get('db_written'):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None and _replica_is_fresh(replica):
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_plain_select(clause):
+    """A SELECT without FOR UPDATE; anything else may write and stays on the primary"""
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+def _replica_is_fresh(engine):
+    lag = replica_lag_seconds(engine)
+    return lag is not None and lag <= REPLICA_MAX_LAG_SECONDS
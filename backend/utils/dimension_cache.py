@@ -0,0 +1,179 @@
+"""
+Process-local cache of the district, formula and medicine dimensions
+Name lookups are case-insensitive and treat underscores as spaces, using the
+name_normalized columns for districts and formulas (see utils/names.py).
+The cache is keyed on the data versions of the district and formula tables
+and of medicine names, so committed writes in this process rebuild it on next
+use. Writes in other processes are picked up on the first miss of a key
+(after DIMENSION_MISS_REFRESH_SECONDS) or after DIMENSION_CACHE_TTL; later
+misses of the same key are answered from the loaded dimensions.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import event, select, inspect
+from sqlalchemy.orm import Session
+from database import db
+from models import District, Formula, Medicine
+from utils.data_version import get_data_version, touch_tables
+from utils.names import normalize_name
+
+DIMENSION_CACHE_TTL = float(os.getenv('DIMENSION_CACHE_TTL', '300'))
+# A name that isn't cached triggers at most one reload per this many seconds
+DIMENSION_MISS_REFRESH_SECONDS = float(os.getenv('DIMENSION_MISS_REFRESH_SECONDS', '2'))
+# Keys remembered as missing per load, so unknown names in an upload don't each reload
+DIMENSION_MISS_CACHE_SIZE = int(os.getenv('DIMENSION_MISS_CACHE_SIZE', '10000'))
+
+# Version key for medicine name/dosage/formula changes; stock updates don't touch it
+MEDICINE_NAMES = 'medicine_names'
+VERSION_KEYS = ('district', 'formula', MEDICINE_NAMES)
+
+DistrictRecord = namedtuple('DistrictRecord', 'id name latitude longitude')
+FormulaRecord = namedtuple('FormulaRecord', 'id name')
+MedicineRecord = namedtuple('MedicineRecord', 'id formula_id brand_name dosage_strength')
+
+_lock = threading.Lock()
+_snapshot = None  # (versions, loaded at, _Dimensions)
+
+
+class _Dimensions:
+    """One consistent load of the dimension tables with their name indexes"""
+
+    def __init__(self, districts, formulas, medicines):
+        # districts and formulas are (record, normalized name) pairs
+        self.districts = {d.id: d for d, _ in districts}
+        self.district_names = {key: d for d, key in districts}
+
+        self.formulas = {f.id: f for f, _ in formulas}
+        self.formula_names = {key: f for f, key in formulas}
+
+        self.medicines = {m.id: m for m in medicines}
+        self.formula_medicines = {}
+        self.brands = {}
+        for m in sorted(medicines, key=lambda m: m.id):
+            self.formula_medicines.setdefault(m.formula_id, []).append(m)
+            self.brands.setdefault((m.formula_id, normalize_name(m.brand_name)), []).append(m)
+
+        # Lookup keys known to miss in this load; a reload starts with none
+        self.misses = set()
+
+
+def _load():
+    """Read the dimension tables on a separate connection, so only committed rows are cached"""
+    with db.engine.connect() as conn:
+        districts = [(DistrictRecord(*row[:4]), row[4]) for row in conn.execute(
+            select(District.id, District.name, District.latitude, District.longitude, District.name_normalized)
+        )]
+        formulas = [(FormulaRecord(*row[:2]), row[2]) for row in conn.execute(
+            select(Formula.id, Formula.name, Formula.name_normalized)
+        )]
+        medicines = [MedicineRecord(*row) for row in conn.execute(
+            select(Medicine.id, Medicine.formula_id, Medicine.brand_name, Medicine.dosage_strength)
+        )]
+    return _Dimensions(districts, formulas, medicines)
+
+
+def _get_dimensions(refresh_older_than=None):
+    """
+    Current dimensions, reloading when a version changed, the TTL passed or
+    the snapshot is older than refresh_older_than seconds.
+    """
+    global _snapshot
+    versions = get_data_version(*VERSION_KEYS)
+    now = time.monotonic()
+    max_age = DIMENSION_CACHE_TTL if refresh_older_than is None else min(DIMENSION_CACHE_TTL, refresh_older_than)
+    snapshot = _snapshot
+    if snapshot and snapshot[0] == versions and now - snapshot[1] < max_age:
+        return snapshot[2]
+
+    with _lock:
+        snapshot = _snapshot
+        if snapshot and snapshot[0] == versions and time.monotonic() - snapshot[1] < max_age:
+            return snapshot[2]
+        dimensions = _load()
+        _snapshot = (versions, time.monotonic(), dimensions)
+        return dimensions
+
+
+def _lookup(key, find):
+    """
+    Run a lookup, retrying once on a fresh load if it misses. A key that
+    still misses is remembered until the dimensions are reloaded.
+    """
+    dimensions = _get_dimensions()
+    result = find(dimensions)
+    if result is not None or key in dimensions.misses:
+        return result
+    dimensions = _get_dimensions(refresh_older_than=DIMENSION_MISS_REFRESH_SECONDS)
+    result = find(dimensions)
+    if result is None and len(dimensions.misses) < DIMENSION_MISS_CACHE_SIZE:
+        dimensions.misses.add(key)
+    return result
+
+
+def warm_dimension_cache():
+    """Load the dimensions now rather than on the first lookup"""
+    _get_dimensions()
+
+
+def get_district_by_name(name):
+    """District record for a name (case/underscore-insensitive), or None"""
+    key = normalize_name(name)
+    return _lookup(('district_name', key), lambda dims: dims.district_names.get(key)) if key else None
+
+
+def get_formula_by_name(name):
+    """Formula record for a name (case/underscore-insensitive), or None"""
+    key = normalize_name(name)
+    return _lookup(('formula_name', key), lambda dims: dims.formula_names.get(key)) if key else None
+
+
+def get_district(district_id):
+    """District record by id, or None"""
+    return _lookup(('district', district_id), lambda dims: dims.districts.get(district_id))
+
+
+def get_formula(formula_id):
+    """Formula record by id, or None"""
+    return _lookup(('formula', formula_id), lambda dims: dims.formulas.get(formula_id))
+
+
+def find_medicine(formula_id, brand_name, dosage_strength=None):
+    """
+    Medicine record by formula and brand name, and dosage if given.
+    Without a dosage the medicine with the lowest id is returned.
+    """
+    brand_key = normalize_name(brand_name)
+    dosage_key = normalize_name(dosage_strength) if dosage_strength else None
+
+    def find(dims):
+        for medicine in dims.brands.get((formula_id, brand_key), ()):
+            if dosage_key is None or normalize_name(medicine.dosage_strength) == dosage_key:
+                return medicine
+        return None
+
+    return _lookup(('medicine', formula_id, brand_key, dosage_key), find)
+
+
+def get_formula_medicines(formula_id):
+    """Medicine records of a formula, by id"""
+    return list(_get_dimensions().formula_medicines.get(formula_id, ()))
+
+
+MEDICINE_NAME_COLUMNS = ('formula_id', 'brand_name', 'dosage_strength')
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_medicine_name_changes(session, flush_context):
+    """Bump the medicine names version when medicines are added, removed or renamed"""
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Medicine):
+            touch_tables(session, MEDICINE_NAMES)
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Medicine):
+            state = inspect(obj)
+            if any(state.attrs[column].history.has_changes() for column in MEDICINE_NAME_COLUMNS):
+                touch_tables(session, MEDICINE_NAMES)
+                return
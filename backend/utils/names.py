@@ -0,0 +1,23 @@
+"""Name normalization shared by dimension lookups"""
+from sqlalchemy import func
+
+# Database side of normalize_name, used for the generated name_normalized columns
+NORMALIZED_NAME_SQL = "lower(trim(replace({column}, '_', ' ')))"
+
+
+def normalize_name(name):
+    """
+    Normalize a district, formula or medicine name for matching:
+    lowercased, underscores as spaces, surrounding spaces removed.
+    'Acetylsalicylic_Acid' and ' acetylsalicylic acid' both give 'acetylsalicylic acid'.
+    Matches NORMALIZED_NAME_SQL, so only spaces are trimmed (as SQL TRIM does),
+    not tabs, newlines or other whitespace.
+    """
+    if name is None:
+        return None
+    return str(name).replace('_', ' ').strip(' ').lower()
+
+
+def normalized_name_sql(column):
+    """SQL expression normalizing a name column like normalize_name"""
+    return func.lower(func.trim(func.replace(column, '_', ' ')))
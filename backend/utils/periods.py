@@ -0,0 +1,40 @@
+"""Report period filters as date ranges the database can index"""
+from datetime import date
+from sqlalchemy import and_, or_, false
+
+
+def month_ranges(year, months):
+    """
+    Turn a year and months into contiguous half-open date ranges.
+    Consecutive months are merged, so Jan-Nov is one range.
+
+    Args:
+        year: Calendar year
+        months: Month numbers (1-12), in any order
+
+    Returns:
+        list: (start, end) date tuples with end exclusive, e.g.
+        month_ranges(2025, [1, 2, 3, 7]) -> [(2025-01-01, 2025-04-01), (2025-07-01, 2025-08-01)]
+    """
+    ranges = []
+    for month in sorted(set(months)):
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def period_filter(column, year, months):
+    """
+    Filter a date column to the given months of a year.
+    Equivalent to extract('year', column) == year AND
+    extract('month', column).in_(months), but as range predicates that can
+    use an index on the column. No months matches nothing.
+    """
+    ranges = month_ranges(year, months)
+    if not ranges:
+        return false()
+    return or_(*(and_(column >= start, column < end) for start, end in ranges))
@@ -0,0 +1,69 @@
+"""Preload hooks for fork-based servers"""
+import importlib
+
+# Heavy dependencies the routes import on first use
+HEAVY_MODULES = (
+    'numpy',
+    'pandas',
+    'openpyxl',
+    'reportlab.platypus',
+    'openmeteo_requests',
+    'requests_cache',
+    'joblib',
+    'prophet',
+)
+
+
+def preload_modules(modules=HEAVY_MODULES):
+    """
+    Import heavy dependencies up front.
+    Call this in a pre-fork server's master process (e.g. gunicorn with
+    preload_app) so workers share the imported modules copy-on-write instead
+    of each paying the import on its first request.
+    Packages that fail to import are skipped.
+
+    Returns:
+        list: Names of the modules that were imported
+    """
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            print(f"Preload of {name} skipped: {e}")
+    return loaded
+
+
+def preload_app_caches(app):
+    """
+    Load the Prophet models and warm the lookup caches in the master process.
+    Progress is reported through /ready. The master's database connections are
+    disposed afterwards so forked workers never share a socket.
+    """
+    from database import db
+    from utils.warmup import register_warmup_task, set_warmup_status
+
+    def prophet_models():
+        from forecasting.predict import preload_models
+        print(f"Preloaded {len(preload_models())} Prophet models")
+
+    def lookup_caches():
+        from routes.medicines import warm_catalog_cache
+        from utils.dimension_cache import warm_dimension_cache
+        warm_catalog_cache()
+        warm_dimension_cache()
+
+    for name, task in (('prophet_models', prophet_models), ('lookup_caches', lookup_caches)):
+        register_warmup_task(name)
+        set_warmup_status(name, 'running')
+        try:
+            with app.app_context():
+                task()
+            set_warmup_status(name, 'completed')
+        except Exception as e:
+            print(f"Preload task {name} failed: {e}")
+            set_warmup_status(name, 'failed', str(e))
+
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,151 @@
+"""Streaming CSV/Excel reader shared by the upload routes"""
+import os
+
+# Rows per batch handed to the write path (each batch is committed on its own)
+UPLOAD_BATCH_SIZE = int(os.getenv('UPLOAD_BATCH_SIZE', '5000'))
+
+
+def normalize_column(name):
+    """Default header normalization: strip and lowercase"""
+    return str(name).strip().lower()
+
+
+def get_file_ext(filename):
+    """Get the lowercased extension of an uploaded file name ('' if none)"""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def format_row_errors(errors):
+    """Format (row_number, message) tuples as 'Row N: message' strings"""
+    return [f"Row {row}: {message}" for row, message in errors]
+
+
+def text_column(df, *names):
+    """
+    First of the given columns present in a batch, stripped, with blank and
+    missing (NaN) cells as None. Both sales upload modes read text cells
+    through this so they accept and reject the same rows.
+    """
+    import pandas as pd
+
+    for name in names:
+        if name in df.columns:
+            values = df[name].astype('string').str.strip()
+            values = values.mask(values == '')
+            return values.astype(object).where(values.notna(), None)
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def iter_upload_batches(file, dtype=None, normalize=normalize_column, batch_size=None, filename=None):
+    """
+    Stream an uploaded CSV or Excel file as fixed-size DataFrame batches.
+
+    CSV files are read with pandas chunked iteration and XLSX files are streamed
+    row by row with openpyxl in read-only mode, so only one batch is held in
+    memory at a time. Legacy .xls files are read whole and then sliced.
+
+    The frame index is the zero-based data row number in the file, so callers
+    can keep reporting errors as "Row {idx + 2}" across batches.
+
+    Args:
+        file: Uploaded file (werkzeug FileStorage or any seekable file object with .filename)
+        dtype: Optional dict of normalized column name -> dtype to pin. Pinning
+               identifier columns to str keeps every batch typed the same way
+               regardless of what values happen to fall in it.
+        normalize: Function applied to each header name
+        batch_size: Rows per batch (default: UPLOAD_BATCH_SIZE)
+        filename: Name used to detect the format (default: file.filename)
+
+    Yields:
+        pandas.DataFrame with normalized column names
+
+    Raises:
+        ValueError: If the file extension is not csv, xlsx or xls
+    """
+    import pandas as pd
+    
+    batch_size = batch_size or UPLOAD_BATCH_SIZE
+    dtype = dtype or {}
+    file_ext = get_file_ext(filename or file.filename)
+
+    if file_ext == 'csv':
+        yield from _iter_csv_batches(file, dtype, normalize, batch_size)
+    elif file_ext == 'xlsx':
+        yield from _iter_xlsx_batches(file, dtype, normalize, batch_size)
+    elif file_ext == 'xls':
+        # Pinned columns are read as objects, so an integer column with a blank isn't made float first
+        raw_columns = pd.read_excel(file, nrows=0).columns
+        file.seek(0)
+        df = pd.read_excel(file, dtype={raw: object for raw in raw_columns if normalize(raw) in dtype} or None)
+        df.columns = [normalize(c) for c in df.columns]
+        df = _pin_dtypes(df, dtype)
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+    else:
+        raise ValueError('Unsupported file format. Use CSV or Excel.')
+
+
+def _iter_csv_batches(file, dtype, normalize, batch_size):
+    import pandas as pd
+
+    # Peek at the header so pinned dtypes can be given to the parser by raw column name
+    raw_columns = pd.read_csv(file, nrows=0).columns
+    file.seek(0)
+    raw_dtype = {raw: dtype[normalize(raw)] for raw in raw_columns if normalize(raw) in dtype}
+
+    for chunk in pd.read_csv(file, chunksize=batch_size, dtype=raw_dtype or None):
+        chunk.columns = [normalize(c) for c in chunk.columns]
+        yield chunk
+
+
+def _iter_xlsx_batches(file, dtype, normalize, batch_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [normalize(c if c is not None else '') for c in header]
+
+        batch, index = [], []
+        for row_number, values in enumerate(rows):
+            # Skip fully blank rows (read-only sheets often report trailing empty rows)
+            if all(v is None for v in values):
+                continue
+            values = tuple(values[:len(columns)])
+            batch.append(values + (None,) * (len(columns) - len(values)))
+            index.append(row_number)
+            if len(batch) >= batch_size:
+                yield _make_batch(batch, columns, index, dtype)
+                batch, index = [], []
+        if batch:
+            yield _make_batch(batch, columns, index, dtype)
+    finally:
+        workbook.close()
+
+
+def _make_batch(rows, columns, index, dtype):
+    import pandas as pd
+
+    # Pin while cells are still objects: converting None to NaN first would turn an
+    # integer column with a blank into floats, and pinned str columns into '1.0'
+    df = _pin_dtypes(pd.DataFrame(rows, columns=columns, index=index, dtype=object), dtype)
+    # Empty cells come back as None; use NaN like pd.read_excel does
+    df = df.replace({None: float('nan')})
+    unpinned = [name for name in df.columns if name not in dtype]
+    df[unpinned] = df[unpinned].infer_objects()
+    return df
+
+
+def _pin_dtypes(df, dtype):
+    for name, kind in dtype.items():
+        if name not in df.columns:
+            continue
+        if kind is str:
+            # Keep blanks as NaN, matching what read_csv does for pinned str columns
+            df[name] = df[name].where(df[name].isna(), df[name].astype(str)).astype(object)
+        else:
+            df[name] = df[name].astype(kind)
+    return df
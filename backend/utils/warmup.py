@@ -0,0 +1,47 @@
+"""Warm-up task tracking for the readiness endpoint"""
+import threading
+from datetime import datetime
+
+# Statuses that count as finished for readiness
+FINISHED_STATUSES = ('completed', 'skipped', 'failed')
+
+_lock = threading.Lock()
+_tasks = {}
+
+
+def register_warmup_task(name):
+    """Register a warm-up task as pending; readiness waits for it to finish"""
+    with _lock:
+        _tasks[name] = {'status': 'pending', 'error': None, 'startedAt': None, 'finishedAt': None}
+
+
+def set_warmup_status(name, status, error=None):
+    """
+    Update a warm-up task's status.
+
+    Args:
+        name: Task name given to register_warmup_task
+        status: 'running', 'completed', 'skipped' (done elsewhere) or 'failed'
+        error: Error message for failed tasks
+    """
+    now = datetime.utcnow().isoformat()
+    with _lock:
+        task = _tasks.setdefault(name, {'status': 'pending', 'error': None, 'startedAt': None, 'finishedAt': None})
+        task['status'] = status
+        task['error'] = error
+        if status == 'running':
+            task['startedAt'] = now
+        elif status in FINISHED_STATUSES:
+            task['finishedAt'] = now
+
+
+def get_warmup_status():
+    """
+    Get the state of every warm-up task.
+
+    Returns:
+        tuple: (all_finished, {task name: task state})
+    """
+    with _lock:
+        tasks = {name: dict(task) for name, task in _tasks.items()}
+    return all(task['status'] in FINISHED_STATUSES for task in tasks.values()), tasks
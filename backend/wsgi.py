@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import create_app
+
+application = app = create_app()